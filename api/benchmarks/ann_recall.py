@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Recall and latency of the ANN index against exact search.
+
+Queries look like the centroids cluster labelling searches for: the mean
+of an indexed word and its nearest neighbours ('centroid'), and single
+word vectors with noise added ('word'). For each NPROBE/RERANK setting
+the script reports recall@k (share of the exact top k that the index also
+returns) and milliseconds per query, next to the brute-force scan:
+
+    python api/utils/ann_index.py                 # build the index first
+    python api/benchmarks/ann_recall.py
+    python api/benchmarks/ann_recall.py --nprobe 4 8 16 --rerank 32 128 --queries 500
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(bench_dir, '..', 'utils'))
+
+from ann_index import AnnIndex, exact_search, store_vectors  # noqa: E402
+from embedding_store import EmbeddingStore, STORE_PATH  # noqa: E402
+
+RANDOM_STATE = 42
+
+
+def make_queries(index, count, rng, neighbours=10, noise=0.3):
+    """Takes an index and query count. Returns list of (kind, query vector)."""
+    picks = rng.choice(len(index), size=count, replace=False if count <= len(index) else True)
+    vectors = store_vectors(index.store, index.ids[picks])
+    queries = []
+    for i, vec in enumerate(vectors):
+        if i % 2 == 0:
+            # Mean of a word and its nearest neighbours, like a cluster centroid
+            near = exact_search(index, vec, neighbours)
+            rows = [index.ids[np.flatnonzero(index.words == w.encode('utf-8'))[0]] for w, _ in near]
+            queries.append(('centroid', store_vectors(index.store, rows).mean(axis=0)))
+        else:
+            queries.append(('word', vec + rng.normal(scale=noise / np.sqrt(len(vec)), size=len(vec))))
+    return queries
+
+
+def measure(search, queries, truth, k):
+    """Takes a search function, queries and exact results. Returns recall and latency."""
+    recalls = {'centroid': [], 'word': []}
+    start = time.perf_counter()
+    found = [search(vec) for _, vec in queries]
+    elapsed = time.perf_counter() - start
+    for (kind, _), got, want in zip(queries, found, truth):
+        recalls[kind].append(len({w for w, _ in got} & {w for w, _ in want}) / k)
+    row = {kind: round(float(np.mean(r)), 4) for kind, r in recalls.items() if r}
+    row['recall'] = round(float(np.mean(recalls['centroid'] + recalls['word'])), 4)
+    row['ms_per_query'] = round(elapsed * 1000 / len(queries), 3)
+    return row
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=STORE_PATH, help='Embedding store directory')
+    parser.add_argument('--index', default=None, help='Index directory (default: <store>/ann)')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', nargs='+', type=int, default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--rerank', nargs='+', type=int, default=[10, 64, 256])
+    parser.add_argument('--output', help='Also write results as JSON')
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store, fallback='none')
+    index = AnnIndex(args.index or os.path.join(args.store, 'ann'), store)
+    rng = np.random.default_rng(RANDOM_STATE)
+    queries = make_queries(index, args.queries, rng)
+
+    start = time.perf_counter()
+    truth = [exact_search(index, vec, args.k) for _, vec in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    print(f"{len(index)} indexed words, {index.meta['nlist']} lists, m={index.meta['m']}, "
+          f"{len(queries)} queries, recall@{args.k}")
+    print(f"{'nprobe':>6} {'rerank':>6} {'recall':>7} {'centroid':>8} {'word':>6} {'ms/query':>9} {'speedup':>8}")
+    print(f"{'exact':>6} {'':>6} {1.0:>7.3f} {1.0:>8.3f} {1.0:>6.3f} {exact_ms:>9.3f} {1.0:>7.1f}x")
+    results = {'count': len(index), 'meta': index.meta, 'k': args.k, 'exact_ms_per_query': round(exact_ms, 3),
+               'settings': []}
+    for nprobe in args.nprobe:
+        for rerank in args.rerank:
+            row = measure(lambda q: index.search(q, args.k, nprobe, rerank), queries, truth, args.k)
+            row.update(nprobe=nprobe, rerank=rerank)
+            results['settings'].append(row)
+            print(f"{nprobe:>6} {rerank:>6} {row['recall']:>7.3f} {row['centroid']:>8.3f} {row['word']:>6.3f} "
+                  f"{row['ms_per_query']:>9.3f} {exact_ms / row['ms_per_query']:>7.1f}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
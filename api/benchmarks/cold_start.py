@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Cold-start budget check for the one-shot analysis scripts.
+
+Node spawns a fresh interpreter per request when INKSIGHT_WORKERS=0, so the
+time until a script writes its first byte of output is paid on every call.
+Each case below runs a script the way pythonRunner.js does (input on stdin)
+and measures time-to-first-byte (median of --repeat runs). A further run
+with `python -X importtime` lists the slowest top-level imports so a
+regression can be traced to the import that caused it.
+
+The script exits with status 1 when any case is over its budget:
+
+    python api/benchmarks/cold_start.py
+    python api/benchmarks/cold_start.py --budget keyness-text=6000 --scale 2
+
+Budgets assume the corpus index has been built (python api/utils/corpus_index.py).
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+utils_dir = os.path.abspath(os.path.join(bench_dir, '..', 'utils'))
+
+SAMPLE_TEXT = (
+    "The whale surfaced beside the ship. Every sailor on deck watched it "
+    "dive again, and the captain said nothing for a long time."
+)
+
+# name, script, stdin, budget in milliseconds
+CASES = [
+    ('analyze', 'analyze.py', SAMPLE_TEXT, 400),
+    ('keyness-invalid-json', 'keyness.py', 'not json', 400),
+    ('keyness-unknown-corpus', 'keyness.py', json.dumps({'text': SAMPLE_TEXT, 'corpus': 'nope'}), 400),
+    ('keyness-empty', 'keyness.py', json.dumps({'text': '', 'corpus': 'brown'}), 600),
+    ('keyness-text', 'keyness.py', json.dumps({'text': SAMPLE_TEXT, 'corpus': 'brown'}), 4000),
+    ('semantic-empty', 'semantic.py', '', 600),
+    ('semantic-text', 'semantic.py', SAMPLE_TEXT, 5000),
+]
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def time_to_first_byte(script, stdin, extra_args=()):
+    """Takes script name and input. Runs it once.
+
+    Returns (seconds until the first stdout byte, stderr text).
+    """
+    # stderr goes to a file: -X importtime writes more than a pipe buffer holds
+    with tempfile.TemporaryFile() as stderr_file:
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, *extra_args, os.path.join(utils_dir, script)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr_file
+        )
+        proc.stdin.write(stdin.encode('utf-8'))
+        proc.stdin.close()
+        proc.stdout.read(1)
+        elapsed = time.perf_counter() - start
+        proc.stdout.read()
+        proc.wait()
+        stderr_file.seek(0)
+        return elapsed, stderr_file.read().decode('utf-8', 'replace')
+
+
+def slowest_imports(stderr, top=5):
+    """Takes -X importtime output. Returns the slowest top-level imports in ms."""
+    imports = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match and not match.group(3):
+            imports.append((int(match.group(2)) / 1000, match.group(4)))
+    imports.sort(reverse=True)
+    return [{'module': name, 'ms': round(ms, 1)} for ms, name in imports[:top]]
+
+
+def run_cases(cases, repeat, budgets, scale):
+    results = []
+    for name, script, stdin, budget in cases:
+        budget = budgets.get(name, budget) * scale
+        times = [time_to_first_byte(script, stdin)[0] * 1000 for _ in range(repeat)]
+        _, importtime = time_to_first_byte(script, stdin, ('-X', 'importtime'))
+        ttfb = statistics.median(times)
+        results.append({
+            'case': name,
+            'script': script,
+            'ttfb_ms': round(ttfb, 1),
+            'budget_ms': budget,
+            'ok': ttfb <= budget,
+            'slowest_imports': slowest_imports(importtime),
+        })
+    return results
+
+
+def parse_budgets(items):
+    budgets = {}
+    for item in items:
+        name, _, ms = item.partition('=')
+        budgets[name] = float(ms)
+    return budgets
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case (median is used)')
+    parser.add_argument('--budget', action='append', default=[], metavar='CASE=MS',
+                        help='Override the budget of one case')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every budget (slow machines)')
+    parser.add_argument('--cases', nargs='+', help='Only run these cases')
+    parser.add_argument('--output', help='Also write results as JSON')
+    args = parser.parse_args()
+
+    cases = [c for c in CASES if not args.cases or c[0] in args.cases]
+    results = run_cases(cases, args.repeat, parse_budgets(args.budget), args.scale)
+
+    print(f"{'case':<24} {'ttfb ms':>8} {'budget':>8}  slowest imports")
+    for r in results:
+        imports = ', '.join(f"{i['module']} {i['ms']:.0f}" for i in r['slowest_imports'][:3])
+        print(f"{r['case']:<24} {r['ttfb_ms']:>8.1f} {r['budget_ms']:>8.0f}  "
+              f"{'' if r['ok'] else 'OVER BUDGET  '}{imports}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""Benchmark every analysis entry point across document sizes.
+
+Runs analyze.py, keyness (once per reference corpus) and semantic analysis
+over the sample texts and over synthetic copies scaled 10x and 100x. Each
+case runs in a fresh Python process so that:
+
+    cold   time from interpreter start: imports, model/corpus loading, first run
+    warm   median of repeated runs in the same process (models and corpora
+           already loaded, text tokenized again each time)
+    rss    peak resident memory of that process
+
+Every run is broken into stages (read, corpus_table, model_load, tokenize,
+score, cluster, ...) and throughput is reported in words per second.
+Results are written as JSON so two commits can be compared:
+
+    python api/benchmarks/run_benchmarks.py
+    python api/benchmarks/run_benchmarks.py --scales 1 --analyses analyze keyness
+    python api/benchmarks/run_benchmarks.py --compare old.json new.json
+
+Without models/cc.en.300.bin (or with --offline) semantic analysis uses the
+fallback model, so the suite runs without downloads.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+pj_root = os.path.abspath(os.path.join(bench_dir, '..', '..'))
+utils_dir = os.path.join(pj_root, 'api', 'utils')
+samples_dir = os.path.join(pj_root, 'fake-text-samples')
+results_dir = os.path.join(bench_dir, 'results')
+
+DEFAULT_FILES = ['1500words-test.txt', 'generic_test.txt', 'moby-dick.txt']
+DEFAULT_SCALES = [1, 10, 100]
+ANALYSES = ['analyze', 'keyness', 'semantic']
+
+
+class Stages:
+    """Collects wall time per named stage of one run."""
+
+    def __init__(self):
+        self.times = {}
+
+    def run(self, name, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+        return result
+
+
+def read_text(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def run_analyze(case, stages):
+    from analyze import analyze_stream
+
+    with open(case['path'], encoding='utf-8') as f:
+        stages.run('analyze', analyze_stream, f)
+
+
+def run_keyness(case, stages):
+    from corpus_index import get_table
+    from keyness import analyze_keyness
+    from tokenization import tokenize_stream
+
+    text = stages.run('read', read_text, case['path'])
+    stages.run('corpus_table', get_table, case['corpus'])
+    stream = stages.run('tokenize', tokenize_stream, text, 'keyness')
+    stages.run('score', analyze_keyness, text, case['corpus'], stream=stream)
+
+
+def run_semantic(case, stages):
+    from semantic import analyze_semantic, load_model
+    from tokenization import tokenize_stream
+
+    text = stages.run('read', read_text, case['path'])
+    stages.run('model_load', load_model)
+    stream = stages.run('tokenize', tokenize_stream, text, 'semantic')
+    stages.run('cluster', analyze_semantic, text, stream=stream)
+
+
+RUNNERS = {'analyze': run_analyze, 'keyness': run_keyness, 'semantic': run_semantic}
+
+
+def peak_rss_mb():
+    """Returns peak resident memory of this process in MB (None if unknown)."""
+    # ru_maxrss survives exec on Linux (it may be the parent's peak), VmHWM does not
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_child(case):
+    """Takes a case dict. Runs it cold then warm in this process.
+
+    Returns dict with cold/warm timings, stages and peak RSS.
+    """
+    start = time.perf_counter()
+    sys.path.insert(0, utils_dir)
+    runner = RUNNERS[case['analysis']]
+
+    cold = Stages()
+    cold.run('import', __import__, {'analyze': 'analyze', 'keyness': 'keyness',
+                                   'semantic': 'semantic'}[case['analysis']])
+    runner(case, cold)
+    cold_wall = time.perf_counter() - start
+
+    warm_runs = []
+    for _ in range(case['repeat']):
+        warm = Stages()
+        run_start = time.perf_counter()
+        runner(case, warm)
+        warm_runs.append((time.perf_counter() - run_start, warm.times))
+
+    result = {
+        'cold': {'wall': cold_wall, 'stages': cold.times},
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    if warm_runs:
+        result['warm'] = {
+            'wall': statistics.median(wall for wall, _ in warm_runs),
+            'stages': {name: statistics.median(times[name] for _, times in warm_runs)
+                       for name in warm_runs[0][1]},
+            'runs': len(warm_runs),
+        }
+    if case['analysis'] == 'semantic':
+        from semantic import model_version
+        result['model'] = model_version()
+    return result
+
+
+def count_words(path):
+    """Takes path. Returns the analyze.py word count of the file."""
+    sys.path.insert(0, utils_dir)
+    from analyze import analyze_stream
+
+    with open(path, encoding='utf-8') as f:
+        return analyze_stream(f)['word_count']
+
+
+def scale_document(path, scale, out_dir):
+    """Takes sample path and factor. Writes the text repeated scale times.
+
+    Returns path of the synthetic document (the sample itself for scale 1).
+    """
+    if scale == 1:
+        return path
+    text = read_text(path)
+    name, ext = os.path.splitext(os.path.basename(path))
+    scaled_path = os.path.join(out_dir, f'{name}.x{scale}{ext}')
+    with open(scaled_path, 'w', encoding='utf-8') as f:
+        for _ in range(scale):
+            f.write(text)
+            f.write('\n\n')
+    return scaled_path
+
+
+def list_cases(analyses, corpora):
+    cases = []
+    for analysis in analyses:
+        if analysis == 'keyness':
+            cases.extend({'analysis': 'keyness', 'corpus': corpus} for corpus in corpora)
+        else:
+            cases.append({'analysis': analysis})
+    return cases
+
+
+def run_case(case, env, timeout):
+    """Takes case dict. Runs it in a fresh interpreter. Returns its result dict."""
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', json.dumps(case)],
+            capture_output=True, text=True, env=env, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        return {'error': f'Timed out after {timeout}s'}
+    process_wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        return {'error': f'Exit code {proc.returncode}: {proc.stderr[-2000:]}'}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['process_wall'] = process_wall
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=pj_root,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_suite(args):
+    sys.path.insert(0, utils_dir)
+    from corpora import CORPORA
+
+    corpora = args.corpora or list(CORPORA)
+    env = dict(os.environ)
+    tmp = tempfile.TemporaryDirectory(prefix='inksight-bench-')
+    if args.offline:
+        # Point at a model that does not exist and skip the embedding store
+        env['INKSIGHT_FASTTEXT_MODEL'] = os.path.join(tmp.name, 'missing.bin')
+        env['INKSIGHT_EMBEDDING_STORE'] = ''
+
+    results = []
+    with tmp:
+        for filename in args.files:
+            sample = os.path.join(samples_dir, filename)
+            for scale in args.scales:
+                path = scale_document(sample, scale, tmp.name)
+                words = count_words(path)
+                for case in list_cases(args.analyses, corpora):
+                    case.update(path=path, repeat=args.repeat)
+                    label = f"{case['analysis']}{':' + case['corpus'] if 'corpus' in case else ''}"
+                    print(f"{label:<20} {filename} x{scale} ...", end=' ', flush=True, file=sys.stderr)
+                    result = run_case(case, env, args.timeout)
+                    result.update(
+                        analysis=case['analysis'], corpus=case.get('corpus'),
+                        document=filename, scale=scale, bytes=os.path.getsize(path), words=words
+                    )
+                    for mode in ('cold', 'warm'):
+                        if mode in result and result[mode]['wall'] > 0:
+                            result[mode]['words_per_second'] = round(words / result[mode]['wall'])
+                    print(result.get('error', '').splitlines()[-1] if 'error' in result
+                          else f"{result['cold']['wall']:.2f}s cold", file=sys.stderr)
+                    results.append(result)
+
+    return {
+        'commit': git_commit(),
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'offline': args.offline,
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+
+def case_id(result):
+    return (result['analysis'], result.get('corpus'), result['document'], result['scale'])
+
+
+def print_table(report):
+    print(f"{'case':<20} {'document':<22} {'scale':>5} {'words':>10} {'cold s':>8} "
+          f"{'warm s':>8} {'words/s':>10} {'rss MB':>8}")
+    for r in report['results']:
+        label = r['analysis'] + (f":{r['corpus']}" if r.get('corpus') else '')
+        if 'error' in r:
+            print(f"{label:<20} {r['document']:<22} {r['scale']:>5} {r['words']:>10}  error")
+            continue
+        warm = r.get('warm', r['cold'])
+        print(f"{label:<20} {r['document']:<22} {r['scale']:>5} {r['words']:>10} "
+              f"{r['cold']['wall']:>8.3f} {warm['wall']:>8.3f} {warm.get('words_per_second', 0):>10} "
+              f"{r['peak_rss_mb'] or '-':>8}")
+
+
+def compare(old_path, new_path):
+    """Takes two result files. Prints warm time and peak RSS change per case."""
+    with open(old_path, encoding='utf-8') as f:
+        old = {case_id(r): r for r in json.load(f)['results'] if 'error' not in r}
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"{'case':<20} {'document':<22} {'scale':>5} {'warm old':>9} {'warm new':>9} "
+          f"{'speedup':>8} {'rss old':>8} {'rss new':>8}")
+    for r in new['results']:
+        before = old.get(case_id(r))
+        if before is None or 'error' in r:
+            continue
+        label = r['analysis'] + (f":{r['corpus']}" if r.get('corpus') else '')
+        old_wall = before.get('warm', before['cold'])['wall']
+        new_wall = r.get('warm', r['cold'])['wall']
+        print(f"{label:<20} {r['document']:<22} {r['scale']:>5} {old_wall:>9.3f} {new_wall:>9.3f} "
+              f"{old_wall / new_wall if new_wall else 0:>7.2f}x "
+              f"{before['peak_rss_mb'] or '-':>8} {r['peak_rss_mb'] or '-':>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', nargs='+', default=DEFAULT_FILES,
+                        help='Sample files from fake-text-samples/')
+    parser.add_argument('--scales', nargs='+', type=int, default=DEFAULT_SCALES,
+                        help='Repeat each sample this many times')
+    parser.add_argument('--analyses', nargs='+', choices=ANALYSES, default=ANALYSES)
+    parser.add_argument('--corpora', nargs='+', help='Reference corpora for keyness (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Warm runs per case')
+    parser.add_argument('--timeout', type=int, default=3600, help='Seconds allowed per case')
+    parser.add_argument('--offline', action='store_true',
+                        help='Use the fallback semantic model even if cc.en.300.bin exists')
+    parser.add_argument('--output', help='Result JSON path (default: api/benchmarks/results/)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two result files')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(json.loads(args.child))))
+        return
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run_suite(args)
+    output = args.output or os.path.join(
+        results_dir, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{report['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print_table(report)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,49 @@
 const { runPythonScript } = require('../utils/pythonRunner');
 
-// Corpus metadata for keyness analysis (returned to frontend for corpus selector)
-// Uses simple_description for dropdown display
-const CORPORA = [
-  { name: 'brown', display_name: 'Brown Corpus', description: 'Balanced American English' },
-  { name: 'gutenberg', display_name: 'Project Gutenberg', description: 'Classic literature' },
-  { name: 'reuters', display_name: 'Reuters Corpus', description: 'News articles' },
-  { name: 'inaugural', display_name: 'Inaugural Addresses Corpus', description: 'Presidential speeches' },
-];
+// Corpus metadata comes from Python (api/utils/corpora.py plus registered custom corpora)
+// Each entry has name, display_name and the simple description for dropdown display
+const corporaRequest = (request) => runPythonScript('custom_corpora.py', JSON.stringify(request));
 
 // Return available corpora
-exports.getAvailableCorpora = (req, res) => res.json(CORPORA);
+exports.getAvailableCorpora = async (req, res) => {
+  try {
+    res.json(await corporaRequest({ action: 'list' }));
+  } catch (err) {
+    res.status(500).json({ error: err.message });
+  }
+};
+
+// Writes to one custom corpus run one after another (shard merges must not overlap)
+const corpusWrites = new Map();
+function serializeWrite(name, task) {
+  const previous = corpusWrites.get(name) || Promise.resolve();
+  const next = previous.catch(() => {}).then(task);
+  corpusWrites.set(name, next);
+  next.finally(() => {
+    if (corpusWrites.get(name) === next) corpusWrites.delete(name);
+  }).catch(() => {});
+  return next;
+}
+
+// Register an empty custom corpus
+exports.registerCorpus = (name, displayName, description) => (
+  corporaRequest({ action: 'register', name, display_name: displayName, description })
+);
+
+// Add documents ([{ id, text }]) to a custom corpus; its frequency table is updated incrementally
+exports.addCorpusDocuments = (name, documents) => (
+  serializeWrite(name, () => corporaRequest({ action: 'add', name, documents }))
+);
 
 // Analyze keyness via Python subprocess (sends {text, corpus} to stdin, receives JSON from stdout)
-exports.analyzeKeyness = (text, corpus) => runPythonScript('keyness.py', JSON.stringify({ text, corpus }));
+// filters can hold min_juilland_d / max_dp_norm to drop keywords unevenly spread in the corpus,
+// ngram (2 or 3) to score phrases instead of single words, and window / stride / top_keywords
+// for a window x keyword matrix of effect sizes across the text
+exports.analyzeKeyness = (text, corpus, options = {}, filters = {}) => (
+  runPythonScript('keyness.py', JSON.stringify({ text, corpus, ...filters }), options)
+);
+
+// Analyze keyness against several corpora at once (all corpora when none are given)
+exports.analyzeKeynessMulti = (text, corpora, options = {}, filters = {}) => (
+  runPythonScript('keyness.py', JSON.stringify({ text, corpora, ...filters }), options)
+);
@@ -3,7 +3,7 @@ const multer = require('multer');
 const path = require('path');
 const mammoth = require('mammoth');
 const keynessController = require('./controllers/keynessController');
-const { runPythonScript } = require('./utils/pythonRunner');
+const { runPythonScript, getCacheStats } = require('./utils/pythonRunner');
 
 const router = express.Router();
 const upload = multer({ storage: multer.memoryStorage() });
@@ -15,13 +15,53 @@ router.post('/analyze-file', upload.single('file'), handleAnalyzeFile);
 // POST /api/sentiment - Sentiment analysis via FastText
 router.post('/sentiment', upload.single('file'), handleSentiment);
 
-// GET /api/corpora - Available reference corpora for keyness analysis
+// POST /api/sentiment-stream - Same analysis as newline-delimited JSON stages (tokens,
+// provisional, final); closing the connection cancels the analysis
+router.post('/sentiment-stream', upload.single('file'), handleSentimentStream);
+
+// GET /api/corpora - Available reference corpora for keyness analysis (built-in and custom)
 router.get('/corpora', keynessController.getAvailableCorpora);
 
-// POST /api/keyness-stats - Keyness statistics (requires corpus param in body)
+// POST /api/corpora - Register a custom reference corpus (name, display_name, description fields)
+router.post('/corpora', upload.none(), handleRegisterCorpus);
+
+// POST /api/corpora/:name/documents - Add uploaded files to a custom corpus
+router.post('/corpora/:name/documents', upload.array('files'), handleAddCorpusDocuments);
+
+// POST /api/keyness-stats - Keyness statistics (requires corpus param in body; optional
+// min_juilland_d / max_dp_norm filter keywords by corpus dispersion, ngram=2|3 scores phrases,
+// window / stride / top_keywords return keyword effect sizes per window of words)
 router.post('/keyness-stats', upload.single('file'), handleKeynessStats);
 
+// POST /api/keyness-compare - Keyness against several corpora (optional comma separated corpora param)
+router.post('/keyness-compare', upload.single('file'), handleKeynessCompare);
+
+// POST /api/corpus-similarity - Reference corpora ranked by closeness in meaning (optional comma
+// separated corpora param)
+router.post('/corpus-similarity', upload.single('file'), handleCorpusSimilarity);
+
+// GET /api/cache-stats - Result cache hit/miss counters of the Python workers
+router.get('/cache-stats', handleCacheStats);
+
 // Handlers
+// ?timings=1 asks the Python side for a per-stage "_timings" block; doc_id
+// (body or query) lets later versions of a document be re-analysed incrementally
+function analysisOptions(req) {
+  const docId = (req.body && req.body.doc_id) || req.query.doc_id;
+  return { timings: req.query.timings === '1', ...(docId ? { docId: String(docId) } : {}) };
+}
+
+// Optional min_juilland_d / max_dp_norm fields (0-1) filter keywords by corpus dispersion;
+// ngram (2 or 3) compares two- or three-word phrases instead of single words;
+// window (words), stride and top_keywords track keywords across a long text
+function keynessFilters(req) {
+  const filters = {};
+  for (const key of ['min_juilland_d', 'max_dp_norm', 'ngram', 'window', 'stride', 'top_keywords']) {
+    if (req.body[key] !== undefined && req.body[key] !== '') filters[key] = req.body[key];
+  }
+  return filters;
+}
+
 // Extract text from uploaded file buffer (TXT, DOCX, MD, ODT)
 async function extractText(file) {
   const ext = path.extname(file.originalname).toLowerCase();
@@ -36,7 +76,7 @@ async function handleAnalyzeFile(req, res) {
   if (!req.file) return res.status(400).json({ error: 'No file' });
   try {
     const text = await extractText(req.file);
-    const result = await runPythonScript('analyze.py', text);
+    const result = await runPythonScript('analyze.py', text, analysisOptions(req));
     res.json(result);
   } catch (err) {
     res.status(500).json({ error: err.message });
@@ -48,23 +88,117 @@ async function handleSentiment(req, res) {
   if (!req.file) return res.status(400).json({ error: 'No file' });
   try {
     const text = await extractText(req.file);
-    const result = await runPythonScript('semantic.py', text);
+    const result = await runPythonScript('semantic.py', text, analysisOptions(req));
     res.json(result);
   } catch (err) {
     res.status(500).json({ error: err.message });
   }
 }
 
+// Semantic analysis streamed stage by stage; the last line has stage "final" (or "error")
+async function handleSentimentStream(req, res) {
+  if (!req.file) return res.status(400).json({ error: 'No file' });
+  let text;
+  try {
+    text = await extractText(req.file);
+  } catch (err) {
+    return res.status(500).json({ error: err.message });
+  }
+
+  // The client went away before the final stage: stop the Python side too
+  const controller = new AbortController();
+  res.on('close', () => {
+    if (!res.writableEnded) controller.abort();
+  });
+  const writeLine = (message) => res.write(`${JSON.stringify(message)}\n`);
+
+  res.status(200).type('application/x-ndjson').set('Cache-Control', 'no-cache');
+  res.flushHeaders();
+  try {
+    const result = await runPythonScript('semantic.py', text, {
+      ...analysisOptions(req), onStage: writeLine, signal: controller.signal,
+    });
+    writeLine({ stage: 'final', ...result });
+  } catch (err) {
+    if (!err.cancelled) writeLine({ stage: 'error', error: err.message });
+  }
+  return res.end();
+}
+
 // Keyness statistics via controller
 async function handleKeynessStats(req, res) {
   if (!req.file) return res.status(400).json({ error: 'No file' });
   try {
     const text = await extractText(req.file);
-    const result = await keynessController.analyzeKeyness(text, req.body.corpus || 'brown');
+    const result = await keynessController.analyzeKeyness(
+      text, req.body.corpus || 'brown', analysisOptions(req), keynessFilters(req)
+    );
+    res.json(result);
+  } catch (err) {
+    res.status(400).json({ error: err.message });
+  }
+}
+
+// Register a custom corpus
+async function handleRegisterCorpus(req, res) {
+  try {
+    const { name, display_name: displayName, description } = req.body;
+    res.json(await keynessController.registerCorpus(name, displayName, description));
+  } catch (err) {
+    res.status(400).json({ error: err.message });
+  }
+}
+
+// Extract every uploaded file and add it to the corpus index
+async function handleAddCorpusDocuments(req, res) {
+  if (!req.files || !req.files.length) return res.status(400).json({ error: 'No files' });
+  try {
+    const documents = await Promise.all(req.files.map(async (file) => (
+      { id: file.originalname, text: await extractText(file) }
+    )));
+    res.json(await keynessController.addCorpusDocuments(req.params.name, documents));
+  } catch (err) {
+    res.status(400).json({ error: err.message });
+  }
+}
+
+// Keyness against several corpora in one request, plus words key in all of them
+async function handleKeynessCompare(req, res) {
+  if (!req.file) return res.status(400).json({ error: 'No file' });
+  try {
+    const text = await extractText(req.file);
+    const corpora = (req.body.corpora || '').split(',').map((c) => c.trim()).filter(Boolean);
+    const result = await keynessController.analyzeKeynessMulti(
+      text, corpora, analysisOptions(req), keynessFilters(req)
+    );
     res.json(result);
   } catch (err) {
     res.status(400).json({ error: err.message });
   }
 }
 
+// Compare the document's word vectors with every corpus embedding profile
+async function handleCorpusSimilarity(req, res) {
+  if (!req.file) return res.status(400).json({ error: 'No file' });
+  try {
+    const text = await extractText(req.file);
+    const corpora = (req.body.corpora || '').split(',').map((c) => c.trim()).filter(Boolean);
+    const result = await runPythonScript(
+      'corpus_profiles.py', JSON.stringify({ text, ...(corpora.length ? { corpora } : {}) }), analysisOptions(req)
+    );
+    res.json(result);
+  } catch (err) {
+    res.status(400).json({ error: err.message });
+  }
+}
+
+// Result cache counters aggregated across workers
+async function handleCacheStats(req, res) {
+  try {
+    res.json(await getCacheStats());
+  } catch (err) {
+    res.status(500).json({ error: err.message });
+  }
+}
+
 module.exports = router;
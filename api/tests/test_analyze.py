@@ -1,8 +1,14 @@
 import unittest
+import io
 import re
 import os
+import sys
 from collections import Counter
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import analyze
+
 #Load Test Data 
 
 def load_test_file(filename="test_text.txt"):
@@ -66,5 +72,22 @@ class TestAnalyze(unittest.TestCase):
         self.assertIsInstance(result['top'], list)
         self.assertIsInstance(result['reading_time'], dict)
 
+class TestAnalyzeStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.text = load_test_file() + "\n\nDon't stop...  Really?! 'Quoted' words. End"
+
+    def test_streaming_matches_whole_text(self):
+        """Tests that chunked analysis gives the same JSON for any chunk size."""
+        expected = analyze_text(self.text)
+        for chunk_size in (1, 2, 3, 7, 64, 1000, len(self.text) + 1):
+            result = analyze.analyze_stream(io.StringIO(self.text), chunk_size=chunk_size)
+            self.assertEqual(result, expected, f"Mismatch with chunk_size={chunk_size}")
+
+    def test_empty_and_whitespace_input(self):
+        """Tests that empty or blank input gives zero counts."""
+        for text in ("", "   \n  ", "...!?"):
+            self.assertEqual(analyze.analyze_stream(io.StringIO(text), chunk_size=2), analyze_text(text))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
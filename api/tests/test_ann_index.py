@@ -0,0 +1,95 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import fasttext
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from ann_index import AnnIndex, build_index, exact_search, label_clusters, load_index, store_vectors
+from embedding_store import EmbeddingStore, export_store
+
+#Load Test Data
+
+def data_path(filename="test_text.txt"):
+    """Returns the path of a file in the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, 'test_data', filename)
+
+class TestAnnIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        model_path = os.path.join(cls.tmp.name, 'tiny.bin')
+        model = fasttext.train_unsupervised(
+            data_path(), model='skipgram', dim=16, epoch=1, minCount=1,
+            bucket=5000, thread=1, verbose=0
+        )
+        model.save_model(model_path)
+        store_path = export_store(model_path, os.path.join(cls.tmp.name, 'store'))
+        cls.store = EmbeddingStore(store_path, fallback='none')
+        build_index(cls.store, nlist=8, m=4, ksub=16, iterations=10)
+        cls.index = load_index(cls.store)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_indexes_label_words_only(self):
+        """Tests that only lowercase alphabetic words of 3+ letters are indexed."""
+        words = [w.decode('utf-8') for w in self.index.words.tolist()]
+        self.assertGreater(len(words), 10)
+        self.assertTrue(all(w.isalpha() and w.islower() and len(w) >= 3 for w in words))
+
+    def test_recall_against_exact_search(self):
+        """Tests that probing every list finds the exact neighbours, and fewer lists most of them."""
+        rng = np.random.default_rng(0)
+        queries = store_vectors(self.store, self.index.ids[rng.choice(len(self.index), 20, replace=False)])
+        full, partial = [], []
+        for query in queries:
+            exact = {w for w, _ in exact_search(self.index, query, 5)}
+            full.append(len(exact & {w for w, _ in self.index.search(query, 5, nprobe=8, rerank=len(self.index))}))
+            partial.append(len(exact & {w for w, _ in self.index.search(query, 5, nprobe=4, rerank=20)}))
+        self.assertEqual(sum(full), 5 * len(queries))
+        self.assertGreaterEqual(sum(partial) / (5 * len(queries)), 0.6)
+
+    def test_stale_index_is_ignored(self):
+        """Tests that an index built for a different store is not used."""
+        path = os.path.join(self.store.path, 'ann')
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        meta['store_vocab_size'] += 1
+        stale = os.path.join(self.tmp.name, 'stale')
+        os.makedirs(stale, exist_ok=True)
+        with open(os.path.join(stale, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        with self.assertRaises(ValueError):
+            AnnIndex(stale, self.store)
+        self.assertIsNone(load_index(object()))
+
+    def test_cluster_labels(self):
+        """Tests that clusters get distinct themes and related words outside the cluster."""
+        words = [w.decode('utf-8') for w in self.index.words.tolist()]
+        vectors, _ = self.store.get_vectors(words[:6])
+        clusters = [
+            {'label': 'Cluster 0', 'word_count': 3, 'words': words[:3]},
+            {'label': 'Cluster 1', 'word_count': 3, 'words': words[3:6]},
+        ]
+        centers = np.array([vectors[:3].mean(axis=0), vectors[3:6].mean(axis=0)])
+        labelled = label_clusters([dict(c) for c in clusters], centers, self.index, related=3)
+        self.assertNotEqual(labelled[0]['theme'], labelled[1]['theme'])
+        for cluster in labelled:
+            self.assertLessEqual(len(cluster['related_words']), 3)
+            self.assertFalse(set(cluster['related_words']) & set(cluster['words']))
+
+        # Without an index the nearest word in the cluster names it
+        plain = label_clusters([dict(c) for c in clusters], centers, None)
+        self.assertEqual([c['theme'] for c in plain], [words[0], words[3]])
+        self.assertEqual(plain[0]['related_words'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import io
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from batch import completed_ids, iter_documents, open_output, run_batch
+from analyze import analyze_text
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.texts = {
+            'a.txt': "First essay. It is short.",
+            os.path.join('sub', 'b.md'): "Second essay! Also short?",
+        }
+        for name, text in self.texts.items():
+            os.makedirs(os.path.join(self.dir, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(self.dir, name), 'w', encoding='utf-8') as f:
+                f.write(text)
+        with open(os.path.join(self.dir, 'skip.csv'), 'w', encoding='utf-8') as f:
+            f.write("not a document")
+        self.jsonl = os.path.join(self.dir, 'docs.jsonl')
+        with open(self.jsonl, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'id': 'inline', 'text': "Third essay."}) + '\n\n')
+            f.write(json.dumps({'text': "No id here."}) + '\n')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_documents_from_directories_globs_and_jsonl(self):
+        """Tests that every input kind yields documents with stable ids."""
+        from_dir = [doc_id for doc_id, _, _ in iter_documents([self.dir])]
+        self.assertEqual(from_dir, sorted(self.texts))
+
+        from_glob = [path for path, _, _ in iter_documents([os.path.join(self.dir, '**', '*.md')])]
+        self.assertEqual(from_glob, [os.path.join(self.dir, 'sub', 'b.md')])
+
+        from_jsonl = list(iter_documents([self.jsonl]))
+        self.assertEqual(from_jsonl, [('inline', None, "Third essay."),
+                                      (f'{self.jsonl}:3', None, "No id here.")])
+
+    def test_results_match_single_analysis(self):
+        """Tests that batch word statistics equal analyze_text on each document."""
+        out = io.StringIO()
+        summary = run_batch([self.dir, self.jsonl], out, processes=0)
+        records = {r['id']: r for r in map(json.loads, out.getvalue().splitlines())}
+        self.assertEqual(summary['documents'], 4)
+        self.assertEqual(summary['errors'], 0)
+        for name, text in self.texts.items():
+            self.assertEqual(records[name]['results']['analyze'], analyze_text(text))
+
+    def test_resume_skips_finished_documents(self):
+        """Tests that a resumed run only processes documents without a result."""
+        output = os.path.join(self.dir, 'out.jsonl')
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'id': 'a.txt', 'results': {}}) + '\n')
+            f.write(json.dumps({'id': 'removed.txt', 'results': {}}) + '\n')
+            f.write(json.dumps({'id': 'inline', 'error': 'failed'}) + '\n')
+            f.write('{"id": "sub/b.md", "resu')
+
+        done = completed_ids(output)
+        self.assertEqual(done, {'a.txt', 'removed.txt'})
+        with open_output(output, resume=True) as out:
+            summary = run_batch([self.dir, self.jsonl], out, processes=0, skip=done)
+        self.assertEqual((summary['documents'], summary['skipped']), (3, 1))
+        self.assertEqual(completed_ids(output), {'a.txt', 'removed.txt', 'inline', os.path.join('sub', 'b.md'),
+                                                 f'{self.jsonl}:3'})
+
+    def test_process_pool(self):
+        """Tests that documents analysed in worker processes give the same results."""
+        out = io.StringIO()
+        run_batch([self.dir], out, processes=2)
+        records = {r['id']: r for r in map(json.loads, out.getvalue().splitlines())}
+        for name, text in self.texts.items():
+            self.assertEqual(records[name]['results']['analyze'], analyze_text(text))
+
+if __name__ == '__main__':
+    unittest.main()
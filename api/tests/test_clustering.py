@@ -0,0 +1,88 @@
+import unittest
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from semantic import cluster_words
+from clustering import choose_backend, choose_k, fit_clusters, summarize_clusters
+
+#Synthetic embeddings: three well separated groups of words
+
+def make_groups(words_per_group=20, dim=8, seed=0):
+    """Builds unique words, their vectors and occurrence counts in three clear groups."""
+    rng = np.random.default_rng(seed)
+    centres = np.eye(3, dim) * 10
+    words, vectors, counts = [], [], []
+    for g, centre in enumerate(centres):
+        for i in range(words_per_group):
+            words.append(f"group{g}word{i}")
+            vectors.append(centre + rng.normal(scale=0.1, size=dim))
+            counts.append(int(rng.integers(1, 60)))
+    return words, np.array(vectors), np.array(counts)
+
+class TestClusterWords(unittest.TestCase):
+
+    def setUp(self):
+        self.words, self.vectors, self.counts = make_groups()
+
+    def test_weighted_unique_words_match_repeated_rows(self):
+        """Tests that clustering unique words with weights groups words like repeated rows do."""
+        repeated = np.repeat(np.arange(len(self.words)), self.counts)
+        expanded = cluster_words(self.vectors[repeated], [self.words[i] for i in repeated], max_clusters=3)
+        weighted = cluster_words(self.vectors, self.words, max_clusters=3, weights=self.counts)
+
+        def groups(clusters):
+            return sorted((c["word_count"], c["words"][0][:6]) for c in clusters)
+
+        self.assertEqual(groups(weighted), groups(expanded))
+
+    def test_word_count_and_top_words(self):
+        """Tests that every cluster reports unique words and at most 10 nearest words."""
+        clusters = cluster_words(self.vectors, self.words, max_clusters=3, weights=self.counts)
+        self.assertEqual(sum(c["word_count"] for c in clusters), len(self.words))
+        for c in clusters:
+            self.assertLessEqual(len(c["words"]), 10)
+            self.assertEqual(len(set(c["words"])), len(c["words"]))
+
+class TestClusteringBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.words, self.vectors, self.counts = make_groups()
+
+    def test_backend_is_chosen_by_size(self):
+        """Tests that auto mode switches to MiniBatchKMeans for large inputs."""
+        self.assertEqual(choose_backend(100, 'auto'), 'kmeans')
+        self.assertEqual(choose_backend(10**7, 'auto'), 'minibatch')
+        self.assertEqual(choose_backend(100, 'minibatch'), 'minibatch')
+        with self.assertRaises(ValueError):
+            choose_backend(100, 'dbscan')
+
+    def test_auto_k_finds_the_groups(self):
+        """Tests that both scoring methods recover the three synthetic groups."""
+        for method in ('silhouette', 'inertia'):
+            self.assertEqual(choose_k(self.vectors, self.counts.astype(float), 2, 8, method=method), 3)
+
+    def test_minibatch_backend_clusters_groups(self):
+        """Tests that the MiniBatch backend separates the groups like full KMeans."""
+        labels, _ = fit_clusters(self.vectors, self.counts.astype(float), 3, backend='minibatch')
+        for g in range(3):
+            self.assertEqual(len(set(labels[g * 20:(g + 1) * 20])), 1)
+
+    def test_summaries_match_per_cluster_loop(self):
+        """Tests the single-pass summaries against a straightforward loop, with repeated tokens."""
+        tokens = self.words + self.words[:15]
+        vectors = np.vstack([self.vectors, self.vectors[:15] + 0.01])
+        labels, centers = fit_clusters(vectors, np.ones(len(tokens)), 3, backend='kmeans')
+        summaries = summarize_clusters(vectors, tokens, labels, centers, top_n=10)
+        for i, summary in enumerate(summaries):
+            idx = np.where(labels == i)[0]
+            dist = np.linalg.norm(vectors[idx] - centers[i], axis=1)
+            ordered = [tokens[idx[j]] for j in np.argsort(dist, kind='stable')]
+            self.assertEqual(summary["words"], list(dict.fromkeys(ordered))[:10])
+            self.assertEqual(summary["word_count"], len(set(ordered)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import os
+import sys
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from corpus_index import (
+    MATRIX_PARTS, count_filtered, filter_tokens, merge_tables, table_from_counter, save_table, load_table
+)
+
+#Load Test Data
+
+def load_test_file(filename="test_text.txt"):
+    """Reads the content of a text file from the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(current_dir, 'test_data', filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Test file not found at expected path: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+class TestCorpusIndex(unittest.TestCase):
+
+    def setUp(self):
+        words = load_test_file().split()
+        self.counter = Counter(filter_tokens(words))
+        self.table = table_from_counter('sample', self.counter, top_n=50)
+
+    def test_lookup_matches_counter(self):
+        """Tests that vectorised lookups return the same counts as the source Counter."""
+        words = list(self.counter) + ['notaword', 'zzzzzz']
+        counts = self.table.lookup(words).tolist()
+        self.assertEqual(counts, [self.counter.get(w, 0) for w in words])
+        self.assertEqual(self.table.total, sum(self.counter.values()))
+
+    def test_count_filtered_matches_direct_count(self):
+        """Tests that counting distinct words first gives the same counts and key order."""
+        words = load_test_file().split() + ['The', 'THE', 'x1', 'ab', 'Café']
+        self.assertEqual(list(count_filtered(words).items()), list(Counter(filter_tokens(words)).items()))
+
+    def test_most_common_keeps_counter_order(self):
+        """Tests that the stored top-N has the same order as Counter.most_common."""
+        expected = [w for w, _ in self.counter.most_common(20)]
+        self.assertEqual(self.table.most_common(20), expected)
+
+    def test_round_trip_through_disk(self):
+        """Tests that a saved table loads memory-mapped with identical contents."""
+        with tempfile.TemporaryDirectory() as index_dir:
+            save_table(self.table, index_dir)
+            loaded = load_table('sample', index_dir)
+            self.assertIsNotNone(loaded)
+            self.assertEqual(loaded.vocab.tolist(), self.table.vocab.tolist())
+            self.assertEqual(loaded.counts.tolist(), self.table.counts.tolist())
+            self.assertEqual(loaded.most_common(50), self.table.most_common(50))
+            self.assertIsNone(load_table('missing', index_dir))
+
+def loop_dispersion(documents, word):
+    """Computes Juilland's D and DPnorm for one word with a plain loop over documents."""
+    sizes = [sum(d.values()) for d in documents]
+    counts = [d.get(word, 0) for d in documents]
+    total, freq, n = sum(sizes), sum(counts), len(documents)
+    relative = [c / s for c, s in zip(counts, sizes)]
+    mean = sum(relative) / n
+    sd = (sum((r - mean) ** 2 for r in relative) / n) ** 0.5
+    juilland_d = max(0.0, 1 - (sd / mean) / (n - 1) ** 0.5)
+    dp = 0.5 * sum(abs(c / freq - s / total) for c, s in zip(counts, sizes))
+    return juilland_d, dp / (1 - min(sizes) / total)
+
+class TestDispersion(unittest.TestCase):
+
+    def setUp(self):
+        paragraphs = [p for p in load_test_file().split('\n') if p.strip()]
+        self.documents = [Counter(filter_tokens(p.split())) for p in paragraphs]
+        self.counter = Counter()
+        for d in self.documents:
+            self.counter.update(d)
+        self.table = table_from_counter('sample', self.counter, top_n=50, documents=self.documents)
+
+    def test_matches_per_word_loop(self):
+        """Tests that the vectorised statistics equal a per-word computation."""
+        words = list(self.counter)
+        juilland_d, dp_norm = self.table.lookup_dispersion(words)
+        for i, word in enumerate(words):
+            expected = loop_dispersion(self.documents, word)
+            self.assertAlmostEqual(juilland_d[i], expected[0], places=9)
+            self.assertAlmostEqual(dp_norm[i], expected[1], places=9)
+        missing = self.table.lookup_dispersion(['notaword'])
+        self.assertTrue(np.isnan(missing[0][0]) and np.isnan(missing[1][0]))
+
+    def test_even_and_concentrated_words(self):
+        """Tests that a word spread like the documents scores as even, one in a single document as uneven."""
+        documents = [Counter({'even': 2, 'other': 8}), Counter({'even': 4, 'other': 16}),
+                     Counter({'clumped': 5, 'other': 5})]
+        counter = sum(documents, Counter())
+        table = table_from_counter('toy', counter, documents=documents)
+        juilland_d, dp_norm = table.lookup_dispersion(['clumped'])
+        self.assertEqual((juilland_d[0], dp_norm[0]), (0.0, 1.0))
+        juilland_d, dp_norm = table.lookup_dispersion(['even'])
+        self.assertLess(dp_norm[0], 0.5)
+
+    def test_round_trip_and_merge(self):
+        """Tests that the matrix survives saving and that merged tables stack their documents."""
+        half = len(self.documents) // 2
+        parts = [table_from_counter(f'part{i}', sum(docs, Counter()), top_n=0, documents=docs)
+                 for i, docs in enumerate([self.documents[:half], self.documents[half:]])]
+        merged = merge_tables('sample', parts)
+        self.assertEqual(len(merged.matrix), len(self.documents))
+        for part in MATRIX_PARTS:
+            np.testing.assert_array_equal(getattr(merged.matrix, part), getattr(self.table.matrix, part))
+        np.testing.assert_allclose(merged.juilland_d, self.table.juilland_d)
+        np.testing.assert_allclose(merged.dp_norm, self.table.dp_norm)
+
+        with tempfile.TemporaryDirectory() as index_dir:
+            save_table(merged, index_dir)
+            loaded = load_table('sample', index_dir)
+            self.assertEqual(len(loaded.matrix), len(self.documents))
+            np.testing.assert_allclose(loaded.dp_norm, self.table.dp_norm, rtol=1e-6)
+            # Tables saved without documents have no dispersion
+            save_table(table_from_counter('plain', self.counter), index_dir)
+            self.assertIsNone(load_table('plain', index_dir).lookup_dispersion(['the']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import os
+import sys
+import tempfile
+import zlib
+from collections import Counter
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import corpus_profiles
+from corpus_index import table_from_counter
+from corpus_profiles import build_profile, compare_corpora, load_profile, save_profile, sif_weights
+
+class WordVectors:
+    """Deterministic stand-in for the FastText vectors (one seeded vector per word)."""
+
+    def get_vectors(self, words):
+        vectors = [np.random.default_rng(zlib.crc32(w.encode())).normal(size=16) for w in words]
+        return np.array(vectors, dtype=np.float32), list(words)
+
+def unit(rows):
+    rows = np.asarray(rows, dtype=np.float64)
+    return rows / np.linalg.norm(rows, axis=-1, keepdims=True)
+
+NEWS = ['market', 'shares', 'profit', 'trade', 'bank', 'prices', 'oil', 'exports', 'company', 'growth']
+NOVEL = ['whale', 'sea', 'captain', 'ship', 'storm', 'heart', 'night', 'love', 'ghost', 'river']
+
+class TestCorpusProfiles(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.tables = {
+            'reuters': table_from_counter('reuters', Counter(dict(zip(NEWS, rng.integers(20, 500, 10).tolist())))),
+            'gutenberg': table_from_counter('gutenberg', Counter(dict(zip(NOVEL, rng.integers(20, 500, 10).tolist())))),
+        }
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profile_dir.cleanup)
+        patches = [patch.object(corpus_profiles, 'load_model', return_value=WordVectors()),
+                   patch.object(corpus_profiles, 'get_table', side_effect=self.tables.__getitem__),
+                   patch.object(corpus_profiles, 'table_version', side_effect=lambda name: f'test-{name}'),
+                   patch.object(corpus_profiles, 'model_version', return_value='test-model')]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        corpus_profiles._cached_profile.cache_clear()
+        corpus_profiles._stacked.cache_clear()
+        self.addCleanup(corpus_profiles._cached_profile.cache_clear)
+        self.addCleanup(corpus_profiles._stacked.cache_clear)
+
+    def test_profile_round_trip_and_versions(self):
+        """Tests that a saved profile loads unchanged, and not for other model or table versions."""
+        profile = build_profile('reuters', n_clusters=3)
+        self.assertEqual(profile.centers.shape, (3, 16))
+        self.assertAlmostEqual(float(profile.shares.sum()), 1.0, places=5)
+        save_profile(profile, self.profile_dir.name)
+        loaded = load_profile('reuters', ['test-model', 'test-reuters'], self.profile_dir.name)
+        np.testing.assert_array_equal(loaded.centroid, profile.centroid)
+        np.testing.assert_array_equal(loaded.centers, profile.centers)
+        self.assertEqual(loaded.themes, profile.themes)
+        self.assertIsNone(load_profile('reuters', ['other-model', 'test-reuters'], self.profile_dir.name))
+
+    def test_ranking_matches_direct_computation(self):
+        """Tests the single-product scores against comparing the text with each profile directly."""
+        text = ' '.join(NEWS * 3 + ['market'] * 5 + NOVEL[:2])
+        result = compare_corpora(text, ['gutenberg', 'reuters'])
+        self.assertEqual([c['name'] for c in result['corpora']], ['reuters', 'gutenberg'])
+
+        counts = Counter(text.split())
+        words = list(counts)
+        vectors = unit(WordVectors().get_vectors(words)[0])
+        weights = sif_weights([counts[w] for w in words], sum(counts.values()))
+        weights /= weights.sum()
+        for entry in result['corpora']:
+            profile = corpus_profiles.get_profile(entry['name'])
+            centroid = unit(weights @ vectors)
+            self.assertAlmostEqual(entry['similarity'], float(centroid @ profile.centroid), places=4)
+            nearest = (vectors @ profile.centers.T).max(axis=1)
+            self.assertAlmostEqual(entry['cluster_similarity'], float(weights @ nearest), places=4)
+            self.assertIn(entry['closest_theme'], profile.themes)
+
+    def test_empty_text(self):
+        """Tests that a text without words returns no ranking."""
+        result = compare_corpora('12 34 !!', ['reuters'])
+        self.assertEqual((result['total_words'], result['corpora']), (0, []))
+
+if __name__ == '__main__':
+    unittest.main()
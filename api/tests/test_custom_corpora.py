@@ -0,0 +1,158 @@
+import unittest
+import os
+import sys
+import tempfile
+from collections import Counter
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import custom_corpora
+from corpus_index import (
+    SegmentedTable, available_corpora, corpus_info, load_corpus, load_table, merge_tables, read_meta,
+    save_table, shard_metas, table_version
+)
+from custom_corpora import add_documents, compact, list_corpora, pending_shards, register
+from tokenization import tokenize_stream
+
+#Load Test Data
+
+def load_test_file(filename="test_text.txt"):
+    """Reads the content of a text file from the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(current_dir, 'test_data', filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Test file not found at expected path: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+class TestCustomCorpora(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_dir = self.tmp.name
+        paragraphs = [p for p in load_test_file().split('\n') if p.strip()]
+        self.documents = paragraphs + ["Whales, whales and more whales.", ""]
+        register('essays', 'Past essays', 'Earlier student essays', index_dir=self.index_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def expected_counts(self, documents):
+        counter = Counter()
+        for text in documents:
+            counter.update(tokenize_stream(text, 'keyness').tokens())
+        return counter
+
+    def table_counts(self):
+        table = load_corpus('essays', self.index_dir)
+        return +Counter(dict(zip(table.vocab.tolist(), table.counts.tolist())))
+
+    def test_registration_and_listing(self):
+        """Tests that a registered corpus is listed after the built-in ones and names are checked."""
+        names = [c['name'] for c in list_corpora(self.index_dir)]
+        self.assertEqual(names, ['brown', 'gutenberg', 'reuters', 'inaugural', 'essays'])
+        self.assertEqual(corpus_info('essays', self.index_dir)['display_name'], 'Past essays')
+        for bad in ['brown', 'essays', 'Bad Name', '']:
+            with self.assertRaises(ValueError):
+                register(bad, index_dir=self.index_dir)
+        with self.assertRaises(ValueError):
+            corpus_info('missing', self.index_dir)
+        # 'documents' is only ever a count, so empty custom corpora can be told apart
+        counts = {n: c.get('documents') for n, c in available_corpora(self.index_dir).items()}
+        self.assertEqual(counts, {'brown': None, 'gutenberg': None, 'reuters': None, 'inaugural': None,
+                                  'essays': 0})
+
+    def test_incremental_adds_match_full_count(self):
+        """Tests that adding documents in batches and small shards equals counting them all at once."""
+        half = len(self.documents) // 2
+        added = add_documents('essays', iter(self.documents[:half]), max_words=20, index_dir=self.index_dir)
+        self.assertGreater(added['shards'], 1)
+        self.assertEqual(self.table_counts(), self.expected_counts(self.documents[:half]))
+
+        add_documents('essays', iter(self.documents[half:]), compact_after=True, index_dir=self.index_dir)
+        self.assertEqual(pending_shards('essays', self.index_dir), [])
+        self.assertEqual(self.table_counts(), self.expected_counts(self.documents))
+        self.assertEqual(available_corpora(self.index_dir)['essays']['documents'], len(self.documents))
+
+        table = load_table('essays', self.index_dir)
+        top = table.most_common(5)
+        counts = table.lookup(top).tolist()
+        self.assertEqual(counts, sorted(counts, reverse=True))
+        # One document-term matrix row per added document (shards merge in id order)
+        self.assertEqual(sorted(table.matrix.sizes.tolist()),
+                         sorted(len(tokenize_stream(text, 'keyness')) for text in self.documents))
+
+    def test_shards_are_read_without_merging(self):
+        """Tests that a table plus unmerged shards answers like the fully merged table."""
+        half = len(self.documents) // 2
+        add_documents('essays', iter(self.documents[:half]), compact_after=True, index_dir=self.index_dir)
+        add_documents('essays', iter(self.documents[half:]), max_words=20, index_dir=self.index_dir)
+        self.assertGreater(len(pending_shards('essays', self.index_dir)), 1)
+        self.assertEqual(available_corpora(self.index_dir)['essays']['documents'], len(self.documents))
+        segmented = load_corpus('essays', self.index_dir)
+        self.assertIsInstance(segmented, SegmentedTable)
+        version = table_version('essays', self.index_dir)
+
+        compact('essays', self.index_dir)
+        merged = load_table('essays', self.index_dir)
+        self.assertNotEqual(table_version('essays', self.index_dir), version)
+        words = merged.vocab.tolist() + ['absentword']
+        self.assertEqual(segmented.total, merged.total)
+        self.assertEqual(segmented.documents, merged.documents)
+        self.assertEqual(segmented.lookup(words).tolist(), merged.lookup(words).tolist())
+        for a, b in zip(segmented.lookup_dispersion(words), merged.lookup_dispersion(words)):
+            np.testing.assert_allclose(a, b, rtol=1e-5)
+        for n in (1, 5, 50):
+            self.assertEqual(segmented.most_common(n), merged.most_common(n))
+
+    def test_shards_merge_in_size_tiers(self):
+        """Tests that same-sized shards are merged into bigger ones without touching the table."""
+        built_at = read_meta('essays', self.index_dir)['built_at']
+        with patch.object(custom_corpora, 'TIER_FANOUT', 2):
+            for text in self.documents:
+                add_documents('essays', iter([text] * 4), index_dir=self.index_dir)
+            shards = shard_metas('essays', self.index_dir)
+            tiers = [custom_corpora.shard_tier(meta['total']) for meta in shards.values()]
+        self.assertEqual(len(tiers), len(set(tiers)))
+        self.assertEqual(read_meta('essays', self.index_dir)['built_at'], built_at)
+        self.assertEqual(self.table_counts(), self.expected_counts(self.documents * 4))
+        self.assertEqual(available_corpora(self.index_dir)['essays']['documents'], len(self.documents) * 4)
+
+    def test_interrupted_tier_merge_does_not_double_count(self):
+        """Tests that shards a merged shard replaces are ignored if they were not deleted."""
+        add_documents('essays', iter(self.documents[:2]), max_words=1, index_dir=self.index_dir)
+        shards = pending_shards('essays', self.index_dir)
+        expected = self.table_counts()
+        root = os.path.join(self.index_dir, 'custom', 'essays')
+        # A merge that wrote its shard but crashed before deleting the ones it replaces
+        merged = merge_tables('20990101000000-merged', [load_table(s, root) for s in shards])
+        save_table(merged, root, documents=2, replaces=shards)
+        self.assertEqual(pending_shards('essays', self.index_dir), ['20990101000000-merged'])
+        self.assertEqual(self.table_counts(), expected)
+
+    def test_interrupted_compaction_does_not_double_count(self):
+        """Tests that shards already merged before a crash are not merged again."""
+        add_documents('essays', iter(self.documents), compact_after=False, index_dir=self.index_dir)
+        shards = pending_shards('essays', self.index_dir)
+        self.assertEqual(len(shards), 1)
+        compact('essays', self.index_dir)
+        expected = self.table_counts()
+
+        # Simulate a crash after the merged table was written but before the shard was removed
+        self.assertEqual(read_meta('essays', self.index_dir)['merged_shards'], shards)
+        stale = load_table('essays', self.index_dir)
+        stale.name = shards[0]
+        save_table(stale, os.path.join(self.index_dir, 'custom', 'essays'), documents=len(self.documents))
+        add_documents('essays', iter(self.documents[:1]), compact_after=False, index_dir=self.index_dir)
+
+        compact('essays', self.index_dir)
+        self.assertEqual(self.table_counts(), expected + self.expected_counts(self.documents[:1]))
+        self.assertEqual(pending_shards('essays', self.index_dir), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import delta
+from analyze import analyze_tokens
+from clustering import warm_start_centers
+from semantic import cluster_words
+from tokenization import tokenize_stream
+
+#Load Test Data
+
+def load_test_file(filename="test_text.txt"):
+    """Reads the content of a text file from the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(current_dir, 'test_data', filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Test file not found at expected path: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def punkt_available():
+    try:
+        from nltk import sent_tokenize
+        sent_tokenize("Check. Punkt.")
+        return True
+    except LookupError:
+        return False
+
+class TestDelta(unittest.TestCase):
+
+    def setUp(self):
+        self.paragraphs = [p for p in load_test_file().split('\n\n') if p.strip()]
+        self.paragraphs += [
+            "A sentence that runs on",
+            "across a blank line and ends here.",
+            "Zebra apple zebra apple mango.",
+        ]
+
+    def versions(self):
+        """Yields edited versions of the document: changed, added, removed and moved paragraphs."""
+        paragraphs = list(self.paragraphs)
+        yield '\n\n'.join(paragraphs)
+        paragraphs[1] = paragraphs[1].replace('the', 'a')
+        yield '\n\n'.join(paragraphs)
+        paragraphs.insert(2, "An inserted paragraph without an ending")
+        yield '\n\n'.join(paragraphs)
+        paragraphs.pop(0)
+        yield '\n  \n'.join(paragraphs)
+        yield '\n\n'.join(reversed(paragraphs))
+
+    def test_streams_match_full_tokenization(self):
+        """Tests that running counts equal a full tokenization after each edit."""
+        profiles = ['words', 'semantic'] + (['keyness'] if punkt_available() else [])
+        for profile in profiles:
+            for i, text in enumerate(self.versions()):
+                with self.subTest(profile=profile, version=i):
+                    got = delta.get_document(f'test-{profile}').totals(text, profile)
+                    want = tokenize_stream(text, profile)
+                    self.assertEqual(list(got.counter().items()), list(want.counter().items()))
+                    self.assertEqual(len(got), len(want))
+                    self.assertEqual(got.sentence_count, want.sentence_count)
+
+    def test_analyze_matches_full_analysis(self):
+        """Tests that word statistics (including tied top words) match a full analysis."""
+        for text in self.versions():
+            self.assertEqual(delta.analyze_delta('test-analyze', text),
+                             analyze_tokens(tokenize_stream(text, 'words')))
+
+    def test_only_changed_segments_are_added(self):
+        """Tests that an edit to one paragraph adds one segment."""
+        text = '\n\n'.join(self.paragraphs)
+        totals = delta.ProfileTotals('words')
+        self.assertEqual(totals.update(delta.segments(text, 'words')), len(set(totals.order)))
+        edited = text.replace('Zebra apple', 'Zebra pear')
+        self.assertEqual(totals.update(delta.segments(edited, 'words')), 1)
+        self.assertEqual(totals.update(delta.segments(edited, 'words')), 0)
+
+    def test_paragraphs_joined_across_unfinished_sentences(self):
+        """Tests that a sentence running over a blank line stays in one segment."""
+        texts = [s for _, s in delta.segments("One two\n\nthree.\n\nFour.", 'words')]
+        self.assertEqual(texts, ["One two\n\nthree.", "Four."])
+
+    def test_documents_are_evicted(self):
+        """Tests that only the most recent documents are kept."""
+        for i in range(delta.DOCUMENT_CACHE_SIZE + 1):
+            delta.get_document(f'evict-{i}')
+        self.assertNotIn('evict-0', delta._documents)
+        self.assertIn(f'evict-{delta.DOCUMENT_CACHE_SIZE}', delta._documents)
+
+class TestWarmStart(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        centres = np.eye(3, 8) * 10
+        self.vectors = np.vstack([c + rng.normal(scale=0.1, size=(20, 8)) for c in centres])
+        self.words = [f"word{i}" for i in range(len(self.vectors))]
+
+    def test_centers_are_padded_or_truncated(self):
+        """Tests that previous centroids are reused and missing ones filled from far rows."""
+        previous = self.vectors[:1]
+        centers = warm_start_centers(previous, self.vectors, 3)
+        self.assertEqual(centers.shape, (3, 8))
+        np.testing.assert_array_equal(centers[0], previous[0])
+        self.assertEqual(warm_start_centers(self.vectors[:5], self.vectors, 2).shape, (2, 8))
+
+    def test_state_keeps_centroids_between_runs(self):
+        """Tests that clustering stores its centroids and starts from them next time."""
+        state = {}
+        first = cluster_words(self.vectors, self.words, max_clusters=3, auto_k=False, state=state)
+        self.assertEqual(state['centers'].shape[1], 8)
+        second = cluster_words(self.vectors, self.words, max_clusters=3, auto_k=False, state=state)
+        self.assertEqual([sorted(c['words']) for c in first], [sorted(c['words']) for c in second])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+import os
+import sys
+import tempfile
+
+import numpy as np
+import fasttext
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from embedding_store import EmbeddingStore, export_store, subword_buckets
+
+#Load Test Data
+
+def data_path(filename="test_text.txt"):
+    """Returns the path of a file in the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, 'test_data', filename)
+
+class TestEmbeddingStore(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.model_path = os.path.join(cls.tmp.name, 'tiny.bin')
+        cls.model = fasttext.train_unsupervised(
+            data_path(), model='skipgram', dim=16, epoch=1, minCount=1,
+            bucket=5000, thread=1, verbose=0
+        )
+        cls.model.save_model(cls.model_path)
+        cls.words = [w for w in cls.model.get_words() if w != '</s>'][:29] + ['unseenword', 'café']
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def export(self, **kwargs):
+        output = os.path.join(self.tmp.name, 'store-' + '-'.join(f'{k}{v}' for k, v in kwargs.items()))
+        return EmbeddingStore(export_store(self.model_path, output, with_subwords=True, **kwargs))
+
+    def test_subword_hashing_matches_fasttext(self):
+        """Tests that n-gram bucket ids are the ones FastText itself uses."""
+        nwords = len(self.model.get_words())
+        for word in ['unseenword', 'café', 'naïveté']:
+            expected = self.model.get_subwords(word)[1].tolist()
+            actual = [nwords + b for b in subword_buckets(word, 3, 6, 5000)]
+            self.assertEqual(actual, expected)
+
+    def test_float32_store_matches_model(self):
+        """Tests that stored and subword-composed vectors equal the model's vectors."""
+        store = self.export()
+        vectors, valid = store.get_vectors(self.words)
+        self.assertEqual(valid, self.words)
+        expected = np.array([self.model.get_word_vector(w) for w in self.words])
+        np.testing.assert_allclose(vectors, expected, atol=1e-6)
+
+    def test_quantized_and_restricted_stores(self):
+        """Tests float16/int8 variants stay close and top-N restricts the vocabulary."""
+        expected = np.array([self.model.get_word_vector(w) for w in self.words[:10]])
+        for dtype, atol in [('float16', 1e-3), ('int8', 2e-2)]:
+            store = self.export(dtype=dtype, top_n=10)
+            self.assertEqual(store.meta['vocab_size'], 10)
+            vectors, _ = store.get_vectors(self.words[:10])
+            np.testing.assert_allclose(vectors, expected, atol=atol * np.abs(expected).max())
+
+    def test_none_fallback_skips_unknown_words(self):
+        """Tests that OOV words are dropped when no fallback is configured."""
+        store = EmbeddingStore(self.export().path, fallback='none')
+        _, valid = store.get_vectors(['unseenword'] + self.words[:2])
+        self.assertEqual(valid, self.words[:2])
+        with self.assertRaises(KeyError):
+            store.get_word_vector('unseenword')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import fallback_model
+import semantic
+from fallback_model import HashedVectors, fallback_version, load_fallback, load_trained, trained_path
+
+def cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+class TestTrainedFallback(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache.cleanup)
+
+    def test_trained_once_then_reused(self):
+        """Tests that the model is trained into the versioned path once and loaded afterwards."""
+        first = load_trained(self.cache.name)
+        path = trained_path(self.cache.name)
+        self.assertIn(fallback_version('trained'), path)
+        self.assertEqual(os.listdir(os.path.dirname(path)), ['model.bin'])
+
+        with patch.object(fallback_model, '_train', side_effect=AssertionError('retrained')):
+            second = load_trained(self.cache.name)
+        np.testing.assert_array_equal(first.get_word_vector('analysis'), second.get_word_vector('analysis'))
+
+    def test_training_is_deterministic(self):
+        """Tests that two separate builds produce identical vectors."""
+        with tempfile.TemporaryDirectory() as other:
+            a = load_trained(self.cache.name)
+            b = load_trained(other)
+        for word in ('semantic', 'mining', 'unseenword'):
+            np.testing.assert_array_equal(a.get_word_vector(word), b.get_word_vector(word))
+
+    def test_version_follows_settings(self):
+        """Tests that changing a training setting changes the cache path."""
+        before = trained_path(self.cache.name)
+        with patch.dict(fallback_model.TRAIN_SETTINGS, {'epoch': 6}):
+            self.assertNotEqual(trained_path(self.cache.name), before)
+
+class TestHashedFallback(unittest.TestCase):
+
+    def setUp(self):
+        self.vectors = HashedVectors()
+
+    def test_vectors_are_stable_and_complete(self):
+        """Tests that every word gets the same vector on each call and in any batch."""
+        words = ['running', 'runner', 'zebra', 'x']
+        vectors, valid = self.vectors.get_vectors(words)
+        self.assertEqual(valid, words)
+        self.assertEqual(vectors.shape, (4, self.vectors.get_dimension()))
+        np.testing.assert_allclose(HashedVectors().get_word_vector('zebra'), vectors[2], rtol=1e-6)
+        self.assertEqual(self.vectors.get_vectors([])[0].shape, (0, self.vectors.get_dimension()))
+
+    def test_shared_ngrams_are_closer(self):
+        """Tests that words sharing character n-grams are more similar than unrelated words."""
+        run, runner, zebra = (self.vectors.get_word_vector(w) for w in ('running', 'runner', 'zebra'))
+        self.assertGreater(cosine(run, runner), cosine(run, zebra) + 0.1)
+
+    def test_semantic_uses_selected_fallback(self):
+        """Tests that semantic analysis runs on the hashed fallback when no model is installed."""
+        self.assertIsInstance(load_fallback('hashed'), HashedVectors)
+        with self.assertRaises(ValueError):
+            load_fallback('other')
+        with patch.object(fallback_model, 'FALLBACK_KIND', 'hashed'):
+            model = semantic.load_model.__wrapped__(model_path='/missing.bin', store_path='', shared_name='')
+            self.assertIsInstance(model, HashedVectors)
+            self.assertTrue(semantic.model_version(model_path='/missing.bin', store_path='', shared_name='').startswith('fallback:hashed'))
+
+if __name__ == '__main__':
+    unittest.main()
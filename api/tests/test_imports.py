@@ -0,0 +1,52 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+
+utils_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils')
+
+# numpy is left out on purpose: token streams, corpus tables and counts are numpy
+# arrays, so every request that analyses text needs it (about 120 ms to import,
+# paid once per worker); only error and empty-input paths could skip it, and
+# those stay within their cold_start.py budgets with it loaded
+HEAVY_MODULES = ['nltk', 'sklearn', 'scipy', 'statsmodels', 'fasttext']
+
+def import_in_fresh_interpreter(modules):
+    """Imports modules in a new Python process. Returns (heavy modules loaded, stdout)."""
+    code = (
+        "import sys, json\n"
+        f"sys.path.insert(0, {utils_dir!r})\n"
+        f"for name in {modules!r}: __import__(name)\n"
+        f"loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+        "sys.stderr.write(json.dumps(loaded))\n"
+    )
+    proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                          stdin=subprocess.DEVNULL, timeout=120)
+    return json.loads(proc.stderr.strip().splitlines()[-1]), proc.stdout
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_analysis_modules_import_without_heavy_dependencies(self):
+        """Tests that importing the analysis modules loads no NLTK, sklearn, scipy or fasttext."""
+        loaded, stdout = import_in_fresh_interpreter(
+            ['analyze', 'corpora', 'corpus_index', 'keyness', 'semantic', 'clustering', 'worker']
+        )
+        self.assertEqual(loaded, [])
+        self.assertEqual(stdout, '')
+
+    def test_empty_keyness_text_skips_nltk(self):
+        """Tests that tokenizing empty text for keyness does not import NLTK."""
+        loaded, _ = import_in_fresh_interpreter(['tokenization'])
+        self.assertEqual(loaded, [])
+        code = (
+            f"import sys; sys.path.insert(0, {utils_dir!r})\n"
+            "from tokenization import tokenize_stream\n"
+            "assert len(tokenize_stream('  ', 'keyness')) == 0\n"
+            "print('nltk' in sys.modules)\n"
+        )
+        proc = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=120)
+        self.assertEqual(proc.stdout.strip(), 'False')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import instrumentation
+from instrumentation import span, traced
+from analyze import analyze_tokens
+from tokenization import tokenize_stream
+
+def staged(text):
+    """Small analysis with nested spans, like the real scripts."""
+    with span('outer') as s:
+        with span('inner', items=3):
+            stream = tokenize_stream(text, 'words')
+        s.count(tokens=len(stream))
+    return analyze_tokens(stream)
+
+class TestInstrumentation(unittest.TestCase):
+
+    def test_no_timings_unless_requested(self):
+        """Tests that untraced calls return the plain result."""
+        result = traced('test', staged, "One two. Three.", timings=False)
+        self.assertNotIn('_timings', result)
+        with span('free') as s:
+            s.count(tokens=1)
+
+    def test_spans_nest_and_carry_counts(self):
+        """Tests that spans are recorded in order with depth, counts, wall and CPU time."""
+        result = traced('test', staged, "One two. Three.", timings=True)
+        timings = result['_timings']
+        names = [(s['name'], s['depth']) for s in timings['spans']]
+        self.assertEqual(names, [('outer', 0), ('inner', 1), ('tokenize', 2), ('summarize', 0)])
+
+        outer, inner = timings['spans'][:2]
+        self.assertEqual(outer['tokens'], 3)
+        self.assertEqual(inner['items'], 3)
+        for record in timings['spans'] + [timings]:
+            self.assertGreaterEqual(record['wall_ms'], 0)
+            self.assertIn('cpu_ms', record)
+        self.assertEqual(result['word_count'], 3)
+
+    def test_result_is_not_mutated(self):
+        """Tests that _timings is added to a copy, so cached results stay clean."""
+        cached = {'word_count': 1}
+        result = traced('test', lambda: cached, timings=True)
+        self.assertIn('_timings', result)
+        self.assertEqual(cached, {'word_count': 1})
+
+    def test_sampled_requests_are_exported(self):
+        """Tests that sampled requests write a metrics line and a cProfile dump without _timings."""
+        with tempfile.TemporaryDirectory() as out_dir:
+            metrics_file = os.path.join(out_dir, 'metrics.jsonl')
+            saved = (instrumentation.SAMPLE_RATE, instrumentation.METRICS_FILE, instrumentation.PROFILE_DIR)
+            instrumentation.SAMPLE_RATE = 1.0
+            instrumentation.METRICS_FILE = metrics_file
+            instrumentation.PROFILE_DIR = os.path.join(out_dir, 'profiles')
+            try:
+                result = traced('sampled', staged, "One two. Three.", timings=False)
+            finally:
+                instrumentation.SAMPLE_RATE, instrumentation.METRICS_FILE, instrumentation.PROFILE_DIR = saved
+
+            self.assertNotIn('_timings', result)
+            with open(metrics_file, encoding='utf-8') as f:
+                line = json.loads(f.readline())
+            self.assertEqual(line['request'], 'sampled')
+            self.assertEqual(len(line['spans']), 4)
+            self.assertEqual(len(os.listdir(os.path.join(out_dir, 'profiles'))), 1)
+
+if __name__ == '__main__':
+    unittest.main()
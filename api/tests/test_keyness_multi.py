@@ -0,0 +1,98 @@
+import unittest
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import keyness
+from corpus_index import table_from_counter
+from tokenization import tokenize_stream
+
+#Load Test Data
+
+def load_test_file(filename="test_text.txt"):
+    """Reads the content of a text file from the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(current_dir, 'test_data', filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Test file not found at expected path: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def keyword(word, effect_size):
+    return {'word': word, 'effect_size': effect_size, 'significance': '***'}
+
+class TestKeynessSummary(unittest.TestCase):
+
+    def test_shared_keywords_need_same_direction_everywhere(self):
+        """Tests that only words significant in every corpus, in one direction, are shared."""
+        results = {
+            'brown': {'keywords': [keyword('whale', 0.2), keyword('ship', 0.1), keyword('said', -0.1)]},
+            'reuters': {'keywords': [keyword('whale', 0.4), keyword('ship', -0.1), keyword('said', -0.3)]},
+        }
+        summary = keyness.summarize_corpora(results)
+        self.assertEqual(summary['corpora'], ['brown', 'reuters'])
+        self.assertEqual([k['word'] for k in summary['keywords']], ['whale', 'said'])
+        self.assertEqual(summary['keywords'][0]['direction'], 'over')
+        self.assertEqual(summary['keywords'][1]['direction'], 'under')
+        self.assertEqual(summary['keywords'][0]['effect_sizes'], {'brown': 0.2, 'reuters': 0.4})
+
+class TestKeynessMulti(unittest.TestCase):
+
+    def setUp(self):
+        # Small in-memory corpora instead of the NLTK ones
+        words = load_test_file().lower().split()
+        self.tables = {
+            'brown': table_from_counter('brown', Counter(words[::2]), top_n=1000),
+            'reuters': table_from_counter('reuters', Counter(words[1::2] + ['market'] * 50), top_n=1000),
+        }
+        self.saved = (keyness.get_table, keyness.table_version, keyness.get_token_stream)
+        keyness.get_table = self.tables.__getitem__
+        keyness.table_version = lambda name: 'v1-test'
+        keyness.get_token_stream = lambda text, profile: tokenize_stream(text, 'semantic')
+
+    def tearDown(self):
+        keyness.get_table, keyness.table_version, keyness.get_token_stream = self.saved
+
+    def test_matches_single_corpus_results(self):
+        """Tests that each corpus result equals a separate analyze_keyness call."""
+        text = load_test_file() + " market market market"
+        combined = keyness.analyze_keyness_multi(text, ['brown', 'reuters'], processes=0)
+        self.assertEqual(list(combined['results']), ['brown', 'reuters'])
+        for name, result in combined['results'].items():
+            single = keyness.analyze_keyness(text, name)
+            self.assertEqual(result['keywords'], single['keywords'])
+            self.assertEqual(result['corpus'], single['corpus'])
+        self.assertEqual(combined['total_words'], combined['results']['brown']['total_words'])
+
+    def test_dispersion_filters(self):
+        """Tests that dispersion is reported per keyword and filters drop unevenly spread words."""
+        words = load_test_file().lower().split()
+        documents = [Counter(words[i::3]) for i in range(3)] + [Counter(['market'] * 50)]
+        self.tables['reuters'] = table_from_counter('reuters', sum(documents, Counter()), documents=documents)
+        text = load_test_file() + " morning"
+        result = keyness.analyze_keyness(text, 'reuters')
+        self.assertEqual(result['corpus']['documents'], 4)
+        market = {k['word']: k for k in result['keywords']}['market']
+        self.assertEqual(market['dp_norm'], 1.0)
+
+        filtered = keyness.run_request({'text': text, 'corpus': 'reuters', 'max_dp_norm': 0.9})
+        self.assertNotIn('market', [k['word'] for k in filtered['keywords']])
+        self.assertTrue(all(k['dp_norm'] is None or k['dp_norm'] <= 0.9 for k in filtered['keywords']))
+        # Tables without a document-term matrix report no dispersion and are not filtered
+        plain = keyness.analyze_keyness(text, 'brown', max_dp_norm=0)
+        self.assertEqual(plain['keywords'], keyness.analyze_keyness(text, 'brown')['keywords'])
+        self.assertIsNone(plain['keywords'][0]['dp_norm'])
+        with self.assertRaises(ValueError):
+            keyness.analyze_keyness(text, 'reuters', min_juilland_d=2)
+
+    def test_unknown_corpus(self):
+        """Tests that an unknown corpus is rejected before any work is done."""
+        with self.assertRaises(ValueError):
+            keyness.analyze_keyness_multi("text", ['brown', 'nope'], processes=0)
+
+if __name__ == '__main__':
+    unittest.main()
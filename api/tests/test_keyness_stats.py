@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+
+import numpy as np
+from scipy.stats import chi2_contingency
+from statsmodels.stats.proportion import proportion_effectsize
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from keyness_stats import score_keyness, star_values
+
+#Test-only scalar reference implementations (one word at a time, with scipy)
+
+def reference_chi2(user_count, corpus_count, user_total, corpus_total):
+    return chi2_contingency([
+        [user_count, corpus_count],
+        [user_total - user_count, corpus_total - corpus_count]
+    ])
+
+def reference_star(score):
+    if score >= 10.83:
+        return '***'
+    elif score >= 6.63:
+        return '**'
+    elif score >= 3.84:
+        return '*'
+    return ''
+
+class TestKeynessStats(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.user_total = 12000
+        self.corpus_total = 900000
+        self.user_counts = rng.integers(0, 300, 500) + 0.5
+        self.corpus_counts = rng.integers(0, 9000, 500) + 0.5
+        self.stats = score_keyness(self.user_counts, self.corpus_counts, self.user_total, self.corpus_total)
+
+    def test_matches_scipy_and_statsmodels_exactly(self):
+        """Tests that vectorised chi-squared, p-values and Cohen's h equal the per-word results."""
+        for i, (u, c) in enumerate(zip(self.user_counts, self.corpus_counts)):
+            chi2, p = reference_chi2(u, c, self.user_total, self.corpus_total)[:2]
+            h = proportion_effectsize(u / self.user_total, c / self.corpus_total)
+            self.assertEqual(self.stats['chi2'][i], chi2)
+            self.assertEqual(self.stats['p_value'][i], p)
+            self.assertEqual(self.stats['cohen_h'][i], h)
+
+    def test_log_likelihood_and_ratio(self):
+        """Tests G2 against the lambda_='log-likelihood' scipy statistic and the log ratio sign."""
+        u, c = self.user_counts[0], self.corpus_counts[0]
+        g2 = chi2_contingency([[u, c], [self.user_total - u, self.corpus_total - c]],
+                              correction=False, lambda_='log-likelihood')[0]
+        self.assertAlmostEqual(self.stats['log_likelihood'][0], g2, places=8)
+        over = self.stats['cohen_h'] > 0
+        self.assertTrue(np.array_equal(over, self.stats['log_ratio'] > 0))
+
+    def test_star_values_match_thresholds(self):
+        """Tests that array star markers agree with the scalar thresholds."""
+        scores = [0.0, 3.83, 3.84, 6.63, 10.82, 10.83, 50.0]
+        self.assertEqual(star_values(scores).tolist(), [reference_star(s) for s in scores])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import keyness
+from corpus_index import table_from_counter
+from keyness import window_bounds, window_counts
+from tokenization import get_token_stream
+
+#Load Test Data
+
+def load_test_file(filename="test_text.txt"):
+    """Reads the content of a text file from the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(current_dir, 'test_data', filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Test file not found at expected path: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+class TestWindowCounts(unittest.TestCase):
+
+    def test_bounds_cover_the_text(self):
+        """Tests that windows are equal-sized and a final window reaches the last token."""
+        starts, ends = window_bounds(25, 10, 4)
+        self.assertEqual(starts.tolist(), [0, 4, 8, 12, 15])
+        self.assertTrue(np.all(ends - starts == 10))
+        starts, ends = window_bounds(7, 10, 4)
+        self.assertEqual((starts.tolist(), ends.tolist()), ([0], [7]))
+
+    def test_counts_match_slicing(self):
+        """Tests prefix-sum window counts against counting each slice directly."""
+        rng = np.random.default_rng(0)
+        ids = rng.integers(0, 30, size=500)
+        columns = np.full(30, -1)
+        columns[[3, 7, 11, 29]] = [0, 1, 2, 3]
+        for window, stride in ((50, 50), (64, 24), (100, 7)):
+            starts, ends = window_bounds(len(ids), window, stride)
+            counts = window_counts(ids, columns, 4, starts, ends)
+            for row, a, b in zip(counts, starts, ends):
+                self.assertEqual(row.tolist(), [int(np.sum(ids[a:b] == i)) for i in (3, 7, 11, 29)])
+
+class TestKeynessWindows(unittest.TestCase):
+
+    def setUp(self):
+        self.text = load_test_file() * 6
+        counter = Counter(w for w in load_test_file().lower().split() if w.isalpha() and len(w) >= 3)
+        counter.update({'corpus': 400, 'reference': 300, 'words': 500})
+        self.table = table_from_counter('brown', counter)
+        self.saved = keyness.get_table
+        keyness.get_table = lambda name: self.table
+
+    def tearDown(self):
+        keyness.get_table = self.saved
+
+    def test_effect_sizes_match_each_window(self):
+        """Tests each matrix row against scoring that window's words with the same smoothing."""
+        result = keyness.run_request({'text': self.text, 'corpus': 'brown', 'window': 120, 'stride': 80,
+                                      'top_keywords': 10})
+        overall = keyness.analyze_keyness(self.text, 'brown')
+        self.assertLessEqual(len(result['keywords']), 10)
+        self.assertEqual(result['total_words'], overall['total_words'])
+        effects = sorted(abs(k['effect_size']) for k in overall['keywords'])
+        self.assertTrue(all(abs(k['effect_size']) >= effects[-len(result['keywords'])]
+                            for k in result['keywords']))
+
+        tokens = get_token_stream(self.text, 'keyness').tokens()
+        words = [k['word'] for k in result['keywords']]
+        corpus = self.table.lookup(words) + 0.5
+        for (a, b), row in zip(result['windows'], result['effect_sizes']):
+            counts = Counter(tokens[a:b])
+            user = np.array([counts[w] for w in words]) + 0.5
+            expected = 2 * (np.arcsin(np.sqrt(user / (b - a))) - np.arcsin(np.sqrt(corpus / self.table.total)))
+            np.testing.assert_allclose(row, expected, atol=1e-4)
+        self.assertEqual(result['windows'][-1][1], len(tokens))
+        self.assertEqual(result['window_unit'], 'keyness_tokens')
+
+    def test_invalid_requests(self):
+        """Tests that bad sizes, too many windows and multi-corpus requests are rejected."""
+        for data in ({'window': 0}, {'window': 'x'}, {'window': 10, 'stride': -1},
+                     {'window': 10, 'stride': 1}, {'window': 10, 'corpora': ['brown']},
+                     {'window': 10, 'ngram': 2}):
+            with self.assertRaises(ValueError):
+                keyness.run_request({'text': self.text * 3, 'corpus': 'brown', **data})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,173 @@
+import unittest
+import os
+import re
+import sys
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import keyness
+from corpus_index import load_table, save_table, table_from_counter
+from ngrams import GAP, check_size, count_ngrams, ngram_keys, pack, phrases, stream_ids, unpack
+from tokenization import tokenize_stream
+
+#Load Test Data
+
+def load_test_file(filename="test_text.txt"):
+    """Reads the content of a text file from the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(current_dir, 'test_data', filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Test file not found at expected path: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def corpus_documents():
+    """Splits the sample text into three 'documents' of sentences (lists of raw words)."""
+    sentences = [s.split() for s in load_test_file().replace('\n', ' ').split('.') if s.split()]
+    return [sentences[i::3] for i in range(3)]
+
+def naive_ngrams(documents, n):
+    """Counts n-grams of adjacent kept words sentence by sentence with plain Python."""
+    counts = Counter()
+    for sentences in documents:
+        for sentence in sentences:
+            runs = [[]]
+            for w in sentence:
+                if w.isalpha() and len(w) >= 3:
+                    runs[-1].append(w.lower())
+                else:
+                    runs.append([])
+            for words in runs:
+                counts.update(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return counts
+
+class TestNgramKeys(unittest.TestCase):
+
+    def test_ngrams_stay_within_sentences(self):
+        """Tests that n-grams never span a sentence start and keys round-trip to word ids."""
+        ids = np.array([0, 1, 2, 3, 4])
+        keys = ngram_keys(ids, [0, 3], 2)
+        np.testing.assert_array_equal(unpack(keys, 2), [[0, 1], [1, 2], [3, 4]])
+        np.testing.assert_array_equal(pack(unpack(keys, 2)), keys)
+        self.assertEqual(len(ngram_keys(ids, [0], 3)), 3)
+        self.assertEqual(len(ngram_keys(ids[:1], [0], 2)), 0)
+        gapped = np.array([0, 1, GAP, 3, 4])
+        np.testing.assert_array_equal(unpack(ngram_keys(gapped, [0], 2), 2), [[0, 1], [3, 4]])
+        self.assertEqual(len(ngram_keys(gapped, [0], 3)), 0)
+        self.assertEqual(phrases(unpack(keys[:1], 2), ['a', 'b', 'c', 'd', 'e']), ['a b'])
+
+    def test_check_size(self):
+        """Tests that only 1, 2 and 3 are accepted as n-gram sizes."""
+        self.assertEqual(check_size('2'), 2)
+        for bad in (0, 4, 'x', None):
+            with self.assertRaises(ValueError):
+                check_size(bad)
+
+class TestCountNgrams(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = corpus_documents()
+        words = [w for d in self.documents for s in d for w in s]
+        self.vocab = np.array(sorted({w.lower() for w in words if w.isalpha() and len(w) >= 3}))
+
+    def test_counts_match_naive_and_are_pruned(self):
+        """Tests packed counts against a plain count, with rare n-grams pruned but kept in the total."""
+        tables = count_ngrams(self.documents, self.vocab, (2, 3))
+        for n, table in tables.items():
+            naive = naive_ngrams(self.documents, n)
+            self.assertEqual(table.total, sum(naive.values()))
+            stored = dict(zip(phrases(unpack(table.keys, n), self.vocab), table.counts.tolist()))
+            self.assertEqual(stored, {g: c for g, c in naive.items() if c >= 2})
+            self.assertTrue(np.all(np.diff(table.keys.astype(np.float64)) > 0))
+
+    def test_unknown_words_are_skipped(self):
+        """Tests that n-grams with a word outside the vocabulary are not counted."""
+        vocab = self.vocab[self.vocab != 'the']
+        tables = count_ngrams(self.documents, vocab, (2,), min_count=1)
+        naive = naive_ngrams(self.documents, 2)
+        self.assertEqual(tables[2].total, sum(c for g, c in naive.items() if 'the' not in g.split()))
+
+    def test_removed_words_break_ngrams(self):
+        """Tests that short words and punctuation between corpus words break n-grams."""
+        vocab = np.array(sorted(['state', 'union', 'strong', 'black', 'cat', 'white', 'dog']))
+        documents = [[['The', 'State', 'of', 'the', 'Union', 'is', 'strong'],
+                      ['black', 'cat', ',', 'white', 'dog']]]
+        table = count_ngrams(documents, vocab, (2,), min_count=1)[2]
+        self.assertEqual(phrases(unpack(table.keys, 2), vocab), ['black cat', 'white dog'])
+        self.assertEqual(table.total, 2)
+
+class TestNgramKeyness(unittest.TestCase):
+
+    def setUp(self):
+        documents = corpus_documents()
+        counter = Counter(w.lower() for d in documents for s in d for w in s if w.isalpha() and len(w) >= 3)
+        self.table = table_from_counter('brown', counter)
+        self.table.ngrams = count_ngrams(documents, self.table.vocab)
+        self.saved = (keyness.get_table, keyness.get_ngram_table, keyness.get_token_stream)
+        keyness.get_table = lambda name: self.table
+        keyness.get_ngram_table = lambda name, n: self.table.ngrams[n]
+        keyness.get_token_stream = lambda text, profile: tokenize_stream(text, 'keyness')
+
+    def tearDown(self):
+        keyness.get_table, keyness.get_ngram_table, keyness.get_token_stream = self.saved
+
+    def test_phrases_scored_like_words(self):
+        """Tests n-gram keyness against scoring the naive counts with the same statistics."""
+        text = "Whale ship sails. " * 20 + load_test_file()
+        result = keyness.run_request({'text': text, 'corpus': 'brown', 'ngram': 2})
+        self.assertEqual(result['ngram'], 2)
+        self.assertEqual(result['corpus']['total_ngrams'], self.table.ngrams[2].total)
+
+        stream = tokenize_stream(text, 'keyness')
+        # Removed tokens split a sentence into runs of adjacent words
+        bounds = sorted(set(stream.sentence_offsets.tolist()) | set(stream.gaps.tolist())) + [len(stream)]
+        tokens = stream.tokens()
+        user = naive_ngrams([[tokens[a:b] for a, b in zip(bounds, bounds[1:])]], 2)
+        corpus = self.table.ngrams[2]
+        stored = dict(zip(phrases(unpack(corpus.keys, 2), self.table.vocab), corpus.counts.tolist()))
+        top = phrases(unpack(corpus.most_common(500), 2), self.table.vocab)
+        candidates = list(user) + [g for g in top if g not in user]
+        expected = keyness.score_candidates(
+            candidates, np.array([user.get(g, 0) for g in candidates], dtype=np.float64),
+            np.array([stored.get(g, 0) for g in candidates]), sum(user.values()), corpus.total
+        )
+        self.assertEqual(sorted(result['keywords'], key=lambda k: k['word']),
+                         sorted(expected, key=lambda k: k['word']))
+        self.assertIn('whale ship', [k['word'] for k in result['keywords']])
+
+    def test_phrases_occur_in_text(self):
+        """Tests that every phrase counted from the text is contiguous in it."""
+        text = ("The State of the Union is strong. The Bill of Rights matters. "
+                "Union members were strong, rights matter. Black cats sleep; white dogs bark! ") * 3
+        text += load_test_file()
+        plain = ' '.join(re.findall(r"[a-z]+|[^a-z\s]", text.lower()))
+        for n in (2, 3):
+            stream = tokenize_stream(text, 'keyness')
+            found = phrases(unpack(np.unique(ngram_keys(*stream_ids(stream), n)), n), stream.vocab)
+            self.assertTrue(found)
+            for phrase in found:
+                self.assertIn(f' {phrase} ', f' {plain} ', phrase)
+            result = keyness.run_request({'text': text, 'corpus': 'brown', 'ngram': n})
+            for k in result['keywords']:
+                if k['effect_size'] > 0:
+                    self.assertIn(k['word'], found)
+        self.assertNotIn('state union', found)
+
+    def test_tables_round_trip(self):
+        """Tests that saved n-gram tables load memory-mapped with the same counts."""
+        with tempfile.TemporaryDirectory() as index_dir:
+            save_table(self.table, index_dir)
+            loaded = load_table('brown', index_dir)
+        for n, table in self.table.ngrams.items():
+            np.testing.assert_array_equal(loaded.ngrams[n].keys, table.keys)
+            np.testing.assert_array_equal(loaded.ngrams[n].counts, table.counts)
+            self.assertEqual(loaded.ngrams[n].total, table.total)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from result_cache import ResultCache, make_key
+import worker
+
+class TestResultCache(unittest.TestCase):
+
+    def test_lru_eviction_and_counters(self):
+        """Tests that the least recently used entry is evicted and counters follow lookups."""
+        cache = ResultCache(max_entries=2, cache_dir='')
+        cache.put('a', {'n': 1})
+        cache.put('b', {'n': 2})
+        self.assertEqual(cache.get('a'), {'n': 1})
+        cache.put('c', {'n': 3})
+        self.assertIsNone(cache.get('b'))
+
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 1, 1))
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_disk_tier_round_trip_and_size_limit(self):
+        """Tests that results survive a new cache instance and the directory stays under its budget."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            ResultCache(cache_dir=cache_dir).put('k', {'words': ['one', 'two']})
+            reloaded = ResultCache(cache_dir=cache_dir)
+            self.assertEqual(reloaded.get('k'), {'words': ['one', 'two']})
+            self.assertEqual(reloaded.stats()['disk_hits'], 1)
+
+            small = ResultCache(cache_dir=cache_dir, max_bytes=200)
+            for i in range(10):
+                small.put(f'key{i}', {'text': 'x' * 50})
+            total = sum(e.stat().st_size for e in os.scandir(cache_dir))
+            self.assertLessEqual(total, 200)
+            self.assertGreater(small.stats()['evictions'], 0)
+
+    def test_compute_runs_once(self):
+        """Tests that get_or_compute only calls the function on a miss."""
+        cache = ResultCache(cache_dir='')
+        calls = []
+        for _ in range(3):
+            cache.get_or_compute('k', lambda: calls.append(1) or len(calls))
+        self.assertEqual(len(calls), 1)
+
+class TestWorkerCacheKeys(unittest.TestCase):
+
+    def test_keys_depend_on_text_and_parameters(self):
+        """Tests that worker cache keys change with the text, the analysis and the corpus."""
+        analyze_key = worker.cache_key('analyze.py', 'Some text.')
+        self.assertEqual(analyze_key, worker.cache_key('analyze.py', 'Some text.'))
+        self.assertNotEqual(analyze_key, worker.cache_key('analyze.py', 'Other text.'))
+        self.assertNotEqual(analyze_key, make_key(script='semantic.py', text='Some text.'))
+
+        original = worker.table_version
+        worker.table_version = lambda name: 'v1-test'
+        try:
+            brown = worker.cache_key('keyness.py', json.dumps({'text': 'Some text.', 'corpus': 'brown'}))
+            reuters = worker.cache_key('keyness.py', json.dumps({'text': 'Some text.', 'corpus': 'reuters'}))
+            both = worker.cache_key('keyness.py', json.dumps({'text': 'Some text.', 'corpora': ['brown', 'reuters']}))
+            worker.table_version = lambda name: 'v1-rebuilt'
+            rebuilt = worker.cache_key('keyness.py', json.dumps({'text': 'Some text.', 'corpus': 'brown'}))
+        finally:
+            worker.table_version = original
+        self.assertEqual(len({brown, reuters, both, rebuilt}), 4)
+
+    def test_repeated_requests_hit_the_cache(self):
+        """Tests that the worker serves a repeated request from the cache and reports it."""
+        worker.cache = ResultCache(cache_dir='')
+        first = worker.handle_request({'id': 1, 'script': 'analyze.py', 'input': 'Hello world. Hello.'})
+        second = worker.handle_request({'id': 2, 'script': 'analyze.py', 'input': 'Hello world. Hello.'})
+        self.assertEqual(first['result'], second['result'])
+
+        stats = worker.handle_request({'id': 3, 'op': 'cache_stats'})['result']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+if __name__ == '__main__':
+    unittest.main()
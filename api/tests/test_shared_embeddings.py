@@ -0,0 +1,168 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+
+import numpy as np
+import fasttext
+
+utils_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils')
+sys.path.insert(0, utils_dir)
+
+from embedding_store import EmbeddingStore, export_store
+from shared_embeddings import attach_shared, create_shared
+
+#Load Test Data
+
+def data_path(filename="test_text.txt"):
+    """Returns the path of a file in the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, 'test_data', filename)
+
+def segment_name():
+    return f"inksight-test-{uuid.uuid4().hex[:8]}"
+
+def memory_kb(pid):
+    """Reads the Pss and Anonymous totals (kB) of a process from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup', encoding='ascii') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return fields['Pss'], fields['Anonymous']
+
+# Worker stand-in: attach (or copy), touch every vector page, then wait to be measured
+WORKER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import numpy as np
+from shared_embeddings import attach_shared
+print('imported', flush=True)
+sys.stdin.readline()
+vectors = attach_shared(sys.argv[2]).store.vectors
+if sys.argv[3] == 'copy':
+    vectors = np.array(vectors)
+print(float(vectors.sum(dtype=np.float64)), flush=True)
+sys.stdin.readline()
+"""
+
+class TestSharedEmbeddings(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.model_path = os.path.join(cls.tmp.name, 'tiny.bin')
+        model = fasttext.train_unsupervised(
+            data_path(), model='skipgram', dim=16, epoch=1, minCount=1,
+            bucket=5000, thread=1, verbose=0
+        )
+        model.save_model(cls.model_path)
+        cls.store_path = export_store(cls.model_path, os.path.join(cls.tmp.name, 'store'), with_subwords=True)
+        cls.words = ['town', 'morning', 'fountain', 'unseenword', 'xq']
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def test_shared_store_matches_disk_store(self):
+        """Tests that vectors shared from a store directory, or straight from a .bin, equal the store's."""
+        expected = EmbeddingStore(self.store_path).get_vectors(self.words)
+        for source in (self.store_path, self.model_path):
+            with self.subTest(source=os.path.basename(source)):
+                owner = create_shared(source, segment_name())
+                try:
+                    vectors, valid = attach_shared(owner.name).store.get_vectors(self.words)
+                    np.testing.assert_array_equal(vectors, expected[0])
+                    self.assertEqual(valid, expected[1])
+                    self.assertFalse(owner.store.vectors.flags.writeable)
+                finally:
+                    owner.release()
+
+    def test_lifecycle(self):
+        """Tests that a worker exiting keeps the segment and the owner's release removes it."""
+        owner = create_shared(self.store_path, segment_name())
+        try:
+            code = f"import sys; sys.path.insert(0, {utils_dir!r}); from shared_embeddings import attach_shared; " \
+                   f"s = attach_shared({owner.name!r}); print(len(s.store.vocab)); s.release()"
+            for _ in range(2):
+                out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+                self.assertEqual(int(out.stdout), len(owner.store.vocab))
+                self.assertNotIn('leaked', out.stderr)
+        finally:
+            owner.release()
+        with self.assertRaises(FileNotFoundError):
+            attach_shared(owner.name)
+
+    def test_worker_attaches_named_segment(self):
+        """Tests that the attach_embeddings op makes a running worker load the model from the segment."""
+        import semantic
+        import worker
+        owner = create_shared(self.store_path, segment_name())
+        saved = semantic.shared_embeddings
+        self.addCleanup(semantic.load_model.cache_clear)
+        try:
+            response = worker.handle_request({'id': 1, 'op': 'attach_embeddings', 'name': owner.name})
+            self.assertEqual(response['result'], {'name': owner.name})
+            self.assertIs(semantic.load_model(), attach_shared(owner.name).store)
+            self.assertEqual(semantic.model_version(), owner.version)
+        finally:
+            semantic.shared_embeddings = saved
+            owner.release()
+
+    @unittest.skipUnless(os.path.exists('/proc/self/smaps_rollup'), 'needs /proc/<pid>/smaps_rollup')
+    def test_memory_stays_flat_as_workers_are_added(self):
+        """Tests that attached workers add no private copy, unlike workers that copy the matrix."""
+        rows, dim = 16384, 1024  # 64 MB of float32
+        store_dir = os.path.join(self.tmp.name, 'big')
+        os.makedirs(store_dir)
+        vocab = np.array([f'w{i:06d}'.encode() for i in range(rows)])
+        np.save(os.path.join(store_dir, 'vocab.npy'), vocab)
+        np.save(os.path.join(store_dir, 'rows.npy'), np.arange(rows, dtype=np.int32))
+        np.save(os.path.join(store_dir, 'vectors.npy'),
+                np.random.default_rng(0).random((rows, dim), dtype=np.float32))
+        with open(os.path.join(store_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'format_version': 1, 'dim': dim, 'dtype': 'float32', 'vocab_size': rows}, f)
+        matrix_kb = rows * dim * 4 // 1024
+
+        owner = create_shared(store_dir, segment_name())
+        try:
+            def run_workers(count, mode):
+                procs = [subprocess.Popen([sys.executable, '-c', WORKER, utils_dir, owner.name, mode],
+                                          stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+                         for _ in range(count)]
+                try:
+                    before = []
+                    for p in procs:
+                        p.stdout.readline()
+                        before.append(memory_kb(p.pid))
+                    for p in procs:
+                        p.stdin.write('go\n')
+                        p.stdin.flush()
+                    for p in procs:
+                        p.stdout.readline()
+                    after = [memory_kb(p.pid) for p in procs]
+                finally:
+                    for p in procs:
+                        p.communicate('exit\n')
+                pss = sum(a[0] - b[0] for a, b in zip(after, before))
+                anonymous = [a[1] - b[1] for a, b in zip(after, before)]
+                return pss, anonymous
+
+            for count in (1, 3):
+                pss, anonymous = run_workers(count, 'attach')
+                # Shared pages are split between the processes mapping them
+                self.assertLess(pss, matrix_kb * 1.2)
+                self.assertTrue(all(a < matrix_kb * 0.1 for a in anonymous), anonymous)
+
+            # Control: a private copy shows up in full
+            _, anonymous = run_workers(1, 'copy')
+            self.assertGreater(anonymous[0], matrix_kb * 0.9)
+        finally:
+            owner.release()
+
+if __name__ == '__main__':
+    unittest.main()
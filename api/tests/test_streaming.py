@@ -0,0 +1,165 @@
+import unittest
+import io
+import json
+import os
+import sys
+import zlib
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import semantic
+import worker
+from semantic import analyze_semantic_stages, semantic_output, semantic_stages
+
+#Load Test Data
+
+def load_test_file(filename="test_text.txt"):
+    """Reads the content of a text file from the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(current_dir, 'test_data', filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Test file not found at expected path: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+class WordVectors:
+    """Deterministic stand-in for the FastText vectors (one seeded vector per word)."""
+
+    def __init__(self):
+        self.lookups = []
+
+    def get_vectors(self, words):
+        self.lookups.append(len(words))
+        vectors = [np.random.default_rng(zlib.crc32(w.encode())).normal(size=8) for w in words]
+        return np.array(vectors, dtype=np.float32), list(words)
+
+class TestSemanticStages(unittest.TestCase):
+
+    def setUp(self):
+        self.text = load_test_file()
+        self.model = WordVectors()
+        patches = [patch.object(semantic, 'load_model', return_value=self.model),
+                   patch.object(semantic, 'load_index', return_value=None)]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_stages_arrive_in_order_and_final_matches(self):
+        """Tests tokens, provisional and final stages, the last equal to the one-shot result."""
+        stages = [s for s in semantic_stages(self.text, sample_size=10) if s['stage'] != 'progress']
+        self.assertEqual([s['stage'] for s in stages], ['tokens', 'provisional', 'final'])
+        self.assertGreater(stages[0]['unique_words'], 10)
+        self.assertEqual(stages[1]['sample_words'], 10)
+        self.assertIn('semantic_summary', stages[1])
+        final = {k: v for k, v in stages[2].items() if k != 'stage'}
+        self.assertEqual(final, semantic_output(self.text))
+
+    def test_small_vocabulary_skips_provisional(self):
+        """Tests that no provisional stage is computed when the sample would be the whole text."""
+        stages = [s['stage'] for s in semantic_stages(self.text, sample_size=100000)]
+        self.assertEqual(stages, ['tokens', 'progress', 'final'])
+        self.assertEqual([s['stage'] for s in semantic_stages('')], ['tokens', 'final'])
+
+    def test_closing_stops_remaining_work(self):
+        """Tests that closing the generator after a stage skips the rest of the analysis."""
+        stages = analyze_semantic_stages(self.text, sample_size=10)
+        self.assertEqual(next(stages)['stage'], 'tokens')
+        self.assertEqual(next(stages)['stage'], 'provisional')
+        stages.close()
+        self.assertEqual(self.model.lookups, [10])
+
+    def test_progress_checkpoints_precede_clustering(self):
+        """Tests that progress stages come after the vector lookup and choosing k, before the fit."""
+        with patch.object(semantic, 'AUTO_K', True), \
+                patch.object(semantic, 'cluster_words', side_effect=AssertionError('clustered')) as cluster:
+            stages = analyze_semantic_stages(self.text, sample_size=100000)
+            self.assertEqual(next(stages)['stage'], 'tokens')
+            self.assertEqual(next(stages), {'stage': 'progress', 'step': 'word_vectors'})
+            self.assertEqual(next(stages), {'stage': 'progress', 'step': 'choose_k'})
+            stages.close()
+        cluster.assert_not_called()
+
+class TestWorkerStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.text = load_test_file()
+        patches = [patch.object(semantic, 'load_model', return_value=WordVectors()),
+                   patch.object(semantic, 'load_index', return_value=None),
+                   patch.object(worker, 'cache', worker.ResultCache(max_entries=8)),
+                   patch.dict(worker.STREAM_HANDLERS, {
+                       'semantic.py': lambda raw: semantic_stages(raw, sample_size=10)
+                   })]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_stream_lines_precede_result(self):
+        """Tests that a streamed request answers with stage lines, then the usual result."""
+        stdin = io.StringIO(''.join(json.dumps(r) + '\n' for r in [
+            {"id": 1, "script": "semantic.py", "input": self.text, "stream": True},
+            {"id": 2, "script": "semantic.py", "input": self.text},
+        ]))
+        stdout = io.StringIO()
+        worker.serve(stdin, stdout)
+        lines = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([line['stage']['stage'] for line in lines[:2]], ['tokens', 'provisional'])
+        self.assertEqual([line['id'] for line in lines], [1, 1, 1, 2])
+        self.assertEqual(lines[2]['result'], lines[3]['result'])
+
+    def test_cancelled_request_stops_and_is_not_cached(self):
+        """Tests that a cancel stops a streamed request after its current stage."""
+        emitted = []
+        request = {"id": 7, "script": "semantic.py", "input": self.text, "stream": True}
+        response = worker.handle_request(request, emit=emitted.append, cancelled=lambda: bool(emitted))
+        self.assertTrue(response['cancelled'])
+        self.assertEqual([s['stage'] for s in emitted], ['tokens'])
+        self.assertEqual(worker.cache.stats()['entries'], 0)
+
+    def test_cancel_after_word_vectors_skips_clustering(self):
+        """Tests that a cancel arriving during the vector lookup stops before the final fit."""
+        checks = []
+        def cancelled():
+            # Not yet cancelled when checked after tokens; cancelled by the next check
+            checks.append(1)
+            return len(checks) > 1
+        emitted = []
+        request = {"id": 11, "script": "semantic.py", "input": self.text, "stream": True}
+        with patch.dict(worker.STREAM_HANDLERS, {'semantic.py': lambda raw: semantic_stages(raw, sample_size=100000)}), \
+                patch.object(semantic, 'cluster_words', side_effect=AssertionError('clustered')) as cluster:
+            response = worker.handle_request(request, emit=emitted.append, cancelled=cancelled)
+        self.assertTrue(response['cancelled'])
+        self.assertEqual([s['stage'] for s in emitted], ['tokens'])
+        cluster.assert_not_called()
+
+    def test_warm_started_results_are_not_cached(self):
+        """Tests that incremental semantic results are not cached, so cached results are cold ones."""
+        for stream in (False, True):
+            request = {"id": 8, "script": "semantic.py", "input": self.text, "doc_id": "doc", "stream": stream}
+            self.assertIn('result', worker.handle_request(request, emit=lambda stage: None))
+            self.assertEqual(worker.cache.stats()['entries'], 0)
+        cold = worker.handle_request({"id": 9, "script": "semantic.py", "input": self.text})
+        self.assertEqual(worker.cache.stats()['entries'], 1)
+        self.assertEqual(worker.handle_request({"id": 10, "script": "semantic.py", "input": self.text,
+                                                "doc_id": "doc"})['result'], cold['result'])
+
+    def test_cancels_only_mark_pending_requests(self):
+        """Tests that the inbox applies cancels to queued ids and ignores unknown ones."""
+        inbox = worker.Inbox(io.StringIO(''.join(json.dumps(r) + '\n' for r in [
+            {"id": 1, "script": "analyze.py", "input": "a"},
+            {"op": "cancel", "id": 1},
+            {"op": "cancel", "id": 99},
+        ])))
+        requests = list(inbox)
+        self.assertEqual([r['id'] for r, _ in requests], [1])
+        self.assertTrue(inbox.is_cancelled(1))
+        self.assertFalse(inbox.is_cancelled(99))
+        inbox.done(1)
+        self.assertEqual(inbox.cancelled, set())
+
+if __name__ == '__main__':
+    unittest.main()
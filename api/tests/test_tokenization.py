@@ -0,0 +1,109 @@
+import unittest
+import glob
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+from tokenization import TokenCache, TokenStream, tokenize_stream
+from analyze import analyze_text, analyze_tokens
+
+#Load Test Data
+
+def load_test_file(filename="test_text.txt"):
+    """Reads the content of a text file from the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(current_dir, 'test_data', filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Test file not found at expected path: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def punkt_available():
+    try:
+        from nltk import sent_tokenize
+        sent_tokenize("Check. Punkt.")
+        return True
+    except LookupError:
+        return False
+
+class TestTokenization(unittest.TestCase):
+
+    def setUp(self):
+        self.text = load_test_file() + " Don't café x1abc under_score ab. Wow!!"
+
+    def test_regex_profiles_match_original_tokenizers(self):
+        """Tests that the words and semantic profiles produce the original token lists."""
+        self.assertEqual(tokenize_stream(self.text, 'words').tokens(),
+                         re.findall(r"[A-Za-z']+", self.text.lower()))
+        self.assertEqual(tokenize_stream(self.text, 'semantic').tokens(),
+                         re.findall(r'\b[a-zA-Z]{3,}\b', self.text.lower()))
+
+    @unittest.skipUnless(punkt_available(), "NLTK punkt_tab data not installed")
+    def test_keyness_profile_matches_word_tokenize(self):
+        """Tests that the keyness profile equals the filtered word_tokenize output."""
+        from nltk import word_tokenize
+        expected = [w.lower() for w in word_tokenize(self.text) if w.isalpha() and len(w) >= 3]
+        self.assertEqual(tokenize_stream(self.text, 'keyness').tokens(), expected)
+
+    @unittest.skipUnless(punkt_available(), "NLTK punkt_tab data not installed")
+    def test_fast_keyness_tokenizer_matches_nltk(self):
+        """Tests that the fast keyness tokenizer gives the NLTK tokens on tricky text."""
+        tricky = [
+            "He cannot, gonna wanna. Gimme lemme? Gotta: Cannot",
+            "Mr. Smith met U.S. officials. It ended. '",
+            "\"Hello,\" she said. \"Goodbye.\" (Really.) [end.] world.\" ''",
+            "'Tis more'n d'ye ... etc... café naïve. e-mail #tag @user 50% *star* -- — x",
+            "dogs' ‘single’ “double” «fr» O'Neil I'm can't. a:b 3,000 x: ab\x00cd end.",
+        ]
+        for text in tricky + [self.text]:
+            nltk_stream = tokenize_stream(text, 'keyness', method='nltk')
+            fast_stream = tokenize_stream(text, 'keyness', method='fast')
+            self.assertEqual(fast_stream.tokens(), nltk_stream.tokens())
+            self.assertEqual(fast_stream.sentence_offsets.tolist(), nltk_stream.sentence_offsets.tolist())
+            self.assertEqual(fast_stream.gaps.tolist(), nltk_stream.gaps.tolist())
+
+    @unittest.skipUnless(punkt_available(), "NLTK punkt_tab data not installed")
+    def test_fast_keyness_tokenizer_matches_nltk_on_samples(self):
+        """Tests the fast keyness tokenizer against NLTK on the test data and sample texts."""
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        paths = glob.glob(os.path.join(current_dir, 'test_data', '*.txt'))
+        paths += glob.glob(os.path.join(current_dir, '..', '..', 'fake-text-samples', '*.txt'))
+        paths += glob.glob(os.path.join(current_dir, '..', '..', 'fake-text-samples', '*.md'))
+        for path in paths:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+            with self.subTest(path=os.path.basename(path)):
+                fast_stream = tokenize_stream(text, 'keyness', method='fast')
+                nltk_stream = tokenize_stream(text, 'keyness', method='nltk')
+                self.assertEqual(fast_stream.tokens(), nltk_stream.tokens())
+                self.assertEqual(fast_stream.gaps.tolist(), nltk_stream.gaps.tolist())
+
+    def test_stream_drives_word_statistics(self):
+        """Tests that analyze.py results are identical when computed from a token stream."""
+        for text in (self.text, "", "One. Two three!? ... four"):
+            self.assertEqual(analyze_tokens(tokenize_stream(text, 'words')), analyze_text(text))
+
+    def test_cache_reuses_streams(self):
+        """Tests that repeated requests hit the cache in memory and on disk."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = TokenCache(max_entries=2, cache_dir=cache_dir)
+            first = cache.get(self.text, 'semantic')
+            self.assertIs(cache.get(self.text, 'semantic'), first)
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            reloaded = TokenCache(cache_dir=cache_dir).get(self.text, 'semantic')
+            self.assertIsInstance(reloaded, TokenStream)
+            self.assertEqual(reloaded.tokens(), first.tokens())
+            self.assertEqual(reloaded.sentence_offsets.tolist(), first.sentence_offsets.tolist())
+
+            keyness_stream = cache.get(self.text, 'keyness')
+            reloaded = TokenCache(cache_dir=cache_dir).get(self.text, 'keyness')
+            self.assertEqual(reloaded.gaps.tolist(), keyness_stream.gaps.tolist())
+
+if __name__ == '__main__':
+    unittest.main()
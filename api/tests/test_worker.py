@@ -0,0 +1,107 @@
+import unittest
+import io
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'utils'))
+
+import corpus_index
+import keyness
+import worker
+from corpora import CORPORA
+from corpus_index import save_table, table_from_counter
+from custom_corpora import add_documents, register
+from worker import serve
+
+#Load Test Data
+
+def load_test_file(filename="test_text.txt"):
+    """Reads the content of a text file from the test_data directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    file_path = os.path.join(current_dir, 'test_data', filename)
+
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Test file not found at expected path: {file_path}")
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def run_requests(requests):
+    """Feeds request dicts through the worker loop and returns the decoded responses."""
+    stdin = io.StringIO(''.join(json.dumps(r) + '\n' for r in requests))
+    stdout = io.StringIO()
+    serve(stdin, stdout)
+    return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+class TestWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.text = load_test_file()
+
+    def test_responses_keep_request_ids(self):
+        """Tests that every request gets exactly one response carrying its id."""
+        responses = run_requests([
+            {"id": 1, "script": "analyze.py", "input": self.text},
+            {"id": "b", "script": "analyze.py", "input": ""},
+        ])
+        self.assertEqual([r["id"] for r in responses], [1, "b"])
+        self.assertIn("word_count", responses[0]["result"])
+        self.assertEqual(responses[1]["result"]["word_count"], 0)
+
+    def test_errors_are_reported_per_request(self):
+        """Tests that a failing request returns an error without stopping the worker."""
+        responses = run_requests([
+            {"id": 1, "script": "missing.py", "input": ""},
+            {"id": 2, "script": "keyness.py", "input": json.dumps({"text": "x", "corpus": "nope"})},
+            {"id": 3, "script": "analyze.py", "input": "One. Two."},
+        ])
+        self.assertIn("error", responses[0])
+        self.assertIn("Unknown corpus", responses[1]["error"])
+        self.assertEqual(responses[2]["result"]["sentence_count"], 2)
+
+class TestWorkerCacheKeys(unittest.TestCase):
+
+    def setUp(self):
+        self.text = load_test_file()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.index_dir = tmp.name
+        # Small prebuilt tables for the built-in corpora, all in a temporary index
+        words = self.text.lower().split()
+        for name in CORPORA:
+            save_table(table_from_counter(name, Counter(words + [name] * 20)), self.index_dir)
+        index = {'index_dir': self.index_dir}
+        patches = [patch.object(worker, 'cache', worker.ResultCache(max_entries=8)),
+                   patch.object(worker, 'default_corpora', lambda: corpus_index.default_corpora(**index)),
+                   patch.object(worker, 'table_version', lambda name: corpus_index.table_version(name, **index)),
+                   patch.object(keyness, 'default_corpora', lambda: corpus_index.default_corpora(**index)),
+                   patch.object(keyness, 'table_version', lambda name: corpus_index.table_version(name, **index)),
+                   patch.object(keyness, 'corpus_info', lambda name: corpus_index.corpus_info(name, **index)),
+                   patch.object(keyness, 'get_table', lambda name: corpus_index.load_corpus(name, **index))]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def compare_all(self):
+        request = {"id": 1, "script": "keyness.py", "input": json.dumps({"text": self.text, "corpora": []})}
+        return worker.handle_request(request)['result']
+
+    def test_all_corpora_results_follow_custom_corpora(self):
+        """Tests that an all-corpora request is not served stale after a custom corpus is filled or grows."""
+        register('essays', index_dir=self.index_dir)
+        self.assertEqual(list(self.compare_all()['results']), list(CORPORA))
+
+        add_documents('essays', iter(["The town fountain was quiet that morning."]), index_dir=self.index_dir)
+        first = self.compare_all()['results']
+        self.assertEqual(list(first), list(CORPORA) + ['essays'])
+
+        add_documents('essays', iter(["Whales, whales and more whales."] * 3), index_dir=self.index_dir)
+        grown = self.compare_all()['results']['essays']
+        self.assertGreater(grown['corpus']['total_words'], first['essays']['corpus']['total_words'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,45 +1,129 @@
 #!/usr/bin/env python3
-"""Analyze text to count words, find popular words, and estimate reading time."""
+"""Analyze text to count words, find popular words, and estimate reading time.
+
+Text is processed in chunks so very large uploads only keep the word
+counts in memory, not several copies of the document.
+"""
 
 import sys
 import json
 import re
 from collections import Counter
 
-# Read the text from input
-text = sys.stdin.read() or ""
+from instrumentation import span, traced
+
+# Characters read from stdin per chunk
+CHUNK_SIZE = 1 << 20
+
+WORD_PATTERN = re.compile(r"[A-Za-z']+")
+WORD_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'"
+SENTENCE_END = re.compile(r'[.!?]')
+
+
+class TextStats:
+    """Incremental word and sentence counter.
+
+    Words and sentences may be split across chunk edges: an unfinished word
+    at the end of a chunk is carried into the next one, and a sentence counts
+    once its text (on either side of the edge) contains non-whitespace.
+    """
+
+    def __init__(self):
+        self.counter = Counter()
+        self.sentence_count = 0
+        self._carry = ''
+        self._open_sentence = False
+
+    def feed(self, chunk):
+        """Takes a chunk of text. Updates word counts and sentence count."""
+        # Break text into individual words (lowercase letters and apostrophes only)
+        lowered = self._carry + chunk.lower()
+        body = lowered.rstrip(WORD_CHARS)
+        self._carry = lowered[len(body):]
+        self.counter.update(WORD_PATTERN.findall(body))
+
+        # Count sentences by splitting on periods, exclamation marks, and question marks
+        parts = SENTENCE_END.split(chunk)
+        for part in parts[:-1]:
+            if self._open_sentence or part.strip():
+                self.sentence_count += 1
+            self._open_sentence = False
+        self._open_sentence = self._open_sentence or bool(parts[-1].strip())
+
+    def finish(self):
+        """Flushes the last word and sentence. Returns the analysis result dict."""
+        if self._carry:
+            self.counter[self._carry] += 1
+            self._carry = ''
+        if self._open_sentence:
+            self.sentence_count += 1
+            self._open_sentence = False
+        return build_result(self.counter, self.sentence_count)
+
+
+def build_result(counter, sentence_count):
+    """Takes word Counter and sentence count. Derives the summary statistics.
+
+    Returns dict with word count, top words, sentence stats and reading time.
+    """
+    total = counter.total()
+
+    # Get the 5 most common words
+    top_words = [{"w": word, "n": count} for word, count in counter.most_common(5)]
+
+    # Calculate average words per sentence
+    avg_sentence_length = round(total / sentence_count, 1) if sentence_count > 0 else 0
+
+    # Estimate reading time (assumes 200 words per minute)
+    minutes = total / 200
+    if minutes < 1:
+        reading_time = {"value": int(minutes * 60), "unit": "seconds"}
+    else:
+        reading_time = {"value": round(minutes, 1), "unit": "minutes"}
+
+    # Package everything into a result dictionary (good for json conversion)
+    return {
+        "word_count": total,
+        "top": top_words,
+        "sentence_count": sentence_count,
+        "avg_sentence_length": avg_sentence_length,
+        "reading_time": reading_time
+    }
+
+
+def analyze_text(text):
+    """Takes text as argument. Counts words and sentences.
+
+    Returns dict with word count, top words, sentence stats and reading time.
+    """
+    stats = TextStats()
+    stats.feed(text)
+    return stats.finish()
 
-# Break text into individual words (lowercase letters and apostrophes only)
-tokens = re.findall(r"[A-Za-z']+", text.lower())
 
-# Count how many times each word appears
-counter = Counter(tokens)
-total = counter.total()
+def analyze_tokens(token_stream):
+    """Takes a 'words' profile TokenStream (see tokenization.py).
 
-# Get the 5 most common words
-top_words = [{"w": word, "n": count} for word, count in counter.most_common(5)]
+    Returns the same dict as analyze_text without re-tokenizing.
+    """
+    with span('summarize', tokens=len(token_stream), vocab=len(token_stream.vocab)):
+        return build_result(token_stream.counter(), token_stream.sentence_count)
 
-# Count sentences by splitting on periods, exclamation marks, and question marks
-sentence_count = sum(1 for s in re.split(r'[.!?]+', text) if s.strip())
 
-# Calculate average words per sentence
-avg_sentence_length = round(total / sentence_count, 1) if sentence_count > 0 else 0
+def analyze_stream(stream, chunk_size=CHUNK_SIZE):
+    """Takes a text stream. Analyzes it chunk by chunk.
 
-# Estimate reading time (assumes 200 words per minute)
-minutes = total / 200
-if minutes < 1:
-    reading_time = {"value": int(minutes * 60), "unit": "seconds"}
-else:
-    reading_time = {"value": round(minutes, 1), "unit": "minutes"}
+    Peak memory depends on vocabulary size, not document size.
+    """
+    stats = TextStats()
+    with span('count') as s:
+        for chunk in iter(lambda: stream.read(chunk_size), ''):
+            stats.feed(chunk)
+        result = stats.finish()
+        s.count(tokens=result['word_count'], vocab=len(stats.counter))
+    return result
 
-# Package everything into a result dictionary (good for json conversion)
-result = {
-    "word_count": total,
-    "top": top_words,
-    "sentence_count": sentence_count,
-    "avg_sentence_length": avg_sentence_length,
-    "reading_time": reading_time
-}
 
-# Output the result dictionary as JSON
-print(json.dumps(result, ensure_ascii=False))
+if __name__ == '__main__':
+    # Read the text from input and output the result dictionary as JSON
+    print(json.dumps(traced('analyze', analyze_stream, sys.stdin), ensure_ascii=False))
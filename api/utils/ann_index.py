@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""Approximate nearest-vocabulary search for semantic cluster labels.
+
+Finding the vocabulary word closest to a cluster centroid by brute force
+means scanning every row of the embedding store per centroid. This module
+builds an IVF-PQ index over the store with NumPy only:
+
+    IVF  unit-length vectors are split into NLIST lists by k-means; a query
+         only scans the NPROBE lists whose centroids are nearest
+    PQ   each vector's residual to its list centroid is stored as M one-byte
+         codes (one per sub-vector), so a list is scanned with table lookups
+    rerank  the best RERANK candidates are re-scored exactly with the store
+         vectors before the top k are returned
+
+Raising NPROBE and RERANK trades latency for recall (see
+api/benchmarks/ann_recall.py). Only lowercase alphabetic words of 3+
+letters among the most frequent TOP_N store rows are indexed, since those
+are the words that make readable labels:
+
+    models/embeddings/cc.en.300/ann/
+        meta.json        format version, settings and the store it was built from
+        centroids.npy    (nlist, dim) list centroids
+        codebooks.npy    (m, ksub, dim / m) sub-vector centroids
+        codes.npy        (count, m) uint8 codes, grouped by list
+        ids.npy          store row of each code
+        words.npy        UTF-8 word of each code
+        offsets.npy      start of each list in codes (nlist + 1 entries)
+
+The index lives inside the store directory, so re-exporting the store
+removes a stale index.
+Usage: python api/utils/ann_index.py [--store DIR] [--top-n 200000] [--nlist N] [--m M]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from embedding_store import EmbeddingStore, STORE_PATH
+
+FORMAT_VERSION = 1
+
+# Lists scanned per query and exact re-scores (higher is slower but more accurate)
+NPROBE = int(os.environ.get('INKSIGHT_ANN_NPROBE', 8))
+RERANK = int(os.environ.get('INKSIGHT_ANN_RERANK', 64))
+
+# Related words suggested per cluster (0 disables cluster labelling)
+RELATED_WORDS = int(os.environ.get('INKSIGHT_RELATED_WORDS', 5))
+
+# Most frequent store rows considered for the index
+TOP_N = 200000
+
+LABEL_WORD = re.compile(rb'^[a-z]{3,}$')
+
+RANDOM_STATE = 42
+
+# Rows per block when computing distances (bounds temporary memory)
+BLOCK_ROWS = 65536
+
+
+def normalize(vectors):
+    """Takes float rows. Returns them scaled to unit length (zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def assign(vectors, centers):
+    """Takes rows and centroids. Returns index of the nearest centroid per row."""
+    center_norms = (centers ** 2).sum(axis=1)
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        block = vectors[start:start + BLOCK_ROWS]
+        labels[start:start + len(block)] = np.argmin(center_norms - 2 * block @ centers.T, axis=1)
+    return labels
+
+
+def kmeans(vectors, k, iterations=20, rng=None):
+    """Takes rows and k. Runs Lloyd's k-means from randomly chosen rows.
+
+    Empty clusters are restarted from random rows. Returns (k, dim) centroids.
+    """
+    rng = rng or np.random.default_rng(RANDOM_STATE)
+    k = min(k, len(vectors))
+    centers = vectors[rng.choice(len(vectors), size=k, replace=False)].astype(np.float32)
+    for _ in range(iterations):
+        labels = assign(vectors, centers)
+        sizes = np.bincount(labels, minlength=k)
+        filled = sizes > 0
+        # Rows sorted by cluster; each filled cluster is one contiguous segment
+        order = np.argsort(labels, kind='stable')
+        starts = (np.cumsum(sizes) - sizes)[filled]
+        centers[filled] = np.add.reduceat(vectors[order], starts, axis=0) / sizes[filled, None]
+        if not filled.all():
+            centers[~filled] = vectors[rng.choice(len(vectors), size=int((~filled).sum()), replace=False)]
+    return centers
+
+
+def choose_m(dim, target=32):
+    """Takes vector dimension. Returns the largest sub-vector count <= target dividing it."""
+    return max(m for m in range(1, min(target, dim) + 1) if dim % m == 0)
+
+
+def label_rows(store, top_n=TOP_N):
+    """Takes an EmbeddingStore. Returns (store rows, words) of the indexable vocabulary.
+
+    Store rows are in FastText frequency order, so the top-N is a row range.
+    """
+    vocab = np.asarray(store.vocab)
+    rows = np.asarray(store.rows)
+    keep = (rows < top_n) & np.array([bool(LABEL_WORD.match(w)) for w in vocab.tolist()], dtype=bool)
+    order = np.argsort(rows[keep], kind='stable')
+    return rows[keep][order].astype(np.int64), vocab[keep][order]
+
+
+def store_vectors(store, rows):
+    """Takes an EmbeddingStore and row ids. Returns their unit-length float32 vectors."""
+    rows = np.asarray(rows, dtype=np.int64)
+    out = np.empty((len(rows), store.get_dimension()), dtype=np.float32)
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block = rows[start:start + BLOCK_ROWS]
+        out[start:start + len(block)] = normalize(store._rows_to_float(store.vectors, store.scales, block))
+    return out
+
+
+def build_index(store, output=None, top_n=TOP_N, nlist=None, m=None, ksub=256,
+                sample=50000, iterations=20):
+    """Takes an EmbeddingStore and index settings. Trains and writes an IVF-PQ index.
+
+    nlist defaults to about 4 * sqrt(count) lists. Returns path of the index.
+    """
+    output = output or os.path.join(store.path, 'ann')
+    rng = np.random.default_rng(RANDOM_STATE)
+    rows, words = label_rows(store, top_n)
+    if len(rows) == 0:
+        raise ValueError("No indexable words in the embedding store")
+    vectors = store_vectors(store, rows)
+    dim = vectors.shape[1]
+    nlist = min(nlist or int(4 * np.sqrt(len(rows))), len(rows))
+    m = m or choose_m(dim)
+    if dim % m:
+        raise ValueError(f"Sub-vector count {m} must divide the dimension {dim}")
+    dsub = dim // m
+
+    # Train both quantizers on a sample, then encode every row
+    train = vectors[np.sort(rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False))]
+    centroids = kmeans(train, nlist, iterations, rng)
+    nlist = len(centroids)
+    residuals = train - centroids[assign(train, centroids)]
+    ksub = min(ksub, len(train))
+    codebooks = np.stack([
+        kmeans(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), ksub, iterations, rng)
+        for j in range(m)
+    ])
+
+    lists = assign(vectors, centroids)
+    residuals = vectors - centroids[lists]
+    codes = np.stack([assign(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), codebooks[j])
+                      for j in range(m)], axis=1).astype(np.uint8)
+    order = np.argsort(lists, kind='stable')
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(lists, minlength=nlist)))).astype(np.int64)
+
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.ann-', dir=parent)
+    np.save(os.path.join(tmp_dir, 'centroids.npy'), centroids)
+    np.save(os.path.join(tmp_dir, 'codebooks.npy'), codebooks.astype(np.float32))
+    np.save(os.path.join(tmp_dir, 'codes.npy'), codes[order])
+    np.save(os.path.join(tmp_dir, 'ids.npy'), rows[order].astype(np.int32))
+    np.save(os.path.join(tmp_dir, 'words.npy'), words[order])
+    np.save(os.path.join(tmp_dir, 'offsets.npy'), offsets)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'format_version': FORMAT_VERSION,
+            'store_vocab_size': store.meta['vocab_size'],
+            'dim': dim,
+            'count': len(rows),
+            'top_n': top_n,
+            'nlist': nlist,
+            'm': m,
+            'ksub': ksub,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }, f, indent=2)
+
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    os.replace(tmp_dir, output)
+    return output
+
+
+class AnnIndex:
+    """Memory-mapped IVF-PQ index over the embedding store vocabulary."""
+
+    def __init__(self, path, store):
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported ANN index format in {path}")
+        if self.meta['store_vocab_size'] != store.meta['vocab_size'] or self.meta['dim'] != store.get_dimension():
+            raise ValueError(f"ANN index in {path} was built for a different embedding store")
+        self.path = path
+        self.store = store
+        self.centroids = np.load(os.path.join(path, 'centroids.npy'))
+        self.codebooks = np.load(os.path.join(path, 'codebooks.npy'))
+        self.codes = np.load(os.path.join(path, 'codes.npy'), mmap_mode='r')
+        self.ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode='r')
+        self.words = np.load(os.path.join(path, 'words.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, 'offsets.npy'))
+        self.codebook_norms = (self.codebooks ** 2).sum(axis=-1)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def candidates(self, query, nprobe):
+        """Takes a unit query vector. Scans the nprobe nearest lists with PQ codes.
+
+        Returns (positions in the index, approximate squared distances).
+        """
+        nprobe = min(nprobe, len(self.centroids))
+        coarse = ((self.centroids - query) ** 2).sum(axis=1)
+        probe = np.argpartition(coarse, nprobe - 1)[:nprobe]
+
+        m, ksub, dsub = self.codebooks.shape
+        # Distance of every sub-vector of (query - list centroid) to every code, per list:
+        # |r - c|^2 = |r|^2 - 2 r.c + |c|^2, where the |r|^2 terms sum to the coarse distance
+        residuals = (query - self.centroids[probe]).reshape(len(probe), m, dsub).transpose(1, 0, 2)
+        dots = np.matmul(residuals, self.codebooks.transpose(0, 2, 1)).transpose(1, 0, 2)
+        tables = self.codebook_norms[None] - 2 * dots
+        tables[:, 0, :] += coarse[probe, None]
+
+        starts, ends = self.offsets[probe], self.offsets[probe + 1]
+        sizes = ends - starts
+        if not sizes.sum():
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        # Positions of every code in the probed lists, and which table each uses
+        positions = np.repeat(ends - sizes.cumsum(), sizes) + np.arange(sizes.sum())
+        table_of = np.repeat(np.arange(len(probe)), sizes)
+        codes = np.asarray(self.codes[positions])
+        distances = tables[table_of[:, None], np.arange(m)[None, :], codes].sum(axis=1)
+        return positions, distances
+
+    def search(self, query, k=10, nprobe=NPROBE, rerank=RERANK):
+        """Takes a query vector. Finds its approximate nearest vocabulary words.
+
+        The rerank best PQ candidates are re-scored with exact cosine similarity.
+        Returns list of (word, cosine similarity), most similar first.
+        """
+        query = normalize(query)
+        positions, distances = self.candidates(query, nprobe)
+        keep = min(len(positions), max(rerank, k))
+        if keep == 0:
+            return []
+        best = positions[np.argpartition(distances, keep - 1)[:keep]]
+        sims = store_vectors(self.store, self.ids[best]) @ query
+        top = np.argsort(-sims, kind='stable')[:k]
+        return [(self.words[best[i]].decode('utf-8'), float(sims[i])) for i in top.tolist()]
+
+
+def exact_search(index, query, k=10):
+    """Takes an AnnIndex and a query vector. Scans every indexed word exactly.
+
+    Used to measure recall. Returns list of (word, cosine similarity).
+    """
+    query = normalize(query)
+    sims = np.empty(len(index), dtype=np.float32)
+    for start in range(0, len(index), BLOCK_ROWS):
+        sims[start:start + BLOCK_ROWS] = store_vectors(index.store, index.ids[start:start + BLOCK_ROWS]) @ query
+    top = np.argsort(-sims, kind='stable')[:k]
+    return [(index.words[i].decode('utf-8'), float(sims[i])) for i in top.tolist()]
+
+
+def load_index(model):
+    """Takes the loaded word vectors. Opens the ANN index built for them.
+
+    Returns AnnIndex, or None when the vectors are not an embedding store
+    (or were shared from a .bin), no index has been built, or it is stale.
+    """
+    if not isinstance(model, EmbeddingStore) or model.path is None:
+        return None
+    path = os.environ.get('INKSIGHT_ANN_INDEX', os.path.join(model.path, 'ann'))
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    cached = getattr(model, '_ann_index', None)
+    if cached is None or cached.path != path:
+        try:
+            cached = AnnIndex(path, model)
+        except ValueError as e:
+            print(f"Ignoring ANN index: {e}", file=sys.stderr)
+            return None
+        model._ann_index = cached
+    return cached
+
+
+def index_version(store_path=STORE_PATH):
+    """Describe the index cluster labels would use, without loading it.
+
+    Returns string that changes with the index and its search settings.
+    """
+    path = os.environ.get('INKSIGHT_ANN_INDEX', os.path.join(store_path, 'ann'))
+    meta_path = os.path.join(path, 'meta.json')
+    if not RELATED_WORDS or not os.path.exists(meta_path):
+        return 'none'
+    return f"{int(os.stat(meta_path).st_mtime)}:{NPROBE}:{RERANK}:{RELATED_WORDS}"
+
+
+def label_clusters(clusters, centers, index, related=RELATED_WORDS, nprobe=NPROBE, rerank=RERANK):
+    """Takes cluster dicts (in centroid order), centroids and an AnnIndex or None.
+
+    Sets "theme" to the vocabulary word nearest each centroid (a word no
+    bigger cluster already uses) and "related_words" to nearby words not
+    in the cluster. Without an index the theme is the cluster's own word
+    nearest the centroid. Returns the clusters.
+    """
+    used = set()
+    for i in sorted(range(len(clusters)), key=lambda i: -clusters[i]['word_count']):
+        cluster = clusters[i]
+        words = cluster['words']
+        neighbours = index.search(centers[i], k=related + len(words) + 3, nprobe=nprobe, rerank=rerank) \
+            if index is not None and related else []
+        names = [w for w, _ in neighbours] + words
+        cluster['theme'] = next((w for w in names if w not in used), words[0] if words else cluster['label'])
+        used.add(cluster['theme'])
+        in_cluster = set(words) | {cluster['theme']}
+        cluster['related_words'] = [w for w, _ in neighbours if w not in in_cluster][:related]
+    return clusters
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the ANN index used for cluster labels')
+    parser.add_argument('--store', default=STORE_PATH, help='Embedding store directory')
+    parser.add_argument('--output', default=None, help='Index directory (default: <store>/ann)')
+    parser.add_argument('--top-n', type=int, default=TOP_N, help='Most frequent store rows to index')
+    parser.add_argument('--nlist', type=int, default=None, help='Number of IVF lists')
+    parser.add_argument('--m', type=int, default=None, help='PQ sub-vectors (must divide the dimension)')
+    parser.add_argument('--sample', type=int, default=50000, help='Rows used for training')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = EmbeddingStore(args.store, fallback='none')
+    path = build_index(store, args.output, args.top_n, args.nlist, args.m, sample=args.sample)
+    print(f"[OK] ANN index written to {path} ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Run InkSight analyses over a collection of documents.
+
+Documents can be given as directories (every .txt and .md file inside),
+glob patterns, or JSONL files with one {"id": ..., "text": ...} object per
+line. Each document is analysed in a pool of worker processes that load
+the corpus tables and the embedding model once, and results are written as
+JSON lines in completion order:
+
+    {"id": "essays/a.txt", "results": {"analyze": {...}, "keyness": {...}}, "seconds": 0.41}
+    {"id": "essays/b.txt", "error": "..."}
+
+Results go to stdout or --output. With --resume, documents that already
+have a result in the output file are skipped and new lines are appended,
+so an interrupted run can be restarted. Progress and throughput are
+reported on stderr.
+
+Usage: python api/utils/batch.py essays/ "more/*.txt" extra.jsonl \\
+           --analyses analyze keyness --corpora brown reuters --output results.jsonl
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
+from analyze import analyze_tokens
+from corpus_index import corpus_info, get_table
+from keyness import analyze_keyness, analyze_keyness_multi
+from semantic import load_model, semantic_output
+from tokenization import get_token_stream
+
+ANALYSES = ('analyze', 'keyness', 'semantic')
+TEXT_EXTENSIONS = ('.txt', '.md')
+
+# Documents queued per worker process (bounds memory for large JSONL inputs)
+QUEUE_PER_PROCESS = 4
+
+_settings = {}
+
+
+def iter_documents(inputs):
+    """Takes directories, glob patterns and JSONL paths. Yields (doc_id, path, text).
+
+    File documents are yielded with text None and read by the worker.
+    """
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(TEXT_EXTENSIONS):
+                        path = os.path.join(root, name)
+                        yield os.path.relpath(path, item), path, None
+        elif item.lower().endswith('.jsonl') and os.path.isfile(item):
+            with open(item, encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    doc = json.loads(line)
+                    doc_id = str(doc.get('id', f'{item}:{line_number}'))
+                    yield doc_id, doc.get('path'), doc.get('text')
+        else:
+            paths = sorted(glob.glob(item, recursive=True))
+            if not paths:
+                raise FileNotFoundError(f"No documents match: {item}")
+            for path in paths:
+                if os.path.isfile(path):
+                    yield path, path, None
+
+
+def init_worker(analyses, corpora):
+    """Takes analysis options. Loads shared state once per worker process."""
+    # Keep stdout for results when running inline
+    sys.stdout = sys.stderr
+    _settings['analyses'] = analyses
+    _settings['corpora'] = corpora
+    if 'keyness' in analyses:
+        for name in corpora:
+            get_table(name)
+    if 'semantic' in analyses:
+        load_model()
+
+
+def analyze_document(doc_id, path, text):
+    """Takes document id and either a path or its text. Runs the configured analyses.
+
+    Returns the output record for this document.
+    """
+    start = time.perf_counter()
+    try:
+        if text is None:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        results = {}
+        for analysis in _settings['analyses']:
+            if analysis == 'analyze':
+                results['analyze'] = analyze_tokens(get_token_stream(text, 'words'))
+            elif analysis == 'keyness':
+                corpora = _settings['corpora']
+                if len(corpora) == 1:
+                    results['keyness'] = analyze_keyness(text, corpora[0])
+                else:
+                    results['keyness'] = analyze_keyness_multi(text, corpora, processes=0)
+            elif analysis == 'semantic':
+                results['semantic'] = semantic_output(text)
+        record = {'id': doc_id, 'results': results}
+        words = len(get_token_stream(text, 'words'))
+    except Exception as e:
+        record = {'id': doc_id, 'error': str(e)}
+        words = 0
+    record['seconds'] = round(time.perf_counter() - start, 4)
+    return record, words
+
+
+def completed_ids(output):
+    """Takes output path. Returns ids that already have a successful result."""
+    done = set()
+    if not output or not os.path.exists(output):
+        return done
+    with open(output, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last line of an interrupted run may be cut short
+                continue
+            if 'results' in record:
+                done.add(record['id'])
+    return done
+
+
+def open_output(output, resume):
+    """Takes output path and resume flag. Returns the stream to write results to."""
+    if not output:
+        return sys.stdout
+    if not resume:
+        return open(output, 'w', encoding='utf-8')
+    # An interrupted run may have left half a line; start on a fresh one
+    ends_cleanly = True
+    if os.path.exists(output) and os.path.getsize(output):
+        with open(output, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            ends_cleanly = f.read(1) == b'\n'
+    out = open(output, 'a', encoding='utf-8')
+    if not ends_cleanly:
+        out.write('\n')
+    return out
+
+
+def run_parallel(documents, processes, initargs):
+    """Takes document iterator and pool size. Yields (record, words) as they finish.
+
+    Only a few documents per process are queued at a time.
+    """
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+        initargs=initargs
+    ) as pool:
+        pending = set()
+        for doc in documents:
+            pending.add(pool.submit(analyze_document, *doc))
+            if len(pending) >= processes * QUEUE_PER_PROCESS:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def run_batch(inputs, out, analyses=('analyze',), corpora=('brown',), processes=None,
+              skip=frozenset(), progress_every=100):
+    """Takes inputs, output stream and options. Analyses every document not in skip.
+
+    Returns summary dict with document, error and throughput counts.
+    """
+    analyses = list(analyses)
+    corpora = list(corpora)
+    for name in corpora:
+        corpus_info(name)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    summary = {'documents': 0, 'errors': 0, 'skipped': 0, 'words': 0}
+
+    def unfinished():
+        # Counted as read, so ids in skip that are not among the inputs do not count
+        for doc in iter_documents(inputs):
+            if doc[0] in skip:
+                summary['skipped'] += 1
+            else:
+                yield doc
+    documents = unfinished()
+
+    start = time.perf_counter()
+    if processes > 0:
+        records = run_parallel(documents, processes, (analyses, corpora))
+    else:
+        saved_stdout = sys.stdout
+        init_worker(analyses, corpora)
+        sys.stdout = saved_stdout
+        records = (analyze_document(*doc) for doc in documents)
+
+    for record, words in records:
+        out.write(json.dumps(record, ensure_ascii=False) + '\n')
+        out.flush()
+        summary['documents'] += 1
+        summary['errors'] += 'error' in record
+        summary['words'] += words
+        if progress_every and summary['documents'] % progress_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f"{summary['documents']} documents, {summary['documents'] / elapsed:.1f} docs/s",
+                  file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    summary['seconds'] = round(elapsed, 3)
+    summary['docs_per_second'] = round(summary['documents'] / elapsed, 2) if elapsed else 0.0
+    summary['words_per_second'] = round(summary['words'] / elapsed) if elapsed else 0
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analyse a collection of documents')
+    parser.add_argument('inputs', nargs='+', help='Directories, glob patterns or .jsonl files')
+    parser.add_argument('--analyses', nargs='+', choices=ANALYSES, default=['analyze'])
+    parser.add_argument('--corpora', nargs='+', default=['brown'],
+                        help='Reference corpora for keyness (several add a cross-corpus summary)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Worker processes (default: CPU count, 0 runs in this process)')
+    parser.add_argument('--output', help='JSONL result file (default: stdout)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip documents already in --output and append to it')
+    args = parser.parse_args()
+
+    if args.resume and not args.output:
+        parser.error('--resume needs --output')
+    skip = completed_ids(args.output) if args.resume else frozenset()
+    out = open_output(args.output, args.resume)
+    try:
+        summary = run_batch(args.inputs, out, args.analyses, args.corpora, args.processes, skip)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(summary), file=sys.stderr)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Clustering backends for semantic analysis.
+
+Picks full KMeans for small inputs and MiniBatchKMeans for large ones so
+clustering time and memory stay bounded, can optionally choose k from a
+silhouette or inertia score measured on a weighted sample, and builds all
+cluster summaries with a single sort instead of a Python loop per cluster.
+"""
+import os
+
+import numpy as np
+
+# Above this many rows (unique words) full KMeans gets too slow
+KMEANS_MAX_ROWS = int(os.environ.get('INKSIGHT_KMEANS_MAX_ROWS', 20000))
+
+# Backend used by cluster_words: auto, kmeans or minibatch
+CLUSTER_BACKEND = os.environ.get('INKSIGHT_CLUSTER_BACKEND', 'auto')
+
+# Choose k from a silhouette/inertia score instead of 1 cluster per 200 words
+AUTO_K = os.environ.get('INKSIGHT_AUTO_K', '') in ('1', 'silhouette', 'inertia')
+AUTO_K_METHOD = 'inertia' if os.environ.get('INKSIGHT_AUTO_K') == 'inertia' else 'silhouette'
+
+# Rows used when scoring candidate k values
+AUTO_K_SAMPLE = 2000
+
+RANDOM_STATE = 42
+
+
+def choose_backend(n_rows, backend=CLUSTER_BACKEND):
+    """Takes row count and requested backend. Resolves 'auto' by input size.
+
+    Returns 'kmeans' or 'minibatch'.
+    """
+    if backend == 'auto':
+        return 'minibatch' if n_rows > KMEANS_MAX_ROWS else 'kmeans'
+    if backend not in ('kmeans', 'minibatch'):
+        raise ValueError(f"Unknown clustering backend: {backend}")
+    return backend
+
+
+def make_estimator(backend, n_clusters, init=None):
+    """Takes resolved backend, k and optional starting centroids.
+
+    Returns an unfitted sklearn estimator (a single run when init is given).
+    """
+    # sklearn takes about a second to import, so load it only when clustering
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    if backend == 'minibatch':
+        return MiniBatchKMeans(
+            n_clusters=n_clusters, random_state=RANDOM_STATE, batch_size=2048, max_no_improvement=10,
+            **({'init': init, 'n_init': 1} if init is not None else {'n_init': 3})
+        )
+    if init is not None:
+        return KMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, init=init, n_init=1)
+    return KMeans(n_clusters=n_clusters, random_state=RANDOM_STATE, n_init=5)
+
+
+def warm_start_centers(previous, vectors, n_clusters):
+    """Takes centroids of an earlier run, the new vectors and k. Builds k starting centroids.
+
+    Extra previous centroids are dropped; missing ones are filled with the
+    rows farthest from the centroids chosen so far.
+    Returns (k, dim) array.
+    """
+    centers = np.asarray(previous, dtype=np.float64)[:n_clusters]
+    if len(centers) < n_clusters:
+        vectors = np.asarray(vectors, dtype=np.float64)
+        nearest = np.full(len(vectors), np.inf)
+        extra = []
+        for center in list(centers):
+            nearest = np.minimum(nearest, ((vectors - center) ** 2).sum(axis=1))
+        for _ in range(n_clusters - len(centers)):
+            row = vectors[int(np.argmax(nearest))]
+            extra.append(row)
+            nearest = np.minimum(nearest, ((vectors - row) ** 2).sum(axis=1))
+        centers = np.vstack([centers.reshape(-1, vectors.shape[1])] + [np.array(extra)])
+    return centers
+
+
+def weighted_sample(n_rows, weights, size):
+    """Takes row count, weights and sample size. Returns sorted row indices.
+
+    Rows are drawn without replacement with probability proportional to weight.
+    """
+    if n_rows <= size:
+        return np.arange(n_rows)
+    rng = np.random.default_rng(RANDOM_STATE)
+    return np.sort(rng.choice(n_rows, size=size, replace=False, p=weights / weights.sum()))
+
+
+def choose_k(vectors, weights, k_min, k_max, method='silhouette', sample_size=AUTO_K_SAMPLE):
+    """Takes vectors, weights and a k range. Scores each k on a sample.
+
+    method 'silhouette' keeps the best silhouette score; 'inertia' picks the
+    elbow (the k farthest below the line joining the first and last inertia).
+    Returns the chosen k.
+    """
+    k_max = min(k_max, len(vectors) - 1)
+    if k_max <= k_min:
+        return max(1, min(k_min, len(vectors)))
+
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.metrics import silhouette_score
+
+    idx = weighted_sample(len(vectors), weights, sample_size)
+    sample = vectors[idx]
+    ks = list(range(k_min, k_max + 1))
+    scores = []
+    for k in ks:
+        model = MiniBatchKMeans(n_clusters=k, random_state=RANDOM_STATE, n_init=3, batch_size=1024)
+        labels = model.fit_predict(sample)
+        if method == 'silhouette':
+            scores.append(silhouette_score(sample, labels) if len(set(labels)) > 1 else -1.0)
+        else:
+            scores.append(model.inertia_)
+
+    if method == 'silhouette':
+        return ks[int(np.argmax(scores))]
+
+    # Elbow: largest drop below the straight line from first to last inertia
+    inertia = np.array(scores, dtype=np.float64)
+    line = np.linspace(inertia[0], inertia[-1], len(inertia))
+    return ks[int(np.argmax(line - inertia))]
+
+
+def fit_clusters(vectors, weights, n_clusters, backend=CLUSTER_BACKEND, init=None):
+    """Takes vectors, weights, k, backend and optional starting centroids. Fits the clustering model.
+
+    Returns tuple of (labels array, centroid matrix).
+    """
+    estimator = make_estimator(choose_backend(len(vectors), backend), n_clusters, init)
+    labels = estimator.fit_predict(vectors, sample_weight=weights)
+    return labels, estimator.cluster_centers_
+
+
+def summarize_clusters(vectors, tokens, labels, centers, top_n=10):
+    """Takes fitted clustering. Builds every cluster summary in one pass.
+
+    Rows are sorted once by (cluster, distance to centroid); repeated tokens
+    keep only their nearest row. Returns list of cluster dicts with label,
+    word_count and the top_n words nearest the centroid, in cluster order.
+    """
+    n_clusters = len(centers)
+    distances = np.linalg.norm(vectors - centers[labels], axis=1)
+    order = np.lexsort((distances, labels))
+
+    # Drop repeated tokens inside a cluster (first = nearest after the sort)
+    _, token_ids = np.unique(np.asarray(tokens, dtype=str), return_inverse=True)
+    keys = labels[order].astype(np.int64) * (token_ids.max() + 1) + token_ids[order]
+    _, first = np.unique(keys, return_index=True)
+    kept = order[np.sort(first)]
+
+    kept_labels = labels[kept]
+    word_counts = np.bincount(kept_labels, minlength=n_clusters)
+    starts = np.concatenate(([0], np.cumsum(word_counts)[:-1]))
+
+    clusters = []
+    for i in range(n_clusters):
+        top = kept[starts[i]:starts[i] + min(top_n, word_counts[i])]
+        clusters.append({
+            "label": f"Cluster {i}",
+            "word_count": int(word_counts[i]),
+            "words": [tokens[j] for j in top.tolist()]
+        })
+    return clusters
@@ -3,9 +3,35 @@
 
 Provides metadata and loader functions for NLTK corpora used in
 keyness statistics calculations. Each corpus entry includes display
-names, descriptions, and a function to load the corpus words.
+names, descriptions, a function to load the corpus words, one that
+yields the words of each corpus file (used for dispersion statistics) and
+one that yields the sentences of each file (used for n-gram counts).
+NLTK is only imported when a loader is called.
 """
-from nltk.corpus import brown, gutenberg, reuters, inaugural
+from functools import partial
+
+
+def nltk_words(corpus_name):
+    """Takes NLTK corpus name. Returns its word list (imports NLTK on first use)."""
+    from nltk import corpus
+    return getattr(corpus, corpus_name).words()
+
+
+def nltk_documents(corpus_name):
+    """Takes NLTK corpus name. Yields the word list of each of its files, in corpus order."""
+    from nltk import corpus
+    reader = getattr(corpus, corpus_name)
+    for fileid in reader.fileids():
+        yield reader.words(fileid)
+
+
+def nltk_sentences(corpus_name):
+    """Takes NLTK corpus name. Yields the sentence list (lists of words) of each file."""
+    from nltk import corpus
+    reader = getattr(corpus, corpus_name)
+    for fileid in reader.fileids():
+        yield reader.sents(fileid)
+
 
 CORPORA = {
     'brown': {
@@ -14,24 +40,32 @@ CORPORA = {
         'full_description': (
             'Balanced corpus of American English across multiple genres'
         ),
-        'loader': brown.words
+        'loader': partial(nltk_words, 'brown'),
+        'document_loader': partial(nltk_documents, 'brown'),
+        'sentences': partial(nltk_sentences, 'brown')
     },
     'gutenberg': {
         'display_name': 'Project Gutenberg',
         'simple_description': 'Classic literature',
         'full_description': 'Classic literature from 19th and early 20th century',
-        'loader': gutenberg.words
+        'loader': partial(nltk_words, 'gutenberg'),
+        'document_loader': partial(nltk_documents, 'gutenberg'),
+        'sentences': partial(nltk_sentences, 'gutenberg')
     },
     'reuters': {
         'display_name': 'Reuters Corpus',
         'simple_description': 'News articles',
         'full_description': 'Newswire articles from Reuters',
-        'loader': reuters.words
+        'loader': partial(nltk_words, 'reuters'),
+        'document_loader': partial(nltk_documents, 'reuters'),
+        'sentences': partial(nltk_sentences, 'reuters')
     },
     'inaugural': {
         'display_name': 'Inaugural Addresses Corpus',
         'simple_description': 'Presidential speeches',
         'full_description': 'U.S. Presidential inaugural addresses',
-        'loader': inaugural.words
+        'loader': partial(nltk_words, 'inaugural'),
+        'document_loader': partial(nltk_documents, 'inaugural'),
+        'sentences': partial(nltk_sentences, 'inaugural')
     }
 }
@@ -0,0 +1,670 @@
+#!/usr/bin/env python3
+"""Prebuilt frequency tables for the keyness reference corpora.
+
+Counting a reference corpus (streaming ~1M NLTK tokens, filtering and
+lowercasing them) is the same work on every keyness request. This module
+turns each corpus into a compact, versioned artifact on disk:
+
+    models/corpus-index/v1/<corpus>/
+        vocab.npy    sorted vocabulary (fixed width unicode)
+        counts.npy   token count for each vocabulary entry
+        top.npy      vocabulary indices of the TOP_N most common words
+        meta.json    format version, totals and build info
+        dtm_*.npy    document-term matrix (CSC arrays, one column per word)
+                     and each document's token total
+        juilland_d.npy, dp_norm.npy
+                     dispersion of each word across the documents
+        ngram<n>_keys.npy, ngram<n>_counts.npy
+                     pruned n-gram counts for phrase keyness (see ngrams.py)
+
+The arrays are loaded memory-mapped, so opening a table is cheap and the
+pages are shared between worker processes through the page cache.
+Custom corpora (see custom_corpora.py) are stored in the same layout, with
+their display metadata in meta.json; documents added since the last full
+merge stay in shards under custom/<corpus>/ and are read together with the
+table (SegmentedTable). Tables built before the document-term
+matrix was added still load; they just have no dispersion statistics.
+N-gram tables are only built for the built-in corpora; without them,
+get_ngram_table counts the NLTK corpus on first use.
+Usage: python api/utils/corpus_index.py [--corpus brown] [--index-dir DIR]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from corpora import CORPORA
+from dispersion import dispersion, document_term_matrix
+from ngrams import NGRAM_FORMAT, NGRAM_SIZES, NGramTable, count_ngrams
+
+FORMAT_VERSION = 1
+
+# Most common words stored with each table (keyness uses the top 500)
+TOP_N = 1000
+
+# DocumentMatrix arrays, saved as dtm_<part>.npy
+MATRIX_PARTS = ('data', 'indices', 'indptr', 'sizes')
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+INDEX_DIR = os.environ.get(
+    'INKSIGHT_CORPUS_INDEX', os.path.join(project_root, 'models', 'corpus-index')
+)
+
+
+class DocumentMatrix:
+    """Document-term counts of a corpus in CSC layout (column j is vocab word j).
+
+    sizes holds each document's token total. The arrays may be memory-mapped.
+    """
+
+    def __init__(self, data, indices, indptr, sizes):
+        self.data = data
+        self.indices = indices
+        self.indptr = indptr
+        self.sizes = sizes
+
+    @classmethod
+    def from_sparse(cls, matrix):
+        """Takes scipy.sparse matrix (documents x words). Returns DocumentMatrix."""
+        matrix = matrix.tocsc()
+        matrix.sort_indices()
+        sizes = np.asarray(matrix.sum(axis=1)).ravel().astype(np.int64)
+        return cls(matrix.data.astype(np.int64), matrix.indices.astype(np.int32),
+                   matrix.indptr.astype(np.int64), sizes)
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def entries(self):
+        """Returns tuple of (row, column, count) arrays of the stored cells."""
+        columns = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        return np.asarray(self.indices), columns, np.asarray(self.data)
+
+    def dispersion(self):
+        """Returns tuple of (juilland_d, dp_norm) arrays, one value per word."""
+        return dispersion(self.data, self.indices, self.indptr, self.sizes)
+
+
+class CorpusTable:
+    """Word counts for one reference corpus.
+
+    vocab is sorted so lookups are a binary search; top holds vocabulary
+    indices in most-common order (ties keep corpus order, as FreqDist does).
+    version identifies the artifact build ('live' when counted in memory).
+    matrix is the corpus's DocumentMatrix and juilland_d / dp_norm the
+    precomputed dispersion per vocabulary entry (None if not built).
+    ngrams maps n to the corpus's NGramTable (ids index vocab).
+    """
+
+    def __init__(self, name, vocab, counts, top, total, version='live',
+                 matrix=None, juilland_d=None, dp_norm=None, ngrams=None):
+        self.name = name
+        self.version = version
+        self.vocab = vocab
+        self.counts = counts
+        self.top = top
+        self.total = int(total)
+        self.matrix = matrix
+        if matrix is not None and juilland_d is None:
+            juilland_d, dp_norm = matrix.dispersion()
+        self.juilland_d = juilland_d
+        self.dp_norm = dp_norm
+        self.ngrams = ngrams or {}
+
+    def __len__(self):
+        return len(self.vocab)
+
+    @property
+    def has_dispersion(self):
+        return self.juilland_d is not None
+
+    @property
+    def documents(self):
+        """Number of documents in the document-term matrix (None if not built)."""
+        return len(self.matrix) if self.matrix is not None else None
+
+    def word_ids(self, words):
+        """Takes list of words. Returns (vocabulary indices, found mask)."""
+        words = np.asarray(words, dtype=str)
+        if len(self.vocab) == 0 or len(words) == 0:
+            return np.zeros(len(words), dtype=np.int64), np.zeros(len(words), dtype=bool)
+        idx = np.searchsorted(self.vocab, words)
+        idx = np.minimum(idx, len(self.vocab) - 1)
+        return idx, self.vocab[idx] == words
+
+    def lookup(self, words):
+        """Takes list of words. Returns numpy array of their corpus counts (0 if absent)."""
+        idx, found = self.word_ids(words)
+        if not found.any():
+            return np.zeros(len(found), dtype=np.int64)
+        return np.where(found, self.counts[idx], 0)
+
+    def lookup_dispersion(self, words):
+        """Takes list of words. Returns (juilland_d, dp_norm) arrays (NaN if absent).
+
+        Returns None if the table has no dispersion statistics.
+        """
+        if not self.has_dispersion:
+            return None
+        idx, found = self.word_ids(words)
+        if not found.any():
+            nan = np.full(len(found), np.nan)
+            return nan, nan.copy()
+        return (np.where(found, self.juilland_d[idx], np.nan),
+                np.where(found, self.dp_norm[idx], np.nan))
+
+    def get(self, word, default=0):
+        """Takes a word. Returns its corpus count (dict-style, like FreqDist.get)."""
+        return int(self.lookup([word])[0]) or default
+
+    def most_common(self, n):
+        """Takes n. Returns the n most common words (n must not exceed the stored top)."""
+        if n > len(self.top) and len(self.top) < len(self.vocab):
+            raise ValueError(f"Table '{self.name}' only stores the top {len(self.top)} words")
+        return [str(w) for w in self.vocab[self.top[:n]]]
+
+
+class SegmentedTable:
+    """A custom corpus read as its table plus the shards not merged into it yet.
+
+    Counts and dispersion of the requested words are looked up in every
+    segment and combined, so added documents are searchable without
+    rewriting the table. Offers the CorpusTable lookups keyness uses;
+    vocab and counts (only needed to profile the corpus) are merged on
+    first access.
+    """
+
+    def __init__(self, name, segments, version='live'):
+        self.name = name
+        self.version = version
+        self.segments = segments
+        self.total = sum(t.total for t in segments)
+        self.ngrams = {}
+        self._merged = None
+        self._sizes = None
+
+    def merged(self):
+        """Returns the segments' counts merged into one CorpusTable (no document-term matrix)."""
+        if self._merged is None:
+            self._merged = merge_tables(self.name, self.segments, with_matrix=False)
+        return self._merged
+
+    @property
+    def vocab(self):
+        return self.merged().vocab
+
+    @property
+    def counts(self):
+        return self.merged().counts
+
+    def __len__(self):
+        return len(self.merged())
+
+    @property
+    def has_dispersion(self):
+        return all(t.has_dispersion for t in self.segments)
+
+    @property
+    def documents(self):
+        if not self.has_dispersion:
+            return None
+        return sum(t.documents for t in self.segments)
+
+    def lookup(self, words):
+        """Takes list of words. Returns numpy array of their corpus counts (0 if absent)."""
+        counts = np.zeros(len(words), dtype=np.int64)
+        for t in self.segments:
+            counts += t.lookup(words)
+        return counts
+
+    def lookup_dispersion(self, words):
+        """Takes list of words. Returns (juilland_d, dp_norm) arrays (NaN if absent).
+
+        Only the words' columns are read from each segment's document-term
+        matrix; they are stacked (segment rows in order) and passed to
+        dispersion() with every document's size, which gives the same values
+        as the merged table. Returns None if a segment has no matrix.
+        """
+        if not self.has_dispersion:
+            return None
+        if self._sizes is None:
+            self._sizes = np.concatenate([np.asarray(t.matrix.sizes) for t in self.segments])
+        data, rows, columns = [], [], []
+        row_offset = 0
+        for t in self.segments:
+            idx, found = t.word_ids(words)
+            indptr = np.asarray(t.matrix.indptr)
+            starts = np.where(found, indptr[idx], 0)
+            lengths = np.where(found, indptr[np.minimum(idx + 1, len(indptr) - 1)] - starts, 0)
+            # Positions of every stored entry of the requested columns, column by column
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            positions = offsets + np.arange(int(lengths.sum()))
+            data.append(np.asarray(t.matrix.data)[positions])
+            rows.append(np.asarray(t.matrix.indices)[positions].astype(np.int64) + row_offset)
+            columns.append(np.repeat(np.arange(len(words)), lengths))
+            row_offset += len(t.matrix)
+        columns = np.concatenate(columns)
+        # Stable, so each column keeps the segments' rows in order
+        order = np.argsort(columns, kind='stable')
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(columns, minlength=len(words)))])
+        juilland_d, dp_norm = dispersion(np.concatenate(data)[order], np.concatenate(rows)[order],
+                                         indptr, self._sizes)
+        absent = np.diff(indptr) == 0
+        return np.where(absent, np.nan, juilland_d), np.where(absent, np.nan, dp_norm)
+
+    def get(self, word, default=0):
+        """Takes a word. Returns its corpus count (dict-style, like FreqDist.get)."""
+        return int(self.lookup([word])[0]) or default
+
+    def most_common(self, n):
+        """Takes n. Returns the n most common words (ties alphabetical, as merge_tables orders them).
+
+        Candidates are every segment's top n words. A word outside all of
+        them has at most the sum of the segments' n-th counts, so the
+        candidates' ranking is exact when the n-th candidate beats that
+        bound; otherwise the merged counts are ranked.
+        """
+        candidates = set()
+        bound = 0
+        for t in self.segments:
+            if len(t.top) < min(n, len(t)):
+                return self.merged().most_common(n)
+            candidates.update(str(w) for w in np.asarray(t.vocab)[np.asarray(t.top[:n])])
+            if len(t) > n:
+                bound += int(t.counts[t.top[n - 1]])
+        words = sorted(candidates)
+        counts = self.lookup(words)
+        order = np.argsort(-counts, kind='stable')[:n]
+        if bound == 0 or (len(order) == n and counts[order[-1]] > bound):
+            return [words[i] for i in order.tolist()]
+        return self.merged().most_common(n)
+
+
+def filter_tokens(words):
+    """Takes iterable of corpus words. Yields lowercase words (3+ letters only).
+
+    Same filter keyness applies to user text.
+    """
+    for w in words:
+        if w.isalpha() and len(w) >= 3:
+            yield w.lower()
+
+
+def count_filtered(words):
+    """Takes iterable of corpus words. Returns Counter(filter_tokens(words)).
+
+    Counts raw words first, so the filter runs once per distinct word instead
+    of once per occurrence. Keys keep first-seen order like the direct count.
+    """
+    counter = Counter()
+    for w, n in Counter(words).items():
+        if w.isalpha() and len(w) >= 3:
+            counter[w.lower()] += n
+    return counter
+
+
+def table_from_counter(name, counter, top_n=TOP_N, documents=None):
+    """Takes corpus name, Counter (in corpus order) and optionally per-document Counters.
+
+    Builds an in-memory table; with documents it also has the
+    document-term matrix and dispersion statistics.
+    """
+    # most_common keeps first-seen order for ties, matching FreqDist
+    top_words = [w for w, _ in counter.most_common(top_n)]
+    vocab = np.array(sorted(counter), dtype=str)
+    if len(vocab) == 0:
+        vocab = np.array([], dtype='<U1')
+    counts = np.array([counter[w] for w in vocab.tolist()], dtype=np.int64)
+    top = np.searchsorted(vocab, np.array(top_words, dtype=vocab.dtype)).astype(np.int32)
+    matrix = None
+    if documents is not None:
+        matrix = DocumentMatrix.from_sparse(document_term_matrix(documents, vocab))
+    return CorpusTable(name, vocab, counts, top, counts.sum(), matrix=matrix)
+
+
+def build_table(name, top_n=TOP_N, ngram_sizes=()):
+    """Takes corpus name and the n-gram sizes to count. Counts the NLTK corpus into a table (slow path).
+
+    Each corpus file is counted separately for the document-term matrix;
+    the summed Counter keeps corpus order, so totals and ties match counting
+    the whole corpus at once.
+    """
+    counter = Counter()
+    documents = []
+    for words in CORPORA[name]['document_loader']():
+        documents.append(count_filtered(words))
+        counter.update(documents[-1])
+    table = table_from_counter(name, counter, top_n, documents)
+    if ngram_sizes:
+        table.ngrams = count_ngrams(CORPORA[name]['sentences'](), table.vocab, ngram_sizes)
+    return table
+
+
+def merge_matrices(tables, inverse, n_words):
+    """Takes tables, the merged column of each table's words (inverse, tables in
+    order) and the merged vocabulary size. Appends the tables' document rows,
+    in order, into one DocumentMatrix.
+
+    Every stored cell is copied once, straight to its place in the merged CSC
+    arrays: a merged column holds the cells of that word from each table in
+    turn, with rows offset by the documents of the tables before. Besides the
+    merged arrays, only one table's destination positions are held at a time.
+    """
+    # Cells of each merged column (a table's words map to distinct columns)
+    cells = np.zeros(n_words, dtype=np.int64)
+    col_offset = 0
+    for t in tables:
+        cells[inverse[col_offset:col_offset + len(t)]] += np.diff(np.asarray(t.matrix.indptr))
+        col_offset += len(t)
+    indptr = np.concatenate([[0], np.cumsum(cells)])
+    data = np.empty(indptr[-1], dtype=np.int64)
+    indices = np.empty(indptr[-1], dtype=np.int32)
+
+    # Next free position of each merged column
+    filled = indptr[:-1].copy()
+    row_offset = col_offset = 0
+    for t in tables:
+        columns = inverse[col_offset:col_offset + len(t)]
+        old_indptr = np.asarray(t.matrix.indptr)
+        lengths = np.diff(old_indptr)
+        destination = np.repeat(filled[columns] - old_indptr[:-1], lengths) + np.arange(old_indptr[-1])
+        data[destination] = t.matrix.data
+        indices[destination] = np.asarray(t.matrix.indices) + row_offset
+        filled[columns] += lengths
+        row_offset += len(t.matrix)
+        col_offset += len(t)
+    sizes = np.concatenate([np.asarray(t.matrix.sizes, dtype=np.int64) for t in tables])
+    return DocumentMatrix(data, indices, indptr, sizes)
+
+
+def merge_tables(name, tables, top_n=TOP_N, with_matrix=True):
+    """Takes corpus name and tables. Sums their counts into one table.
+
+    Ties in the top words are broken alphabetically. When every table has a
+    document-term matrix (and with_matrix is set), their rows are appended
+    in table order (see merge_matrices) and the dispersion of the whole
+    corpus is recomputed, so memory grows with the corpus's stored cells;
+    adding documents to a custom corpus avoids this (see SegmentedTable).
+    """
+    tables = [t for t in tables if len(t)]
+    if not tables:
+        return table_from_counter(name, Counter(), top_n, documents=[])
+    words = np.concatenate([np.asarray(t.vocab) for t in tables])
+    vocab, inverse = np.unique(words, return_inverse=True)
+    counts = np.zeros(len(vocab), dtype=np.int64)
+    np.add.at(counts, inverse, np.concatenate([np.asarray(t.counts) for t in tables]))
+    # Most common first; vocab is sorted, so the stable sort keeps ties alphabetical
+    top = np.argsort(-counts, kind='stable')[:top_n].astype(np.int32)
+
+    matrix = None
+    if with_matrix and all(t.matrix is not None for t in tables):
+        matrix = merge_matrices(tables, inverse, len(vocab))
+    return CorpusTable(name, vocab, counts, top, counts.sum(), matrix=matrix)
+
+
+def table_dir(name, index_dir=INDEX_DIR):
+    """Takes corpus name. Returns directory of its artifact for the current format."""
+    return os.path.join(index_dir, f'v{FORMAT_VERSION}', name)
+
+
+def save_table(table, index_dir=INDEX_DIR, **meta):
+    """Takes table and extra meta.json fields. Writes it atomically under index_dir.
+
+    Returns path of the written directory.
+    """
+    final_dir = table_dir(table.name, index_dir)
+    parent = os.path.dirname(final_dir)
+    os.makedirs(parent, exist_ok=True)
+
+    # Write into a temp dir then swap it in, so readers never see half a table
+    tmp_dir = tempfile.mkdtemp(prefix=f'.{table.name}-', dir=parent)
+    np.save(os.path.join(tmp_dir, 'vocab.npy'), table.vocab)
+    np.save(os.path.join(tmp_dir, 'counts.npy'), table.counts)
+    np.save(os.path.join(tmp_dir, 'top.npy'), table.top)
+    if table.matrix is not None:
+        for part in MATRIX_PARTS:
+            np.save(os.path.join(tmp_dir, f'dtm_{part}.npy'), getattr(table.matrix, part))
+        np.save(os.path.join(tmp_dir, 'juilland_d.npy'), np.asarray(table.juilland_d, dtype=np.float32))
+        np.save(os.path.join(tmp_dir, 'dp_norm.npy'), np.asarray(table.dp_norm, dtype=np.float32))
+    for n, ngram_table in table.ngrams.items():
+        np.save(os.path.join(tmp_dir, f'ngram{n}_keys.npy'), ngram_table.keys)
+        np.save(os.path.join(tmp_dir, f'ngram{n}_counts.npy'), ngram_table.counts)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'format_version': FORMAT_VERSION,
+            'name': table.name,
+            'total': table.total,
+            'unique': len(table.vocab),
+            'top_n': len(table.top),
+            'documents_indexed': len(table.matrix) if table.matrix is not None else None,
+            'ngrams': {
+                str(n): {'total': t.total, 'entries': len(t), 'min_count': t.min_count, 'format': NGRAM_FORMAT}
+                for n, t in table.ngrams.items()
+            },
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            **meta,
+        }, f, indent=2)
+
+    if os.path.isdir(final_dir):
+        old_dir = tempfile.mkdtemp(prefix=f'.{table.name}-old-', dir=parent)
+        os.replace(final_dir, os.path.join(old_dir, 'table'))
+        os.replace(tmp_dir, final_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, final_dir)
+    return final_dir
+
+
+def read_meta(name, index_dir=INDEX_DIR):
+    """Takes corpus name. Returns meta.json of its prebuilt table, or None if unusable."""
+    meta_path = os.path.join(table_dir(name, index_dir), 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION:
+        return None
+    return meta
+
+
+def shard_root(name, index_dir=INDEX_DIR):
+    """Takes custom corpus name. Returns the directory its unmerged shards live under."""
+    return os.path.join(index_dir, 'custom', name)
+
+
+def shard_metas(name, index_dir=INDEX_DIR):
+    """Takes custom corpus name. Returns dict of shard id -> meta.json of its shards
+    not merged into the table yet, oldest first.
+
+    Shards listed in the table's merged_shards, or replaced by a larger
+    shard ("replaces", see custom_corpora.compact_tiers), are left out: they
+    only remain on disk when a merge was interrupted before removing them.
+    """
+    root = shard_root(name, index_dir)
+    shard_dir = os.path.join(root, f'v{FORMAT_VERSION}')
+    if not os.path.isdir(shard_dir):
+        return {}
+    metas = {}
+    for shard_id in sorted(os.listdir(shard_dir)):
+        meta = None if shard_id.startswith('.') else read_meta(shard_id, root)
+        if meta is not None:
+            metas[shard_id] = meta
+    merged = set((read_meta(name, index_dir) or {}).get('merged_shards', []))
+    replaced = {r for meta in metas.values() for r in meta.get('replaces', [])}
+    return {s: meta for s, meta in metas.items() if s not in merged and s not in replaced}
+
+
+def pending_shards(name, index_dir=INDEX_DIR):
+    """Takes custom corpus name. Returns ids of shards not merged into its table yet, oldest first."""
+    return list(shard_metas(name, index_dir))
+
+
+def table_version(name, index_dir=INDEX_DIR):
+    """Takes corpus name. Returns the version get_table would serve, without loading it."""
+    meta = read_meta(name, index_dir)
+    if meta is None:
+        return 'live'
+    # Custom corpora can be rebuilt within a second; their totals only grow
+    version = f"v{FORMAT_VERSION}-{meta.get('built_at', '')}-{meta.get('total', 0)}"
+    if meta.get('custom'):
+        shards = pending_shards(name, index_dir)
+        if shards:
+            version += f"-{len(shards)}-{zlib.crc32(' '.join(shards).encode()):08x}"
+    return version
+
+
+def custom_meta(name, index_dir=INDEX_DIR):
+    """Takes corpus name. Returns meta.json of a registered custom corpus, or None."""
+    if name in CORPORA:
+        return None
+    meta = read_meta(name, index_dir)
+    return meta if meta and meta.get('custom') else None
+
+
+def corpus_info(name, index_dir=INDEX_DIR):
+    """Takes corpus name. Returns its display metadata (built-in or custom).
+
+    Raises ValueError for unknown corpora.
+    """
+    if name in CORPORA:
+        return CORPORA[name]
+    meta = custom_meta(name, index_dir)
+    if meta is None:
+        raise ValueError(f"Unknown corpus: {name}")
+    return {
+        'display_name': meta['display_name'],
+        'simple_description': meta['simple_description'],
+        'full_description': meta['full_description'],
+        'custom': True,
+        'documents': meta.get('documents', 0) + sum(m.get('documents', 0)
+                                                    for m in shard_metas(name, index_dir).values()),
+    }
+
+
+def available_corpora(index_dir=INDEX_DIR):
+    """Returns dict of corpus name -> display metadata, built-in corpora first."""
+    corpora = dict(CORPORA)
+    version_dir = os.path.join(index_dir, f'v{FORMAT_VERSION}')
+    if os.path.isdir(version_dir):
+        for name in sorted(os.listdir(version_dir)):
+            if not name.startswith('.') and custom_meta(name, index_dir):
+                corpora[name] = corpus_info(name, index_dir)
+    return corpora
+
+
+def default_corpora(index_dir=INDEX_DIR):
+    """Returns names of the corpora a request without a corpus list is compared with.
+
+    Custom corpora without documents yet are left out.
+    """
+    return [name for name, info in available_corpora(index_dir).items() if info.get('documents', 1)]
+
+
+def load_table(name, index_dir=INDEX_DIR):
+    """Takes corpus name. Memory-maps its prebuilt table.
+
+    Returns CorpusTable, or None if no artifact for this format version exists.
+    """
+    meta = read_meta(name, index_dir)
+    if meta is None:
+        return None
+    path = table_dir(name, index_dir)
+
+    def load(filename):
+        return np.load(os.path.join(path, filename), mmap_mode='r')
+
+    matrix = juilland_d = dp_norm = None
+    if meta.get('documents_indexed') is not None:
+        matrix = DocumentMatrix(*(load(f'dtm_{part}.npy') for part in MATRIX_PARTS))
+        juilland_d, dp_norm = load('juilland_d.npy'), load('dp_norm.npy')
+    ngrams = {
+        int(n): NGramTable(int(n), load(f'ngram{n}_keys.npy'), load(f'ngram{n}_counts.npy'),
+                           info['total'], info['min_count'])
+        for n, info in meta.get('ngrams', {}).items()
+        if info.get('format') == NGRAM_FORMAT
+    }
+    return CorpusTable(
+        name, load('vocab.npy'), load('counts.npy'), load('top.npy'), meta['total'],
+        version=table_version(name, index_dir), matrix=matrix, juilland_d=juilland_d, dp_norm=dp_norm,
+        ngrams=ngrams,
+    )
+
+
+def load_corpus(name, index_dir=INDEX_DIR):
+    """Takes corpus name. Loads its prebuilt table together with the shards of a
+    custom corpus that are not merged into it yet.
+
+    Returns CorpusTable (SegmentedTable while there are shards), or None if
+    no artifact for this format version exists.
+    """
+    table = load_table(name, index_dir)
+    if table is None or name in CORPORA:
+        return table
+    root = shard_root(name, index_dir)
+    shards = [load_table(s, root) for s in pending_shards(name, index_dir)]
+    if not shards:
+        return table
+    return SegmentedTable(name, [table] + shards, version=table.version)
+
+
+def get_table(name):
+    """Takes corpus name. Returns its table, preferring the prebuilt artifact.
+
+    Falls back to counting the NLTK corpus when the artifact is missing.
+    Tables are cached per version, so a rebuilt custom corpus is picked up
+    by every worker on its next request.
+    """
+    corpus_info(name)
+    return _cached_table(name, table_version(name))
+
+
+@lru_cache(maxsize=32)
+def _cached_table(name, version):
+    table = load_corpus(name)
+    if table is None:
+        print(f"No prebuilt table for '{name}', counting corpus "
+              f"(run api/utils/corpus_index.py to build it)", file=sys.stderr)
+        table = build_table(name)
+    return table
+
+
+def get_ngram_table(name, n):
+    """Takes corpus name and n. Returns its NGramTable, preferring the prebuilt artifact.
+
+    Built-in corpora without one are counted from NLTK on first use.
+    Raises ValueError for custom corpora, which keep no sentences to count.
+    """
+    table = get_table(name)
+    if n in table.ngrams:
+        return table.ngrams[n]
+    if name not in CORPORA:
+        raise ValueError(f"Corpus '{name}' has no {n}-gram counts")
+    return _counted_ngrams(name, table.version, n)
+
+
+@lru_cache(maxsize=8)
+def _counted_ngrams(name, version, n):
+    print(f"No prebuilt {n}-gram table for '{name}', counting corpus "
+          f"(run api/utils/corpus_index.py to build it)", file=sys.stderr)
+    return count_ngrams(CORPORA[name]['sentences'](), get_table(name).vocab, (n,))[n]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build keyness corpus frequency tables')
+    parser.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                        help='Corpus to build (repeatable, default: all)')
+    parser.add_argument('--index-dir', default=INDEX_DIR, help='Output directory')
+    args = parser.parse_args()
+
+    for name in args.corpus or list(CORPORA):
+        start = time.perf_counter()
+        path = save_table(build_table(name, ngram_sizes=NGRAM_SIZES), args.index_dir)
+        print(f"[OK] '{name}' -> {path} ({time.perf_counter() - start:.1f}s)")
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Embedding profiles of the reference corpora, for document-to-corpus similarity.
+
+A profile summarises what a corpus is about in the vector space semantic.py
+uses. It is built from the corpus's PROFILE_WORDS most frequent words
+(counted as in its keyness table), each unit-length word vector weighted by
+the word's count, damped for very common words (sif_weights):
+
+    models/corpus-profiles/v1/<corpus>/
+        centroid.npy   weighted mean of the word vectors (unit length)
+        centers.npy    PROFILE_CLUSTERS weighted KMeans centroids (unit length)
+        shares.npy     share of the profile's word weight in each cluster
+        meta.json      model and corpus table versions it was built from,
+                       and the words nearest each cluster centroid
+
+A profile only counts as built while both versions still match, so a new
+model or a grown custom corpus is re-profiled. Corpora without a current
+profile are profiled in memory on first use (seconds, cached per version).
+
+At request time the document's unique words are embedded once and compared
+to every centroid and cluster centroid of every corpus in one matrix
+product (see compare_corpora).
+
+Requests (stdin for the one-shot script, "input" for worker.py):
+
+    {"text": "...", "corpora": ["brown", "reuters"]}   (default: all corpora)
+
+Usage: python api/utils/corpus_profiles.py build [--corpus brown] [--profile-dir DIR]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from functools import lru_cache
+
+import numpy as np
+
+from clustering import fit_clusters, summarize_clusters
+from corpus_index import available_corpora, corpus_info, default_corpora, get_table, table_version
+from semantic import get_word_vector, load_model, model_version
+from tokenization import get_token_stream
+
+FORMAT_VERSION = 1
+
+# Most frequent corpus words embedded into a profile
+PROFILE_WORDS = 20000
+PROFILE_CLUSTERS = 16
+
+# Smooth inverse frequency: a word's count is scaled by a / (a + its relative
+# frequency), so "the" and "and" do not make every centroid alike
+SIF_A = 1e-3
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PROFILE_DIR = os.environ.get(
+    'INKSIGHT_CORPUS_PROFILES', os.path.join(project_root, 'models', 'corpus-profiles')
+)
+
+
+class CorpusProfile:
+    """Embedding profile of one corpus: centroid, cluster centroids and cluster shares.
+
+    themes holds the words nearest each cluster centroid; version is the
+    (model, table) pair the profile was built from.
+    """
+
+    def __init__(self, name, centroid, centers, shares, themes, version):
+        self.name = name
+        self.centroid = centroid
+        self.centers = centers
+        self.shares = shares
+        self.themes = themes
+        self.version = version
+
+
+def _unit(vectors):
+    """Takes vectors (rows). Returns them scaled to unit length (zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def sif_weights(counts, total):
+    """Takes word counts and the text's (or corpus's) word total. Returns their SIF weights."""
+    counts = np.asarray(counts, dtype=np.float64)
+    return counts * SIF_A / (SIF_A + counts / max(total, 1))
+
+
+def profile_version(name):
+    """Takes corpus name. Returns the (model, table) versions a current profile must have."""
+    return [model_version(), table_version(name)]
+
+
+def build_profile(name, n_words=PROFILE_WORDS, n_clusters=PROFILE_CLUSTERS):
+    """Takes corpus name. Embeds its most frequent words and clusters them.
+
+    Returns CorpusProfile.
+    """
+    table = get_table(name)
+    version = profile_version(name)
+    counts = np.asarray(table.counts)
+    top = np.argsort(-counts, kind='stable')[:n_words]
+    words = [str(w) for w in np.asarray(table.vocab)[top]]
+    vectors, valid = get_word_vector(load_model(), words)
+    if not valid:
+        raise ValueError(f"Corpus has no words to profile: {name}")
+    weight_of = dict(zip(words, counts[top].tolist()))
+    weights = sif_weights([weight_of[w] for w in valid], table.total)
+    vectors = _unit(vectors)
+
+    centroid = _unit(weights @ vectors)
+    k = min(n_clusters, len(valid))
+    labels, centers = fit_clusters(vectors, weights, k, backend='kmeans')
+    shares = np.bincount(labels, weights=weights, minlength=k) / weights.sum()
+    themes = [c['words'][:5] for c in summarize_clusters(vectors, valid, labels, centers)]
+    return CorpusProfile(name, centroid, _unit(centers), shares.astype(np.float32), themes, version)
+
+
+def profile_dir(name, profile_root=PROFILE_DIR):
+    """Takes corpus name. Returns directory of its profile for the current format."""
+    return os.path.join(profile_root, f'v{FORMAT_VERSION}', name)
+
+
+def save_profile(profile, profile_root=PROFILE_DIR):
+    """Takes profile. Writes it atomically under profile_root.
+
+    Returns path of the written directory.
+    """
+    final_dir = profile_dir(profile.name, profile_root)
+    parent = os.path.dirname(final_dir)
+    os.makedirs(parent, exist_ok=True)
+
+    # Write into a temp dir then swap it in, so readers never see half a profile
+    tmp_dir = tempfile.mkdtemp(prefix=f'.{profile.name}-', dir=parent)
+    np.save(os.path.join(tmp_dir, 'centroid.npy'), profile.centroid)
+    np.save(os.path.join(tmp_dir, 'centers.npy'), profile.centers)
+    np.save(os.path.join(tmp_dir, 'shares.npy'), profile.shares)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'format_version': FORMAT_VERSION,
+            'name': profile.name,
+            'model_version': profile.version[0],
+            'table_version': profile.version[1],
+            'clusters': len(profile.centers),
+            'themes': profile.themes,
+            'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        }, f, indent=2)
+
+    if os.path.isdir(final_dir):
+        old_dir = tempfile.mkdtemp(prefix=f'.{profile.name}-old-', dir=parent)
+        os.replace(final_dir, os.path.join(old_dir, 'profile'))
+        os.replace(tmp_dir, final_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, final_dir)
+    return final_dir
+
+
+def load_profile(name, version, profile_root=PROFILE_DIR):
+    """Takes corpus name and the (model, table) versions it must match. Loads its saved profile.
+
+    Returns CorpusProfile, or None if none was built for these versions.
+    """
+    path = profile_dir(name, profile_root)
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format_version') != FORMAT_VERSION or [meta.get('model_version'), meta.get('table_version')] != version:
+        return None
+    return CorpusProfile(
+        name, np.load(os.path.join(path, 'centroid.npy')), np.load(os.path.join(path, 'centers.npy')),
+        np.load(os.path.join(path, 'shares.npy')), meta['themes'], version
+    )
+
+
+def get_profile(name):
+    """Takes corpus name. Returns its profile, preferring the saved one.
+
+    Profiles the corpus in memory when no current profile is saved.
+    """
+    corpus_info(name)
+    return _cached_profile(name, tuple(profile_version(name)))
+
+
+@lru_cache(maxsize=32)
+def _cached_profile(name, version):
+    profile = load_profile(name, list(version))
+    if profile is None:
+        print(f"No current profile for '{name}', building it "
+              f"(run api/utils/corpus_profiles.py build to save it)", file=sys.stderr)
+        profile = build_profile(name)
+    return profile
+
+
+@lru_cache(maxsize=8)
+def _stacked(names, versions):
+    """Takes corpus names and their profile versions. Stacks every profile into one matrix.
+
+    Rows are the corpus centroids followed by each corpus's cluster
+    centroids. Returns (matrix, cluster offsets, profiles).
+    """
+    profiles = [get_profile(name) for name in names]
+    matrix = np.vstack([p.centroid[None, :] for p in profiles] + [p.centers for p in profiles])
+    offsets = len(profiles) + np.cumsum([0] + [len(p.centers) for p in profiles[:-1]])
+    return matrix, offsets, profiles
+
+
+def compare_corpora(text, corpus_names=None, stream=None):
+    """Takes text and corpus names (default: all available). Ranks the corpora by
+    how close the text is to them in meaning.
+
+    The text's unique words (a 'semantic' TokenStream can be passed in) are
+    embedded once as unit vectors and multiplied with every profile row at
+    once. For each corpus:
+        similarity          cosine between the text's and the corpus's
+                            weighted centroids
+        cluster_similarity  weighted mean over the text's words of each
+                            word's cosine to its nearest corpus cluster
+        closest_theme       words of the corpus cluster most of the text is nearest to
+    Returns dict with the corpora, most similar first.
+    """
+    if not corpus_names:
+        corpus_names = default_corpora()
+    corpus_names = list(dict.fromkeys(corpus_names))
+    for name in corpus_names:
+        corpus_info(name)
+    if stream is None:
+        stream = get_token_stream(text, 'semantic')
+    counts = stream.counter()
+    result = {'total_words': len(stream), 'unique_words': len(counts), 'model': model_version(), 'corpora': []}
+    if not counts:
+        return result
+
+    vectors, valid = get_word_vector(load_model(), list(counts))
+    if not valid:
+        return result
+    vectors = _unit(vectors)
+    weights = sif_weights([counts[w] for w in valid], len(stream))
+    weights /= weights.sum()
+
+    names = tuple(corpus_names)
+    matrix, offsets, profiles = _stacked(names, tuple(tuple(profile_version(n)) for n in names))
+    if matrix.shape[1] != vectors.shape[1]:
+        raise ValueError("Corpus profiles were built with a different model; rebuild them")
+
+    # One product: every word against every centroid and cluster centroid
+    similarities = vectors @ matrix.T
+    # The weighted mean of cosines to a unit centroid is the text centroid's dot product with it
+    centroid_norm = np.linalg.norm(weights @ vectors)
+    centroid_similarity = (weights @ similarities[:, :len(names)]) / max(centroid_norm, 1e-12)
+    clusters = similarities[:, len(names):]
+    nearest = np.maximum.reduceat(clusters, offsets - len(names), axis=1)
+    cluster_similarity = weights @ nearest
+
+    for i, (name, profile) in enumerate(zip(names, profiles)):
+        start = offsets[i] - len(names)
+        local = np.argmax(clusters[:, start:start + len(profile.centers)], axis=1)
+        mass = np.bincount(local, weights=weights, minlength=len(profile.centers))
+        result['corpora'].append({
+            'name': name,
+            'display_name': corpus_info(name)['display_name'],
+            'similarity': round(float(centroid_similarity[i]), 4),
+            'cluster_similarity': round(float(cluster_similarity[i]), 4),
+            'closest_theme': profile.themes[int(np.argmax(mass))]
+        })
+    result['corpora'].sort(key=lambda c: (-c['similarity'], c['name']))
+    return result
+
+
+def run_request(data, stream=None):
+    """Takes decoded similarity request (and optionally its 'semantic' TokenStream).
+
+    Returns corpus similarity result dict.
+    """
+    return compare_corpora(data.get('text', ''), data.get('corpora'), stream=stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build corpus embedding profiles')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='Profile corpora and save the profiles')
+    build.add_argument('--corpus', action='append',
+                       help='Corpus to profile, built-in or custom (repeatable, default: all)')
+    build.add_argument('--profile-dir', default=PROFILE_DIR, help='Output directory')
+    args = parser.parse_args()
+
+    for name in args.corpus or list(available_corpora()):
+        start = time.perf_counter()
+        path = save_profile(build_profile(name), args.profile_dir)
+        print(f"[OK] '{name}' -> {path} ({time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main()
+    else:
+        # One-shot mode for pythonRunner.js: JSON request on stdin
+        try:
+            print(json.dumps(run_request(json.loads(sys.stdin.read() or '{}'))))
+        except Exception as e:
+            print(json.dumps({'error': str(e)}))
+            sys.exit(1)
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Custom reference corpora for keyness analysis.
+
+A custom corpus is registered with a name and description, then filled
+incrementally. Each batch of added documents is streamed through the
+keyness tokenizer and counted into shards; only a bounded number of
+distinct words is held in memory before a shard is written. Shards use
+the same on-disk format as the corpus table and the built-in corpora
+(see corpus_index.py):
+
+    models/corpus-index/v1/<corpus>/          merged table (meta.json has "custom": true)
+    models/corpus-index/custom/<corpus>/v1/   shards not merged yet
+
+Shards are searchable as soon as they are written: keyness reads the
+table and the shards together (corpus_index.SegmentedTable). Adding
+documents never re-reads earlier ones and never rewrites the table; it
+only merges shards of similar size (compact_tiers), so each document is
+re-merged a logarithmic number of times. Merging everything into the
+table (compact) is left to the CLI or an explicit "compact" request.
+Writes to one corpus should come from one process at a time (the Node
+API serialises them).
+
+Requests (stdin for the one-shot script, "input" for worker.py):
+
+    {"action": "list"}
+    {"action": "register", "name": "essays", "display_name": "...", "description": "..."}
+    {"action": "add", "name": "essays", "documents": [{"id": "a.txt", "text": "..."}]}
+    {"action": "compact", "name": "essays"}
+
+Usage: python api/utils/custom_corpora.py register essays --display-name "Past essays"
+       python api/utils/custom_corpora.py add essays essays/ "more/*.txt" extra.jsonl [--no-compact]
+       python api/utils/custom_corpora.py compact essays
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import uuid
+from collections import Counter
+
+from corpora import CORPORA
+from corpus_index import (
+    INDEX_DIR, available_corpora, custom_meta, load_table, merge_tables, pending_shards,
+    read_meta, save_table, shard_metas, shard_root, table_dir, table_from_counter
+)
+from tokenization import tokenize_stream
+
+# Distinct words counted in memory before a shard is written
+SHARD_MAX_WORDS = int(os.environ.get('INKSIGHT_SHARD_MAX_WORDS', 200_000))
+
+# Document-term matrix cells (distinct words per document, summed) held before a shard is written
+SHARD_MAX_ENTRIES = int(os.environ.get('INKSIGHT_SHARD_MAX_ENTRIES', 2_000_000))
+
+# Shards of the same size tier (tokens, in powers of TIER_FANOUT) are merged
+# once TIER_FANOUT of them exist
+TIER_FANOUT = int(os.environ.get('INKSIGHT_SHARD_FANOUT', 4))
+
+NAME_PATTERN = re.compile(r'^[a-z0-9][a-z0-9_-]{0,63}$')
+
+
+def new_shard_id():
+    """Returns an id for a new shard, sortable and unique so concurrent writers never collide."""
+    return f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def remove_shards(shard_ids, root):
+    """Takes shard ids and their shard root. Deletes them and any shards they replaced."""
+    for shard_id in shard_ids:
+        meta = read_meta(shard_id, root) or {}
+        # Replaced shards first, so an interrupted removal never brings them back
+        remove_shards(meta.get('replaces', []), root)
+        shutil.rmtree(table_dir(shard_id, root), ignore_errors=True)
+
+
+def get_custom(name, index_dir=INDEX_DIR):
+    """Takes corpus name. Returns its meta.json, raising ValueError if not registered."""
+    meta = custom_meta(name, index_dir)
+    if meta is None:
+        raise ValueError(f"Unknown custom corpus: {name}")
+    return meta
+
+
+def register(name, display_name=None, description='', index_dir=INDEX_DIR):
+    """Takes corpus name and display metadata. Creates an empty custom corpus.
+
+    Returns its listing entry.
+    """
+    if not NAME_PATTERN.match(name or ''):
+        raise ValueError("Corpus name must be 1-64 lowercase letters, digits, '-' or '_'")
+    if name in CORPORA or read_meta(name, index_dir) is not None:
+        raise ValueError(f"Corpus already exists: {name}")
+    meta = {
+        'custom': True,
+        'display_name': display_name or name,
+        'simple_description': description or 'Custom corpus',
+        'full_description': description or 'Custom reference corpus',
+        'documents': 0,
+        'merged_shards': [],
+    }
+    save_table(table_from_counter(name, Counter(), documents=[]), index_dir, **meta)
+    return list_entry(name, available_corpora(index_dir)[name])
+
+
+def count_documents(texts, max_words=SHARD_MAX_WORDS, max_entries=SHARD_MAX_ENTRIES):
+    """Takes iterable of document texts. Counts keyness tokens in bounded chunks.
+
+    Yields (Counter, list of per-document Counters) each time max_words
+    distinct words or max_entries document-term cells are reached, and once
+    more for the remainder.
+    """
+    counter = Counter()
+    documents = []
+    entries = 0
+    for text in texts:
+        documents.append(tokenize_stream(text, 'keyness').counter())
+        counter.update(documents[-1])
+        entries += len(documents[-1])
+        if len(counter) >= max_words or entries >= max_entries:
+            yield counter, documents
+            counter, documents, entries = Counter(), [], 0
+    if documents:
+        yield counter, documents
+
+
+def add_documents(name, texts, compact_after=False, max_words=SHARD_MAX_WORDS, index_dir=INDEX_DIR):
+    """Takes corpus name and iterable of document texts. Writes them as new shards.
+
+    The shards are searchable right away; shards of the same size tier are
+    merged (compact_tiers). compact_after also merges every shard into the
+    corpus table, which rewrites the whole table.
+    Returns dict with the documents and shards added.
+    """
+    get_custom(name, index_dir)
+    root = shard_root(name, index_dir)
+    added = {'documents': 0, 'shards': 0}
+    for counter, documents in count_documents(texts, max_words):
+        shard = table_from_counter(new_shard_id(), counter, documents=documents)
+        save_table(shard, root, documents=len(documents))
+        added['documents'] += len(documents)
+        added['shards'] += 1
+    if compact_after:
+        compact(name, index_dir)
+    else:
+        compact_tiers(name, index_dir)
+    return added
+
+
+def shard_tier(total):
+    """Takes a shard's token total. Returns its size tier (whole powers of TIER_FANOUT)."""
+    tier = 0
+    while total >= TIER_FANOUT:
+        total //= TIER_FANOUT
+        tier += 1
+    return tier
+
+
+def compact_tiers(name, index_dir=INDEX_DIR):
+    """Takes corpus name. Merges its shards TIER_FANOUT at a time while a size tier has that many.
+
+    A merged shard lands in a higher tier, so merging costs time in
+    proportion to the shards merged, never to the whole corpus. The new
+    shard lists the shards it replaces before they are deleted, so an
+    interrupted merge never counts a document twice.
+    Returns the number of merges.
+    """
+    root = shard_root(name, index_dir)
+    merges = 0
+    while True:
+        tiers = {}
+        metas = shard_metas(name, index_dir)
+        for shard_id, meta in metas.items():
+            tiers.setdefault(shard_tier(meta.get('total', 0)), []).append(shard_id)
+        full = [ids[:TIER_FANOUT] for _, ids in sorted(tiers.items()) if len(ids) >= TIER_FANOUT]
+        if not full:
+            return merges
+        merged = merge_tables(new_shard_id(), [load_table(s, root) for s in full[0]])
+        save_table(merged, root, documents=sum(metas[s].get('documents', 0) for s in full[0]),
+                   replaces=full[0])
+        remove_shards(full[0], root)
+        merges += 1
+
+
+def compact(name, index_dir=INDEX_DIR):
+    """Takes corpus name. Merges pending shards into its table.
+
+    The merged shard ids are stored in meta.json before the shards are
+    deleted, so a merge interrupted in between never counts a shard twice.
+    Returns the corpus listing entry.
+    """
+    meta = get_custom(name, index_dir)
+    root = shard_root(name, index_dir)
+    shards = [s for s in pending_shards(name, index_dir) if s not in meta.get('merged_shards', [])]
+    if shards:
+        tables = [load_table(name, index_dir)] + [load_table(s, root) for s in shards]
+        documents = meta.get('documents', 0) + sum(read_meta(s, root).get('documents', 0) for s in shards)
+        merged = merge_tables(name, tables)
+        custom = {k: meta[k] for k in ('custom', 'display_name', 'simple_description', 'full_description')}
+        save_table(merged, index_dir, **custom, documents=documents, merged_shards=shards)
+    remove_shards(sorted(set(shards) | set(meta.get('merged_shards', []))), root)
+    return list_entry(name, available_corpora(index_dir)[name])
+
+
+def list_entry(name, info):
+    """Takes corpus name and its metadata. Returns the entry shown in the corpus selector."""
+    entry = {'name': name, 'display_name': info['display_name'], 'description': info['simple_description']}
+    if info.get('custom'):
+        entry.update(custom=True, documents=info.get('documents', 0))
+    return entry
+
+
+def list_corpora(index_dir=INDEX_DIR):
+    """Returns the corpus listing: built-in corpora, then registered custom ones."""
+    return [list_entry(name, info) for name, info in available_corpora(index_dir).items()]
+
+
+def run_request(data):
+    """Takes decoded corpus request. Dispatches it on "action".
+
+    Returns the result for the Node API.
+    """
+    action = data.get('action', 'list')
+    if action == 'list':
+        return list_corpora()
+    if action == 'register':
+        return register(data.get('name'), data.get('display_name'), data.get('description', ''))
+    if action == 'add':
+        texts = (doc.get('text', '') for doc in data.get('documents', []))
+        added = add_documents(data.get('name'), texts)
+        return {**added, 'corpus': list_entry(data['name'], available_corpora()[data['name']])}
+    if action == 'compact':
+        return compact(data.get('name'))
+    raise ValueError(f"Unknown action: {action}")
+
+
+def read_texts(inputs):
+    """Takes directories, glob patterns and JSONL paths. Yields document texts one at a time."""
+    from batch import iter_documents
+
+    for _, path, text in iter_documents(inputs):
+        if text is None:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        yield text
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage custom keyness reference corpora')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='List available corpora')
+    reg = commands.add_parser('register', help='Register an empty custom corpus')
+    reg.add_argument('name')
+    reg.add_argument('--display-name')
+    reg.add_argument('--description', default='')
+    add = commands.add_parser('add', help='Add documents to a custom corpus')
+    add.add_argument('name')
+    add.add_argument('inputs', nargs='+', help='Directories, glob patterns or .jsonl files')
+    add.add_argument('--no-compact', action='store_true', help='Only write shards (merge later)')
+    comp = commands.add_parser('compact', help='Merge pending shards into the corpus table')
+    comp.add_argument('name')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        result = list_corpora()
+    elif args.command == 'register':
+        result = register(args.name, args.display_name, args.description)
+    elif args.command == 'add':
+        start = time.perf_counter()
+        result = add_documents(args.name, read_texts(args.inputs), compact_after=not args.no_compact)
+        result['seconds'] = round(time.perf_counter() - start, 2)
+    else:
+        result = compact(args.name)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main()
+    else:
+        # One-shot mode for pythonRunner.js: JSON request on stdin
+        try:
+            print(json.dumps(run_request(json.loads(sys.stdin.read() or '{}'))))
+        except Exception as e:
+            print(json.dumps({'error': str(e)}))
+            sys.exit(1)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Incremental re-analysis of edited documents (delta mode).
+
+Users often upload a draft, change a few paragraphs and upload it again.
+Word, sentence and keyness counts are sums over paragraphs, so a document
+analysed with a doc id keeps its counts between requests and only the
+changed parts are tokenized again:
+
+  1. The text is split into paragraphs at blank lines. Neighbouring
+     paragraphs are joined into one segment when a sentence runs across
+     the break (the first paragraph does not end with . ! or ?, or for the
+     keyness profile Punkt does not end a sentence there). Each segment
+     therefore tokenizes exactly as it does inside the whole document.
+  2. Segment token streams are cached by content hash.
+  3. Per profile, the document keeps running totals. Segments that left
+     the document are subtracted and new segments are added.
+
+Word statistics and keyness give the same results as a full analysis.
+Semantic clustering starts KMeans from the previous version's centroids,
+so cluster numbering stays stable between versions. Documents are kept
+in memory only, in an LRU of DOCUMENT_CACHE_SIZE ids per process
+(pythonRunner.js sends every request for one doc id to the same worker).
+"""
+import json
+import os
+import re
+from collections import Counter, OrderedDict
+
+from analyze import analyze_tokens
+from instrumentation import span
+from keyness import run_request as run_keyness_request
+from semantic import semantic_output, semantic_stages
+from tokenization import TokenCache, content_hash
+
+# Documents whose running totals are kept per process
+DOCUMENT_CACHE_SIZE = int(os.environ.get('INKSIGHT_DELTA_DOCUMENTS', 16))
+
+# Segment token streams shared by all documents
+SEGMENT_CACHE_SIZE = int(os.environ.get('INKSIGHT_DELTA_SEGMENTS', 4096))
+
+# Punkt decisions at paragraph breaks, keyed by the words around the break
+BREAK_CACHE_SIZE = 65536
+
+PARAGRAPH_BREAK = re.compile(r'\n[^\S\n]*\n\s*')
+SENTENCE_END_CHARS = '.!?'
+
+_segment_cache = TokenCache(SEGMENT_CACHE_SIZE)
+_punkt_breaks = OrderedDict()
+_documents = OrderedDict()
+
+
+def paragraphs(text):
+    """Takes text. Returns list of (start, end) spans of its paragraphs, whitespace trimmed."""
+    spans = []
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        spans.append((start, match.start()))
+        start = match.end()
+    spans.append((start, len(text)))
+
+    trimmed = []
+    for start, end in spans:
+        part = text[start:end]
+        if part.strip():
+            trimmed.append((start + len(part) - len(part.lstrip()), start + len(part.rstrip())))
+    return trimmed
+
+
+def punkt_breaks(before, after):
+    """Takes the text before and after a paragraph break. Returns True if Punkt ends a sentence there.
+
+    Punkt decides from the words on either side of a period, so only those
+    are tokenized. The break only counts if both sides also split the same
+    way on their own (Punkt treats "words.!" differently at the end of a
+    text). Answers are cached.
+    """
+    tail = ' '.join(before.rsplit(None, 2)[-2:])
+    head = ' '.join(after.split(None, 2)[:2])
+    key = (tail, head)
+    result = _punkt_breaks.get(key)
+    if result is None:
+        from nltk import sent_tokenize
+
+        result = sent_tokenize(f'{tail}\n\n{head}') == sent_tokenize(tail) + sent_tokenize(head)
+        _punkt_breaks[key] = result
+        if len(_punkt_breaks) > BREAK_CACHE_SIZE:
+            _punkt_breaks.popitem(last=False)
+    return result
+
+
+def segments(text, profile):
+    """Takes text and profile. Groups paragraphs so no sentence crosses a segment edge.
+
+    Returns list of (content hash, segment text) in document order.
+    """
+    result = []
+    spans = paragraphs(text)
+    start = None
+    for i, (para_start, para_end) in enumerate(spans):
+        if start is None:
+            start = para_start
+        if i + 1 < len(spans):
+            closed = text[para_end - 1] in SENTENCE_END_CHARS
+            next_start, next_end = spans[i + 1]
+            if profile == 'keyness':
+                # Punkt can end a sentence after .") too, and can decline to after "Mr."
+                closed = punkt_breaks(text[start:para_end], text[next_start:next_end])
+            if not closed:
+                continue
+        segment = text[start:para_end]
+        result.append((content_hash(segment), segment))
+        start = None
+    return result
+
+
+class CountedStream:
+    """Token counts of a whole document, standing in for its TokenStream.
+
+    Offers what the analyses read from a stream: len(), vocab, counter()
+    and sentence_count.
+    """
+
+    def __init__(self, profile, counts, tokens, sentence_count):
+        self.profile = profile
+        self.vocab = counts
+        self._counts = counts
+        self._tokens = tokens
+        self.sentence_count = sentence_count
+
+    def __len__(self):
+        return self._tokens
+
+    def counter(self):
+        """Returns Counter of tokens, in first-seen order like Counter(tokens)."""
+        return Counter(self._counts)
+
+
+class ProfileTotals:
+    """Running totals of one document for one tokenizer profile."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.counts = Counter()
+        self.tokens = 0
+        self.sentence_count = 0
+        self.segments = Counter()
+        self.streams = {}
+        self.order = []
+
+    def _apply(self, stream, times):
+        """Takes a segment stream and +n / -n. Adds or subtracts its counts n times."""
+        counts = self.counts
+        for word, n in stream.counter().items():
+            total = counts[word] + n * times
+            if total > 0:
+                counts[word] = total
+            else:
+                del counts[word]
+        self.tokens += len(stream) * times
+        self.sentence_count += stream.sentence_count * times
+
+    def update(self, new_segments):
+        """Takes the (hash, text) segments of the new version. Applies the difference.
+
+        Returns number of segments that were not in the previous version.
+        """
+        new = Counter(key for key, _ in new_segments)
+        for key, n in (self.segments - new).items():
+            self._apply(self.streams[key], -n)
+            if key not in new:
+                del self.streams[key]
+        texts = dict(new_segments)
+        added = new.keys() - self.segments.keys()
+        for key, n in (new - self.segments).items():
+            if key not in self.streams:
+                self.streams[key] = _segment_cache.get(texts[key], self.profile)
+            self._apply(self.streams[key], n)
+        self.segments = new
+        self.order = [key for key, _ in new_segments]
+        return len(added)
+
+    def stream(self):
+        """Returns the document's CountedStream.
+
+        Words are put in first-seen order by walking the segment vocabularies,
+        so ties rank exactly as in a full analysis.
+        """
+        counts = self.counts
+        ordered = {}
+        for key in self.order:
+            for word in self.streams[key].vocab:
+                if word not in ordered:
+                    ordered[word] = counts[word]
+        return CountedStream(self.profile, ordered, self.tokens, self.sentence_count)
+
+
+class DeltaDocument:
+    """State kept between versions of one document."""
+
+    def __init__(self):
+        self.profiles = {}
+        self.semantic_state = {}
+
+    def totals(self, text, profile):
+        """Takes the new text and a profile. Updates its totals.
+
+        Returns the document's CountedStream for that profile.
+        """
+        totals = self.profiles.get(profile)
+        if totals is None:
+            totals = self.profiles[profile] = ProfileTotals(profile)
+        with span('delta', profile=profile) as s:
+            new_segments = segments(text, profile)
+            changed = totals.update(new_segments)
+            s.count(segments=len(new_segments), changed=changed)
+        return totals.stream()
+
+
+def get_document(doc_id):
+    """Takes doc id. Returns its DeltaDocument, creating it (and evicting the oldest) if needed."""
+    doc = _documents.get(doc_id)
+    if doc is None:
+        doc = _documents[doc_id] = DeltaDocument()
+        if len(_documents) > DOCUMENT_CACHE_SIZE:
+            _documents.popitem(last=False)
+    else:
+        _documents.move_to_end(doc_id)
+    return doc
+
+
+def analyze_delta(doc_id, text):
+    """Takes doc id and raw text. Returns analyze.py's result from the running counts."""
+    return analyze_tokens(get_document(doc_id).totals(text, 'words'))
+
+
+def keyness_delta(doc_id, raw):
+    """Takes doc id and raw keyness request. Scores the running keyness counts.
+
+    Returns keyness result dict.
+    """
+    data = json.loads(raw)
+    stream = get_document(doc_id).totals(data.get('text', ''), 'keyness')
+    return run_keyness_request(data, stream=stream)
+
+
+def semantic_delta(doc_id, text):
+    """Takes doc id and raw text. Clusters the running counts, warm-started from the last version.
+
+    Returns semantic.py's result.
+    """
+    doc = get_document(doc_id)
+    return semantic_output(text, doc.totals(text, 'semantic'), doc.semantic_state)
+
+
+def semantic_delta_stages(doc_id, text):
+    """Takes doc id and raw text. Streams semantic_delta's analysis stage by stage.
+
+    Returns semantic.py's stage generator.
+    """
+    doc = get_document(doc_id)
+    return semantic_stages(text, doc.totals(text, 'semantic'), doc.semantic_state)
+
+
+# Script name (as used by pythonRunner.js) -> handler taking doc id and raw input
+DELTA_HANDLERS = {
+    'analyze.py': analyze_delta,
+    'keyness.py': keyness_delta,
+    'semantic.py': semantic_delta,
+}
+
+# Script name -> handler taking doc id and raw input, returning a stage generator
+DELTA_STREAM_HANDLERS = {
+    'semantic.py': semantic_delta_stages,
+}
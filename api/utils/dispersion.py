@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Vectorised dispersion statistics over a document-term matrix.
+
+Summed corpus counts cannot tell a word used evenly across a corpus from
+one that is frequent in a single text. Both measures here look at how a
+word's occurrences are spread over the corpus documents (its parts), for
+the whole vocabulary at once from a sparse (documents x words) count
+matrix in CSC layout (one column per word):
+
+    juilland_d  Juilland's D on per-document relative frequencies:
+                1 - (sd / mean) / sqrt(n - 1). 1 = perfectly even.
+    dp_norm     Gries' deviation of proportions, normalised:
+                0.5 * sum(|v_i / f - s_i / S|) / (1 - min(s_i / S)).
+                0 = spread like the documents' sizes, 1 = all in one part.
+
+Only the non-zero cells are visited, so the cost is linear in the number
+of stored entries, not documents x vocabulary. Both are NaN when the corpus
+has fewer than two documents.
+"""
+import numpy as np
+
+
+def document_term_matrix(documents, vocab):
+    """Takes per-document Counters and the sorted vocabulary. Builds the count matrix.
+
+    Every word must be in vocab. Returns scipy.sparse.csc_matrix of shape
+    (documents, words) with int64 counts.
+    """
+    from scipy.sparse import csc_matrix
+
+    rows, cols, data = [], [], []
+    for row, counter in enumerate(documents):
+        if not counter:
+            continue
+        words = np.array(list(counter), dtype=vocab.dtype)
+        rows.append(np.full(len(words), row, dtype=np.int64))
+        cols.append(np.searchsorted(vocab, words))
+        data.append(np.fromiter(counter.values(), dtype=np.int64, count=len(words)))
+    if not data:
+        return csc_matrix((len(documents), len(vocab)), dtype=np.int64)
+    return csc_matrix(
+        (np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+        shape=(len(documents), len(vocab)), dtype=np.int64
+    )
+
+
+def _column_sums(values, indptr):
+    """Takes per-entry values and CSC column pointers. Returns per-column sums (0 for empty columns)."""
+    sums = np.zeros(len(indptr) - 1, dtype=np.float64)
+    nonempty = np.flatnonzero(np.diff(indptr))
+    if len(nonempty):
+        sums[nonempty] = np.add.reduceat(values, indptr[nonempty])
+    return sums
+
+
+def dispersion(data, indices, indptr, sizes):
+    """Takes CSC arrays of the document-term matrix and each document's token total.
+
+    Documents without tokens are ignored. Returns tuple of (juilland_d,
+    dp_norm) float64 arrays, one value per column.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    indices = np.asarray(indices)
+    indptr = np.asarray(indptr)
+    sizes = np.asarray(sizes, dtype=np.float64)
+    n_words = len(indptr) - 1
+    parts = int(np.count_nonzero(sizes))
+    if parts < 2:
+        nan = np.full(n_words, np.nan)
+        return nan, nan.copy()
+
+    # Column of every stored entry, and the size of its document
+    entry_sizes = sizes[indices]
+    frequency = _column_sums(data, indptr)
+    entry_frequency = np.repeat(frequency, np.diff(indptr))
+
+    # DP: documents without the word contribute their whole share s_i / S
+    share = entry_sizes / sizes.sum()
+    dp = 0.5 * (1.0 + _column_sums(np.abs(data / entry_frequency - share) - share, indptr))
+    dp_norm = dp / (1.0 - sizes[sizes > 0].min() / sizes.sum())
+
+    # Juilland's D on relative frequencies (absent documents are zeros)
+    relative = data / entry_sizes
+    mean = _column_sums(relative, indptr) / parts
+    variance = np.maximum(_column_sums(relative ** 2, indptr) / parts - mean ** 2, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        juilland_d = 1.0 - np.sqrt(variance) / mean / np.sqrt(parts - 1)
+    return np.clip(juilland_d, 0.0, 1.0), np.clip(dp_norm, 0.0, 1.0)
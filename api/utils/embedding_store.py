@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""Memory-mapped word vector store exported from a FastText model.
+
+fasttext.load_model reads the whole cc.en.300.bin (~7 GB) into private
+memory. This module exports the model's word vectors once into plain .npy
+files that are opened with mmap, so startup takes milliseconds and every
+worker shares the same pages through the OS page cache:
+
+    models/embeddings/cc.en.300/
+        meta.json        dimensions, dtype, source model and subword settings
+        vocab.npy        sorted UTF-8 vocabulary (fixed width bytes)
+        rows.npy         matrix row of each sorted vocabulary entry
+        vectors.npy      (vocab, dim) float32, float16 or int8 vectors
+        scales.npy       per-row scales (int8 only)
+        subwords.npy     optional (bucket, dim) character n-gram vectors
+        subword_scales.npy
+
+Out-of-vocabulary words are handled by the configured fallback:
+    subword  average the exported character n-gram vectors (as FastText does)
+    model    load the original .bin lazily and ask it
+    none     skip the word
+    auto     subword if exported, else model if the .bin exists, else none
+
+Usage: python api/utils/embedding_store.py [--model PATH] [--output DIR]
+           [--top-n 200000] [--dtype float32|float16|int8] [--with-subwords]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# Longer vocabulary entries (mostly crawl noise) are left to the OOV fallback
+MAX_WORD_BYTES = 64
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_MODEL = os.path.join(project_root, 'models', 'cc.en.300.bin')
+STORE_PATH = os.environ.get(
+    'INKSIGHT_EMBEDDING_STORE', os.path.join(project_root, 'models', 'embeddings', 'cc.en.300')
+)
+OOV_FALLBACK = os.environ.get('INKSIGHT_OOV_FALLBACK', 'auto')
+
+BOW, EOW = '<', '>'
+
+# Arrays of a store (saved as <name>.npy); the last three are optional
+ARRAY_NAMES = ('vocab', 'rows', 'vectors', 'scales', 'subwords', 'subword_scales')
+
+
+def fasttext_hash(data):
+    """Takes UTF-8 bytes. Returns FastText's 32-bit FNV-1a hash.
+
+    Bytes are sign-extended first, exactly like the int8_t cast in C++.
+    """
+    h = 2166136261
+    for byte in data:
+        h ^= (byte - 256 if byte > 127 else byte) & 0xFFFFFFFF
+        h = (h * 16777619) & 0xFFFFFFFF
+    return h
+
+
+def subword_buckets(word, minn, maxn, bucket):
+    """Takes word and n-gram settings. Returns bucket ids of its character n-grams.
+
+    Mirrors Dictionary::computeSubwords, including UTF-8 continuation bytes.
+    """
+    data = (BOW + word + EOW).encode('utf-8')
+    ids = []
+    if maxn <= 0 or bucket <= 0:
+        return ids
+    for i in range(len(data)):
+        if (data[i] & 0xC0) == 0x80:
+            continue
+        j, n = i, 1
+        while j < len(data) and n <= maxn:
+            j += 1
+            while j < len(data) and (data[j] & 0xC0) == 0x80:
+                j += 1
+            if n >= minn and not (n == 1 and (i == 0 or j == len(data))):
+                ids.append(fasttext_hash(data[i:j]) % bucket)
+            n += 1
+    return ids
+
+
+def quantize(block, dtype):
+    """Takes float32 rows and target dtype. Returns (stored rows, per-row scales or None)."""
+    if dtype == 'int8':
+        scales = np.abs(block).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        rows = np.clip(np.rint(block / scales[:, None]), -127, 127).astype(np.int8)
+        return rows, scales.astype(np.float32)
+    return block.astype(dtype), None
+
+
+class EmbeddingStore:
+    """Read-only, memory-mapped word vectors with FastText-compatible lookups.
+
+    The arrays can also come from elsewhere (see from_arrays), e.g. a
+    shared memory segment; path is then the store they were copied from,
+    or None.
+    """
+
+    def __init__(self, path, fallback=OOV_FALLBACK):
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {}
+        for name in ARRAY_NAMES:
+            file_path = os.path.join(path, f'{name}.npy')
+            if os.path.exists(file_path):
+                arrays[name] = np.load(file_path, mmap_mode='r')
+        self._open(path, meta, arrays, fallback)
+
+    @classmethod
+    def from_arrays(cls, meta, arrays, path=None, fallback=OOV_FALLBACK):
+        """Takes store meta and a dict of its arrays (by ARRAY_NAMES). Wraps them without copying."""
+        store = cls.__new__(cls)
+        store._open(path, meta, arrays, fallback)
+        return store
+
+    def _open(self, path, meta, arrays, fallback):
+        if meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported embedding store format in {path}")
+        self.meta = meta
+        self.path = path
+        self.vocab = arrays['vocab']
+        self.rows = arrays['rows']
+        self.vectors = arrays['vectors']
+        self.scales = arrays.get('scales')
+        self.subwords = arrays.get('subwords')
+        self.subword_scales = arrays.get('subword_scales')
+        self.fallback = self._resolve_fallback(fallback)
+        self._model = None
+
+    def _resolve_fallback(self, fallback):
+        if fallback == 'auto':
+            if self.subwords is not None:
+                return 'subword'
+            return 'model' if os.path.exists(self.meta.get('source_model', '')) else 'none'
+        if fallback == 'subword' and self.subwords is None:
+            raise ValueError("Store was exported without --with-subwords")
+        if fallback not in ('subword', 'model', 'none'):
+            raise ValueError(f"Unknown OOV fallback: {fallback}")
+        return fallback
+
+    def get_dimension(self):
+        return self.meta['dim']
+
+    def _rows_to_float(self, matrix, scales, idx):
+        vecs = np.asarray(matrix[idx], dtype=np.float32)
+        if scales is not None:
+            vecs *= np.asarray(scales[idx], dtype=np.float32)[:, None]
+        return vecs
+
+    def lookup_rows(self, words):
+        """Takes list of words. Returns matrix row per word (-1 if not in the store)."""
+        keys = np.array([w.encode('utf-8') for w in words], dtype='S')
+        if len(keys) == 0 or len(self.vocab) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.vocab, keys), len(self.vocab) - 1)
+        found = self.vocab[pos] == keys
+        return np.where(found, self.rows[pos], -1)
+
+    def _oov_vector(self, word):
+        if self.fallback == 'subword':
+            meta = self.meta
+            ids = subword_buckets(word, meta['minn'], meta['maxn'], meta['bucket'])
+            if not ids:
+                return None
+            return self._rows_to_float(self.subwords, self.subword_scales, ids).mean(axis=0)
+        if self.fallback == 'model':
+            if self._model is None:
+                import fasttext
+                self._model = fasttext.load_model(self.meta['source_model'])
+            return self._model.get_word_vector(word)
+        return None
+
+    def get_vectors(self, words):
+        """Takes list of words. Looks up all of them in one batch.
+
+        Returns tuple of (float32 matrix, list of words that got a vector).
+        """
+        rows = self.lookup_rows(words)
+        vectors = np.zeros((len(words), self.get_dimension()), dtype=np.float32)
+        known = rows >= 0
+        if known.any():
+            vectors[known] = self._rows_to_float(self.vectors, self.scales, rows[known])
+
+        keep = known.copy()
+        for i in np.flatnonzero(~known).tolist():
+            vec = self._oov_vector(words[i])
+            if vec is not None:
+                vectors[i] = vec
+                keep[i] = True
+        return vectors[keep], [w for w, k in zip(words, keep.tolist()) if k]
+
+    def get_word_vector(self, word):
+        """Takes a word. Returns its vector (FastText model compatible).
+
+        Raises KeyError when the word is unknown and no fallback applies.
+        """
+        vectors, valid = self.get_vectors([word])
+        if not valid:
+            raise KeyError(word)
+        return vectors[0]
+
+
+def store_layout(model, top_n=None, dtype='float32', with_subwords=False):
+    """Takes a loaded FastText model and export options. Plans the store without copying vectors.
+
+    Returns tuple of (exported words, dict of array name -> (shape, dtype), meta dict).
+    """
+    args = model.f.getArgs()
+    dim = model.get_dimension()
+
+    # FastText keeps words in frequency order, so top-N is a prefix
+    words = [w for w in model.get_words(on_unicode_error='replace')
+             if w != '</s>' and len(w.encode('utf-8')) <= MAX_WORD_BYTES]
+    if top_n:
+        words = words[:top_n]
+    with_subwords = bool(with_subwords and args.maxn > 0)
+
+    store_dtype = np.dtype(np.int8 if dtype == 'int8' else dtype)
+    width = max((len(w.encode('utf-8')) for w in words), default=1)
+    layout = {
+        'vocab': ((len(words),), np.dtype(f'S{width}')),
+        'rows': ((len(words),), np.dtype(np.int32)),
+        'vectors': ((len(words), dim), store_dtype),
+    }
+    if dtype == 'int8':
+        layout['scales'] = ((len(words),), np.dtype(np.float32))
+    if with_subwords:
+        layout['subwords'] = ((args.bucket, dim), store_dtype)
+        if dtype == 'int8':
+            layout['subword_scales'] = ((args.bucket,), np.dtype(np.float32))
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'dim': dim,
+        'dtype': dtype,
+        'vocab_size': len(words),
+        'top_n': top_n,
+        'minn': args.minn,
+        'maxn': args.maxn,
+        'bucket': args.bucket,
+        'subwords': with_subwords,
+    }
+    return words, layout, meta
+
+
+def fill_store(model, words, arrays, batch_size=50000):
+    """Takes a FastText model, the exported words and arrays allocated per store_layout.
+
+    Writes the vectors in batches, so no second full copy of the matrix is
+    ever held in memory.
+    """
+    dim = model.get_dimension()
+    dtype = 'int8' if arrays['vectors'].dtype == np.int8 else arrays['vectors'].dtype
+    for start in range(0, len(words), batch_size):
+        batch = words[start:start + batch_size]
+        block = np.array([model.get_word_vector(w) for w in batch], dtype=np.float32)
+        rows, block_scales = quantize(block.reshape(len(batch), dim), dtype)
+        arrays['vectors'][start:start + len(batch)] = rows
+        if block_scales is not None:
+            arrays['scales'][start:start + len(batch)] = block_scales
+
+    encoded = np.array([w.encode('utf-8') for w in words], dtype=arrays['vocab'].dtype)
+    order = np.argsort(encoded, kind='stable')
+    arrays['vocab'][:] = encoded[order]
+    arrays['rows'][:] = order.astype(np.int32)
+
+    if 'subwords' in arrays:
+        nwords = len(model.get_words())
+        bucket = len(arrays['subwords'])
+        input_matrix = model.get_input_matrix()
+        for start in range(0, bucket, batch_size):
+            block = np.asarray(input_matrix[nwords + start:nwords + min(start + batch_size, bucket)],
+                               dtype=np.float32)
+            sub_rows, sub_scales = quantize(block, dtype)
+            arrays['subwords'][start:start + len(block)] = sub_rows
+            if sub_scales is not None:
+                arrays['subword_scales'][start:start + len(block)] = sub_scales
+
+
+def export_store(model_path=DEFAULT_MODEL, output=STORE_PATH, top_n=None,
+                 dtype='float32', with_subwords=False, batch_size=50000):
+    """Takes FastText model path and export options. Writes a store directory.
+
+    Vectors are streamed to disk in batches so the export never holds a
+    second full copy of the matrix. Returns path of the written store.
+    """
+    import fasttext
+
+    model = fasttext.load_model(model_path)
+    words, layout, meta = store_layout(model, top_n, dtype, with_subwords)
+
+    parent = os.path.dirname(os.path.abspath(output))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.store-', dir=parent)
+
+    arrays = {
+        name: np.lib.format.open_memmap(os.path.join(tmp_dir, f'{name}.npy'), mode='w+', dtype=dt, shape=shape)
+        for name, (shape, dt) in layout.items()
+    }
+    fill_store(model, words, arrays, batch_size)
+    for array in arrays.values():
+        array.flush()
+    del arrays
+
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            **meta,
+            'source_model': os.path.abspath(model_path),
+            'source_size': os.path.getsize(model_path),
+        }, f, indent=2)
+
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    os.replace(tmp_dir, output)
+    return output
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export FastText vectors to a memory-mapped store')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='FastText .bin model')
+    parser.add_argument('--output', default=STORE_PATH, help='Store directory')
+    parser.add_argument('--top-n', type=int, default=None, help='Keep only the N most frequent words')
+    parser.add_argument('--dtype', choices=['float32', 'float16', 'int8'], default='float32')
+    parser.add_argument('--with-subwords', action='store_true',
+                        help='Also export character n-gram vectors for OOV words')
+    args = parser.parse_args()
+
+    path = export_store(args.model, args.output, args.top_n, args.dtype, args.with_subwords)
+    print(f"[OK] Embedding store written to {path}", file=sys.stderr)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Word vectors for semantic analysis when no FastText model is installed.
+
+Two fallbacks, selected with INKSIGHT_FALLBACK_MODEL:
+
+    trained  (default) a small FastText skipgram model trained on a fixed
+             paragraph. Training is deterministic (one thread, fixed
+             settings) and happens once: the model is saved atomically to
+             models/fallback/<version>/model.bin and loaded from there by
+             every later request and process.
+    hashed   no training and no FastText: a word's vector is the mean of
+             pseudo-random vectors of its character n-grams (3 to 6 letters
+             with < > word boundaries, as FastText uses), hashed into
+             HASHED_BUCKETS rows. Needs only NumPy.
+
+Neither captures meaning like cc.en.300.bin; they keep semantic analysis
+working (words sharing n-grams land close together) in CI and offline
+deployments. The version string of each changes with its settings, so a
+changed fallback never reuses a stale cached model or result.
+"""
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import zlib
+
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+FALLBACK_DIR = os.environ.get('INKSIGHT_FALLBACK_DIR', os.path.join(project_root, 'models', 'fallback'))
+
+# 'trained' or 'hashed'
+FALLBACK_KIND = os.environ.get('INKSIGHT_FALLBACK_MODEL', 'trained')
+
+TRAINING_TEXT = (
+    "Natural Language Processing Text analysis and data mining "
+    "Semantic understanding and relationship extraction "
+    "Sentiment analysis and opinion mining "
+    "Word embedding for vector representation"
+)
+
+# One thread makes training reproducible (and several threads crash FastText on
+# a text this short); a small bucket keeps the model at ~10 MB instead of 400 MB
+TRAIN_SETTINGS = {
+    'model': 'skipgram', 'dim': 50, 'epoch': 5, 'minCount': 1, 'bucket': 50000, 'thread': 1, 'verbose': 0,
+}
+
+HASHED_DIM = 64
+HASHED_BUCKETS = 1 << 16
+HASHED_MINN, HASHED_MAXN = 3, 6
+HASHED_SEED = 0
+
+
+def fallback_version(kind=None):
+    """Takes fallback kind (default FALLBACK_KIND). Returns a string that changes with its settings."""
+    kind = kind or FALLBACK_KIND
+    if kind == 'hashed':
+        return (f"hashed-{HASHED_BUCKETS}x{HASHED_DIM}-n{HASHED_MINN}{HASHED_MAXN}"
+                f"-crc32-s{HASHED_SEED}")
+    if kind != 'trained':
+        raise ValueError(f"Unknown fallback model: {kind}")
+    digest = hashlib.sha256(json.dumps([TRAINING_TEXT, TRAIN_SETTINGS], sort_keys=True).encode()).hexdigest()
+    return f"trained-{digest[:12]}"
+
+
+def trained_path(cache_dir=FALLBACK_DIR):
+    """Takes cache directory. Returns where the trained fallback model is stored."""
+    return os.path.join(cache_dir, fallback_version('trained'), 'model.bin')
+
+
+def _train(directory):
+    """Takes a directory. Trains the fallback model there. Returns the model file path."""
+    import fasttext
+
+    text_path = os.path.join(directory, 'training.txt')
+    with open(text_path, 'w', encoding='utf-8') as f:
+        f.write(TRAINING_TEXT)
+    model_file = os.path.join(directory, 'model.bin')
+    fasttext.train_unsupervised(text_path, **TRAIN_SETTINGS).save_model(model_file)
+    return model_file
+
+
+def load_trained(cache_dir=FALLBACK_DIR):
+    """Takes cache directory. Loads the trained fallback model, training it on first use.
+
+    Concurrent first uses each train in a private temp directory and
+    rename the identical result into place, so nobody reads a partial
+    file. If the cache directory is not writable the model is trained
+    for this process only.
+    Returns FastText model object.
+    """
+    import fasttext
+
+    path = trained_path(cache_dir)
+    if os.path.exists(path):
+        return fasttext.load_model(path)
+    print(f"Training fallback model into {path}", file=sys.stderr)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix='.train-', dir=os.path.dirname(path)) as tmp:
+            os.replace(_train(tmp), path)
+        return fasttext.load_model(path)
+    except OSError as e:
+        print(f"Cannot cache fallback model ({e}), training in memory", file=sys.stderr)
+        with tempfile.TemporaryDirectory(prefix='inksight-fallback-') as tmp:
+            return fasttext.load_model(_train(tmp))
+
+
+class HashedVectors:
+    """Character n-gram hashing vectors: no vocabulary, no training.
+
+    Has the get_vectors / get_word_vector / get_dimension interface
+    semantic.py uses. Every word gets a vector.
+    """
+
+    def __init__(self, dim=HASHED_DIM, buckets=HASHED_BUCKETS, minn=HASHED_MINN, maxn=HASHED_MAXN,
+                 seed=HASHED_SEED):
+        self.dim = dim
+        self.buckets = buckets
+        self.minn = minn
+        self.maxn = maxn
+        rng = np.random.default_rng(seed)
+        self.matrix = rng.standard_normal((buckets, dim), dtype=np.float32) / np.float32(np.sqrt(dim))
+
+    def get_dimension(self):
+        return self.dim
+
+    def ngram_rows(self, word):
+        """Takes a word. Returns the bucket rows of the word and its character n-grams."""
+        marked = f'<{word}>'
+        grams = [marked] + [
+            marked[i:i + n]
+            for n in range(self.minn, self.maxn + 1)
+            for i in range(len(marked) - n + 1)
+            if marked[i:i + n] != marked
+        ]
+        return [zlib.crc32(g.encode('utf-8')) % self.buckets for g in grams]
+
+    def get_vectors(self, words):
+        """Takes list of words. Returns tuple of (vectors, words); every word is valid."""
+        words = list(words)
+        if not words:
+            return np.zeros((0, self.dim), dtype=np.float32), []
+        rows, starts = [], []
+        for word in words:
+            starts.append(len(rows))
+            rows.extend(self.ngram_rows(word))
+        sums = np.add.reduceat(self.matrix[rows], starts, axis=0)
+        counts = np.diff(starts + [len(rows)]).astype(np.float32)
+        return sums / counts[:, None], words
+
+    def get_word_vector(self, word):
+        return self.get_vectors([word])[0][0]
+
+
+def load_fallback(kind=None, cache_dir=FALLBACK_DIR):
+    """Takes fallback kind (default FALLBACK_KIND) and cache directory. Returns the fallback vectors."""
+    kind = kind or FALLBACK_KIND
+    fallback_version(kind)
+    if kind == 'hashed':
+        return HashedVectors()
+    return load_trained(cache_dir)
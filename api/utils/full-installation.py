@@ -18,6 +18,10 @@ def download_nltk_data():
     setup_nltk_path = Path(__file__).parent / "setup_nltk.py"
     subprocess.check_call([sys.executable, str(setup_nltk_path)])
 
+def build_corpus_index():
+    corpus_index_path = Path(__file__).parent / "corpus_index.py"
+    subprocess.check_call([sys.executable, str(corpus_index_path)])
+
 def download_fasttext_model():
     # Navigate to project root, then into models/ directory
     models_dir = Path(__file__).parent.parent.parent / "models"
@@ -49,6 +53,9 @@ if __name__ == "__main__":
     print("Downloading NLTK data...")
     download_nltk_data()
 
+    print("Building reference corpus tables...")
+    build_corpus_index()
+
     print("Downloading FastText model...")
     download_fasttext_model()
 
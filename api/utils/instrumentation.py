@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Opt-in timing spans for the analysis scripts.
+
+Analysis code marks its stages with span():
+
+    with span('tokenize', profile='keyness') as s:
+        stream = ...
+        s.count(tokens=len(stream), vocab=len(stream.vocab))
+
+Spans cost almost nothing unless a trace is active. A trace is started per
+request by traced() when timings are requested (the request's "timings"
+flag or INKSIGHT_TIMINGS=1), and each span then records wall time, CPU
+time, resident memory change and any counts it was given. The spans are
+returned in a "_timings" block next to the result.
+
+For production monitoring a fraction of requests (INKSIGHT_PROFILE_SAMPLE,
+0 to 1) can be traced without changing their output:
+
+    INKSIGHT_METRICS_FILE   append one JSON line of spans per sampled request
+    INKSIGHT_PROFILE_DIR    write a cProfile dump per sampled request
+
+Nothing is written unless one of these is set. The active trace lives in a
+contextvar, so concurrent requests in threads or tasks do not mix spans.
+"""
+import cProfile
+import json
+import os
+import random
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+TIMINGS = os.environ.get('INKSIGHT_TIMINGS', '') == '1'
+SAMPLE_RATE = float(os.environ.get('INKSIGHT_PROFILE_SAMPLE', 0) or 0)
+METRICS_FILE = os.environ.get('INKSIGHT_METRICS_FILE', '')
+PROFILE_DIR = os.environ.get('INKSIGHT_PROFILE_DIR', '')
+
+_current = ContextVar('inksight_trace', default=None)
+
+
+def rss_mb():
+    """Returns current resident memory in MB (None where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _Clock:
+    """Wall time, CPU time and resident memory since construction."""
+
+    def __init__(self):
+        self.rss = rss_mb()
+        self.cpu = time.process_time()
+        self.wall = time.perf_counter()
+
+    def measure(self):
+        measures = {
+            'wall_ms': round((time.perf_counter() - self.wall) * 1000, 3),
+            'cpu_ms': round((time.process_time() - self.cpu) * 1000, 3),
+        }
+        rss = rss_mb()
+        if rss is not None and self.rss is not None:
+            measures['rss_delta_mb'] = round(rss - self.rss, 2)
+        return measures
+
+
+class Span:
+    """One timed stage of a trace."""
+
+    def __init__(self, trace, name, counts):
+        self.trace = trace
+        self.record = {'name': name, 'depth': trace.depth, **counts}
+
+    def count(self, **counts):
+        """Takes keyword counts (tokens, vocab, ...). Attaches them to the span."""
+        self.record.update(counts)
+
+    def __enter__(self):
+        self.trace.spans.append(self.record)
+        self.trace.depth += 1
+        self._clock = _Clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.record.update(self._clock.measure())
+        self.trace.depth -= 1
+        return False
+
+
+class _NoSpan:
+    """Stand-in used when no trace is active."""
+
+    def count(self, **counts):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Trace:
+    """Spans recorded for one request, in start order with nesting depth."""
+
+    def __init__(self, name):
+        self.name = name
+        self.spans = []
+        self.depth = 0
+        self.total = {}
+
+    def __enter__(self):
+        self._clock = _Clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.total = self._clock.measure()
+        return False
+
+    def to_dict(self):
+        """Returns the _timings block: request totals plus every span."""
+        return {'request': self.name, **self.total, 'spans': self.spans}
+
+
+def span(name, **counts):
+    """Takes stage name and optional counts. Returns a context manager timing it."""
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return Span(trace, name, counts)
+
+
+def export(trace, profiler=None):
+    """Takes finished trace and optional profiler. Writes the configured metrics outputs."""
+    stamp = datetime.now(timezone.utc)
+    if METRICS_FILE:
+        line = {'time': stamp.isoformat(timespec='milliseconds'), **trace.to_dict()}
+        with open(METRICS_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(line) + '\n')
+    if profiler is not None:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(
+            PROFILE_DIR, f"{stamp.strftime('%Y%m%d-%H%M%S-%f')}-{trace.name}-{os.getpid()}.prof"
+        ))
+
+
+def traced(name, fn, *args, timings=TIMINGS, **kwargs):
+    """Takes request name, analysis function and its arguments. Runs it under a trace.
+
+    The trace is active if timings were requested or the request is sampled.
+    Returns the result, with a _timings block added when timings is true.
+    """
+    sampled = SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+    if not (timings or sampled):
+        return fn(*args, **kwargs)
+
+    trace = Trace(name)
+    profiler = cProfile.Profile() if sampled and PROFILE_DIR else None
+    token = _current.set(trace)
+    try:
+        with trace:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+    finally:
+        _current.reset(token)
+
+    if sampled:
+        export(trace, profiler)
+    if timings and isinstance(result, dict):
+        # Copy so cached results never carry timings
+        result = {**result, '_timings': trace.to_dict()}
+    return result
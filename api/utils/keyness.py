@@ -1,123 +1,435 @@
 #!/usr/bin/env python3
 import json
+import os
 import sys
-from nltk import word_tokenize, FreqDist
-from statsmodels.stats.proportion import proportion_effectsize as cohen_h
-from scipy.stats import chi2_contingency
+import numpy as np
 from corpora import CORPORA
+from corpus_index import corpus_info, default_corpora, get_ngram_table, get_table, table_version
+from instrumentation import TIMINGS, span, traced
+from keyness_stats import cohen_h, score_keyness
+from ngrams import check_size, ngram_keys, pack, phrases, stream_ids, unpack
+from tokenization import get_token_stream, tokenize_stream
 
-def tokenize(text):
+# Processes used to count corpora that have no prebuilt table (0 or 1 disables the pool)
+KEYNESS_PROCESSES = int(os.environ.get('INKSIGHT_KEYNESS_PROCESSES', min(4, os.cpu_count() or 1)))
+
+_pool = None
+
+# Request fields that filter keywords by corpus dispersion
+DISPERSION_FILTERS = ('min_juilland_d', 'max_dp_norm')
+
+# Request fields of the sliding-window mode (see analyze_keyness_windows)
+WINDOW_FIELDS = ('window', 'stride', 'top_keywords')
+WINDOW_KEYWORDS = 50
+# Keeps the window x keyword matrix small; a larger stride is needed beyond this
+MAX_WINDOWS = 1000
+
+def tokenize(text, method=None):
     """Takes text as argument. Splits into normalized words.
 
+    method selects the 'fast' or 'nltk' tokenizer (same result).
     Returns list of lowercase words (3+ letters only).
     """
-    return [w.lower() for w in word_tokenize(text) if w.isalpha() and len(w) >= 3]
+    return tokenize_stream(text, 'keyness', method).tokens()
+
+def dispersion_limit(value, name):
+    """Takes a dispersion filter value from a request. Returns it as a float in [0, 1] (or None)."""
+    if value is None or value == '':
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number between 0 and 1")
+    if not 0 <= value <= 1:
+        raise ValueError(f"{name} must be a number between 0 and 1")
+    return value
 
-def test_frequency(user_count, corpus_count, user_total, corpus_total):
-    """Takes word counts and totals. Calculates statistical difference.
+def _rounded(value):
+    """Takes a float (possibly NaN). Returns it rounded to 4 places, or None for NaN."""
+    return None if np.isnan(value) else round(float(value), 4)
 
-    Uses chi-squared test. Returns chi-squared score.
-    """
-    if user_count <= 0 or corpus_count <= 0:
-        return 0.0
-    contingency_table = [
-        [user_count, corpus_count],
-        [user_total - user_count, corpus_total - corpus_count]
-    ]
-    return chi2_contingency(contingency_table)[0]
-
-def freq_strength(user_count, corpus_count, user_total, corpus_total):
-    """Takes word counts and totals. Calculates magnitude of difference.
-
-    Uses Cohen's h. Returns effect size score.
+def score_candidates(words, user_counts, corpus_counts, user_total, corpus_total,
+                     dispersion=None, min_juilland_d=None, max_dp_norm=None):
+    """Takes candidate words (or phrases), their counts, both totals and optionally
+    the corpus dispersion of each candidate with its filters.
+
+    Scores every candidate in one pass (smoothing avoids zero-count errors).
+    Returns list of significant keyword dicts, under-represented first.
     """
-    user_prop = user_count / user_total if user_total > 0 else 0
-    corpus_prop = corpus_count / corpus_total if corpus_total > 0 else 0
-    return cohen_h(user_prop, corpus_prop)
+    keywords = []
+    if user_total <= 0:
+        return keywords
+    with span('score', candidates=len(words)):
+        stats = score_keyness(user_counts + 0.5, corpus_counts + 0.5, user_total, corpus_total)
 
-def give_star_value(score):
-    """Takes statistical score. Converts to star markers based on thresholds.
+    # Only keep statistically significant keywords (evenly enough spread, if asked)
+    keep = stats['chi2'] >= 3.84
+    if dispersion is not None:
+        juilland_d, dp_norm = dispersion
+        with np.errstate(invalid='ignore'):
+            if min_juilland_d is not None:
+                keep &= ~(juilland_d < min_juilland_d)
+            if max_dp_norm is not None:
+                keep &= ~(dp_norm > max_dp_norm)
+    for i in np.flatnonzero(keep).tolist():
+        keywords.append({
+            'word': words[i],
+            'effect_size': round(float(stats['cohen_h'][i]), 4),
+            'juilland_d': _rounded(dispersion[0][i]) if dispersion is not None else None,
+            'dp_norm': _rounded(dispersion[1][i]) if dispersion is not None else None,
+            'significance': str(stats['stars'][i]),
+            'log_likelihood': round(float(stats['log_likelihood'][i]), 4),
+            'log_ratio': round(float(stats['log_ratio'][i]), 4),
+            'p_value': float(f"{stats['p_value'][i]:.4g}")
+        })
 
-    Returns stars (*, **, ***).
-    """
-    if score >= 10.83:
-        return '***'
-    elif score >= 6.63:
-        return '**'
-    elif score >= 3.84:
-        return '*'
-    else:
-        return ''
-
-def analyze_keyness(text, corpus_name):
+    # Sort by strength (under-represented first, then over-represented)
+    keywords.sort(key=lambda x: x['effect_size'])
+    return keywords
+
+def analyze_keyness(text, corpus_name, stream=None, min_juilland_d=None, max_dp_norm=None, ngram=1):
     """Takes text and corpus name. Identifies distinctive words.
 
+    A 'keyness' profile TokenStream can be passed to skip tokenization.
+    Each keyword also gets the corpus dispersion of the word (Juilland's D
+    and DPnorm, None when the word is not in the corpus or the table has no
+    document-term matrix). min_juilland_d / max_dp_norm drop keywords whose
+    corpus occurrences are that unevenly spread, e.g. a word frequent in one
+    Gutenberg book only; words without a dispersion value are kept.
+    ngram 2 or 3 scores phrases instead (see analyze_ngram_keyness).
     Compares frequencies. Returns dict with keywords and stats.
     """
-    if corpus_name not in CORPORA:
-        raise ValueError(f"Unknown corpus: {corpus_name}")
-
-    # Tokenize user text
-    user_tokens = tokenize(text)
-    user_freq = FreqDist(user_tokens)
-    user_total = len(user_tokens)
-
-    # Load and tokenize corpus
-    corpus_data = CORPORA[corpus_name]
-    corpus_words = corpus_data['loader']()
-    corpus_tokens = [
-        w.lower() for w in corpus_words if w.isalpha() and len(w) >= 3
-    ]
-    corpus_freq = FreqDist(corpus_tokens)
-    corpus_total = len(corpus_tokens)
+    ngram = check_size(ngram)
+    if ngram > 1:
+        return analyze_ngram_keyness(text, corpus_name, ngram, stream)
+    corpus_data = corpus_info(corpus_name)
+    min_juilland_d = dispersion_limit(min_juilland_d, 'min_juilland_d')
+    max_dp_norm = dispersion_limit(max_dp_norm, 'max_dp_norm')
+
+    # Tokenize user text (cached by content hash)
+    if stream is None:
+        stream = get_token_stream(text, 'keyness')
+    user_freq = stream.counter()
+    user_total = len(stream)
+
+    # Load prebuilt corpus counts (counted from NLTK if no artifact exists)
+    with span('corpus_table', corpus=corpus_name) as s:
+        corpus_table = get_table(corpus_name)
+        corpus_total = corpus_table.total
+        s.count(corpus_tokens=corpus_total, corpus_documents=corpus_table.documents)
+    if corpus_total == 0:
+        # A custom corpus that has no documents yet
+        raise ValueError(f"Corpus has no words yet: {corpus_name}")
 
     # Combine user words with top 500 corpus words
-    common_words = set(word for word, _ in corpus_freq.most_common(500))
-    all_words = set(user_freq.keys()) | common_words
+    with span('lookup') as s:
+        common_words = set(corpus_table.most_common(500))
+        all_words = list(set(user_freq.keys()) | common_words)
+        user_counts = np.array([user_freq.get(w, 0) for w in all_words], dtype=np.float64)
+        corpus_counts = corpus_table.lookup(all_words)
+        dispersion = corpus_table.lookup_dispersion(all_words)
+        s.count(tokens=user_total, vocab=len(user_freq), candidates=len(all_words))
 
-    # Calculate keyness for each word
-    keywords = []
-    for word in all_words:
-        user_count = user_freq.get(word, 0)
-        corpus_count = corpus_freq.get(word, 0)
+    keywords = score_candidates(all_words, user_counts, corpus_counts, user_total, corpus_total,
+                                dispersion, min_juilland_d, max_dp_norm)
 
-        # Apply smoothing to avoid zero-count errors
-        score = test_frequency(
-            user_count + 0.5, corpus_count + 0.5, user_total, corpus_total
-        )
+    return {
+        'total_words': user_total,
+        'unique_words': len(user_freq),
+        'significant_keywords': len(keywords),
+        'corpus': {
+            'name': corpus_name,
+            'display_name': corpus_data['display_name'],
+            'description': corpus_data['full_description'],
+            'total_words': corpus_total,
+            'documents': corpus_table.documents
+        },
+        'keywords': keywords
+    }
 
-        # Only keep statistically significant keywords
-        if score >= 3.84:
-            effect = freq_strength(
-                user_count + 0.5, corpus_count + 0.5, user_total, corpus_total
-            )
+def analyze_ngram_keyness(text, corpus_name, n, stream=None):
+    """Takes text, corpus name and n (2 or 3). Identifies distinctive phrases.
 
-            keywords.append({
-                'word': word,
-                'effect_size': round(effect, 4),
-                'significance': give_star_value(score)
-            })
+    The text's n-grams are counted in one vectorised pass over its token
+    ids (a 'keyness' TokenStream can be passed in) and looked up in the
+    corpus's pruned n-gram table by packed key. Candidates are the text's
+    n-grams plus the corpus's 500 most common ones, scored with the same
+    statistics as single words; "word" holds the phrase. Phrases have no
+    dispersion values. Returns dict with keywords and stats.
+    """
+    corpus_data = corpus_info(corpus_name)
+    if stream is None or not hasattr(stream, 'ids'):
+        # Delta-mode streams only keep counts, not token order
+        stream = get_token_stream(text, 'keyness')
 
-    # Sort by strength (under-represented first, then over-represented)
-    keywords.sort(key=lambda x: x['effect_size'])
+    with span('corpus_table', corpus=corpus_name, ngram=n) as s:
+        corpus_table = get_table(corpus_name)
+        ngram_table = get_ngram_table(corpus_name, n)
+        s.count(corpus_ngrams=ngram_table.total, stored=len(ngram_table))
+    if ngram_table.total == 0:
+        raise ValueError(f"Corpus has no {n}-grams: {corpus_name}")
+
+    with span('lookup') as s:
+        keys = ngram_keys(*stream_ids(stream), n)
+        unique, user_counts = np.unique(keys, return_counts=True)
+        local_ids = unpack(unique, n)
+        # Text vocabulary ids -> corpus vocabulary ids
+        corpus_ids, found = corpus_table.word_ids(stream.vocab)
+        in_corpus = found[local_ids].all(axis=1) if len(unique) else np.zeros(0, dtype=bool)
+        corpus_keys = pack(corpus_ids[local_ids])[in_corpus]
+        corpus_counts = np.zeros(len(unique), dtype=np.int64)
+        corpus_counts[in_corpus] = ngram_table.lookup(corpus_keys)
+        all_phrases = phrases(local_ids, np.array(stream.vocab, dtype=str))
+
+        # Common corpus phrases the text never uses can be key too (under-represented)
+        top = ngram_table.most_common(500)
+        extra = top[~np.isin(top, corpus_keys)]
+        all_phrases += phrases(unpack(extra, n), corpus_table.vocab)
+        user_counts = np.concatenate([user_counts, np.zeros(len(extra), dtype=np.int64)]).astype(np.float64)
+        corpus_counts = np.concatenate([corpus_counts, ngram_table.lookup(extra)])
+        s.count(ngrams=len(keys), candidates=len(all_phrases))
+
+    keywords = score_candidates(all_phrases, user_counts, corpus_counts, len(keys), ngram_table.total)
 
     return {
-        'total_words': user_total,
-        'unique_words': len(user_freq),
+        'ngram': n,
+        'total_words': len(stream),
+        'total_ngrams': len(keys),
+        'unique_words': len(stream.vocab),
+        'unique_ngrams': len(unique),
         'significant_keywords': len(keywords),
         'corpus': {
             'name': corpus_name,
             'display_name': corpus_data['display_name'],
             'description': corpus_data['full_description'],
-            'total_words': corpus_total
+            'total_words': corpus_table.total,
+            'total_ngrams': ngram_table.total,
+            'documents': corpus_table.documents
         },
         'keywords': keywords
     }
 
+def _positive_int(value, name):
+    """Takes a request value. Returns it as a positive int, raising ValueError otherwise."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a positive whole number")
+    if value < 1:
+        raise ValueError(f"{name} must be a positive whole number")
+    return value
+
+def window_bounds(total, window, stride):
+    """Takes token count, window size and stride. Splits the text into windows.
+
+    Windows start every stride tokens; one more window ends at the last token
+    when the stride does not reach it, so the whole text is covered. A text
+    shorter than a window is one window. Returns (starts, ends) int arrays.
+    """
+    if total <= window:
+        return np.array([0]), np.array([total])
+    starts = np.arange(0, total - window + 1, stride)
+    if starts[-1] + window < total:
+        starts = np.append(starts, total - window)
+    return starts, starts + window
+
+def window_counts(ids, columns, k, starts, ends):
+    """Takes token ids in text order, the keyword column of each id (-1 for
+    other words), the number of keywords k and window bounds. Counts every
+    keyword in every window.
+
+    Keyword occurrences are histogrammed into the segments between window
+    edges in one pass and summed cumulatively, so each window's counts are a
+    difference of two prefix rows. Returns (windows, keywords) int array.
+    """
+    columns = columns[ids]
+    positions = np.flatnonzero(columns >= 0)
+    edges = np.unique(np.concatenate([starts, ends]))
+    # Segment i holds the positions in [edges[i - 1], edges[i])
+    segment = np.searchsorted(edges, positions, side='right')
+    histogram = np.bincount(segment * k + columns[positions], minlength=(len(edges) + 1) * k)
+    # prefix[j] = keyword counts before edges[j]
+    prefix = np.cumsum(histogram.reshape(len(edges) + 1, k), axis=0)
+    return prefix[np.searchsorted(edges, ends)] - prefix[np.searchsorted(edges, starts)]
+
+def analyze_keyness_windows(text, corpus_name, window, stride=None, top_keywords=WINDOW_KEYWORDS, stream=None,
+                            min_juilland_d=None, max_dp_norm=None):
+    """Takes text, corpus name, window size and stride (default: the window).
+    Tracks how keywords change across a long text.
+
+    Sizes, strides and bounds count keyness tokens, the words keyness
+    scores: words under 3 letters, numbers and punctuation are not counted,
+    so a window spans more of the text than its size in raw words.
+
+    The keywords are the whole text's top_keywords strongest keywords
+    (analyze_keyness, with the same dispersion filters). Each window's
+    counts come from prefix sums over the token ids (window_counts), so the
+    corpus and the text are read once whatever the number of windows; effect
+    sizes use the same smoothing as score_candidates.
+    Returns dict with the keywords, window bounds (keyness token offsets,
+    "window_unit") and a window x keyword matrix of effect sizes.
+    """
+    window = _positive_int(window, 'window')
+    stride = window if stride in (None, '') else _positive_int(stride, 'stride')
+    top_keywords = _positive_int(top_keywords, 'top_keywords')
+    if stream is None or not hasattr(stream, 'ids'):
+        # Delta-mode streams only keep counts, not token order
+        stream = get_token_stream(text, 'keyness')
+    starts, ends = window_bounds(len(stream), window, stride)
+    if len(starts) > MAX_WINDOWS:
+        raise ValueError(f"Too many windows ({len(starts)}, at most {MAX_WINDOWS}); use a larger stride")
+
+    overall = analyze_keyness(text, corpus_name, stream, min_juilland_d, max_dp_norm)
+    keywords = sorted(overall['keywords'], key=lambda x: (-abs(x['effect_size']), x['word']))[:top_keywords]
+    keywords.sort(key=lambda x: x['effect_size'])
+
+    with span('windows', windows=len(starts), keywords=len(keywords)):
+        position = {word: i for i, word in enumerate(stream.vocab)}
+        columns = np.full(len(stream.vocab), -1, dtype=np.int64)
+        for col, keyword in enumerate(keywords):
+            if keyword['word'] in position:
+                columns[position[keyword['word']]] = col
+        counts = window_counts(stream.ids, columns, len(keywords), starts, ends)
+        corpus_table = get_table(corpus_name)
+        corpus_counts = corpus_table.lookup([k['word'] for k in keywords])
+        # Every window has the same size
+        effects = cohen_h(counts + 0.5, corpus_counts + 0.5, int(ends[0] - starts[0]), corpus_table.total)
+
+    return {
+        'total_words': overall['total_words'],
+        'unique_words': overall['unique_words'],
+        'window': window,
+        'stride': stride,
+        'window_unit': 'keyness_tokens',
+        'corpus': overall['corpus'],
+        'keywords': [{key: k[key] for key in ('word', 'effect_size', 'significance')} for k in keywords],
+        'windows': [[int(a), int(b)] for a, b in zip(starts, ends)],
+        'effect_sizes': np.round(effects, 4).tolist()
+    }
+
+def _init_pool_worker():
+    # Keep stdout free for the caller's protocol (worker.py speaks JSON lines on it)
+    sys.stdout = sys.stderr
+
+def get_pool():
+    """Returns the shared process pool, starting it on first use.
+
+    Workers are spawned (not forked) so they never inherit model threads,
+    and they keep corpus tables cached between requests.
+    """
+    global _pool
+    if _pool is None:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        _pool = ProcessPoolExecutor(
+            max_workers=min(KEYNESS_PROCESSES, len(CORPORA)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_pool_worker
+        )
+    return _pool
+
+def score_corpus(stream, corpus_name, min_juilland_d=None, max_dp_norm=None, ngram=1):
+    """Takes a 'keyness' TokenStream, corpus name, dispersion filters and n-gram size.
+    Runs keyness for that corpus.
+
+    Top-level so pool workers can receive it. Returns keyness result dict.
+    """
+    return analyze_keyness('', corpus_name, stream, min_juilland_d, max_dp_norm, ngram)
+
+def summarize_corpora(results):
+    """Takes dict of corpus name -> keyness result. Finds words key in every corpus.
+
+    A word counts as shared when it is significant against each corpus in the
+    same direction. Returns summary dict, strongest mean effect first.
+    """
+    per_corpus = [{k['word']: k for k in r['keywords']} for r in results.values()]
+    shared = []
+    if per_corpus:
+        for word in set(per_corpus[0]).intersection(*per_corpus[1:]):
+            effects = {name: by_word[word]['effect_size'] for name, by_word in zip(results, per_corpus)}
+            if all(e > 0 for e in effects.values()) or all(e < 0 for e in effects.values()):
+                mean_effect = sum(effects.values()) / len(effects)
+                shared.append({
+                    'word': word,
+                    'direction': 'over' if mean_effect > 0 else 'under',
+                    'mean_effect_size': round(mean_effect, 4),
+                    'effect_sizes': effects
+                })
+    shared.sort(key=lambda x: (-abs(x['mean_effect_size']), x['word']))
+    return {
+        'corpora': list(results),
+        'shared_keywords': len(shared),
+        'keywords': shared
+    }
+
+def analyze_keyness_multi(text, corpus_names=None, processes=None, stream=None,
+                          min_juilland_d=None, max_dp_norm=None, ngram=1):
+    """Takes text and corpus names (default: all available). Runs keyness against each corpus.
+
+    The text is tokenized and counted once (or its 'keyness' TokenStream is
+    passed in). Corpora without a prebuilt table have to be counted from
+    NLTK, which takes seconds, so those are scored in parallel in a process
+    pool; prebuilt tables are scored in this process.
+    Dispersion filters and the n-gram size apply to every corpus (see
+    analyze_keyness). Returns dict with per-corpus results and a cross-corpus summary.
+    """
+    if not corpus_names:
+        corpus_names = default_corpora()
+    corpus_names = list(dict.fromkeys(corpus_names))
+    for name in corpus_names:
+        corpus_info(name)
+    processes = KEYNESS_PROCESSES if processes is None else processes
+    ngram = check_size(ngram)
+
+    if stream is None:
+        stream = get_token_stream(text, 'keyness')
+    unbuilt = [n for n in corpus_names if table_version(n) == 'live']
+    pooled = unbuilt if processes > 1 and len(unbuilt) > 1 else []
+
+    with span('score_corpora', corpora=len(corpus_names), pooled=len(pooled)):
+        filters = (min_juilland_d, max_dp_norm, ngram)
+        futures = {name: get_pool().submit(score_corpus, stream, name, *filters) for name in pooled}
+        results = {}
+        for name in corpus_names:
+            if name not in futures:
+                results[name] = score_corpus(stream, name, *filters)
+        for name, future in futures.items():
+            results[name] = future.result()
+
+    results = {name: results[name] for name in corpus_names}
+    return {
+        'total_words': len(stream),
+        'unique_words': len(stream.vocab),
+        'results': results,
+        'summary': summarize_corpora(results)
+    }
+
+def run_request(data, stream=None):
+    """Takes decoded keyness request (and optionally its 'keyness' TokenStream).
+    Uses multi-corpus mode when "corpora" is given; "min_juilland_d" and
+    "max_dp_norm" filter keywords by corpus dispersion and "ngram" (2 or 3)
+    scores phrases instead of words. "window" (with optional "stride" and
+    "top_keywords") returns per-window effect sizes instead.
+
+    Returns keyness result dict.
+    """
+    filters = {key: data.get(key) for key in DISPERSION_FILTERS}
+    if data.get('window') not in (None, ''):
+        if 'corpora' in data or check_size(data.get('ngram') or 1) > 1:
+            raise ValueError("window works with one corpus and single words")
+        options = {key: data[key] for key in WINDOW_FIELDS if data.get(key) not in (None, '')}
+        return analyze_keyness_windows(data.get('text', ''), data.get('corpus', 'brown'), stream=stream,
+                                       **options, **filters)
+    filters['ngram'] = data.get('ngram') or 1
+    if 'corpora' in data:
+        return analyze_keyness_multi(data.get('text', ''), data['corpora'], stream=stream, **filters)
+    return analyze_keyness(data.get('text', ''), data.get('corpus', 'brown'), stream=stream, **filters)
+
 if __name__ == '__main__':
     try:
         data = json.loads(sys.stdin.read())
-        result = analyze_keyness(data.get('text', ''), data.get('corpus', 'brown'))
+        result = traced('keyness', run_request, data, timings=data.get('timings', TIMINGS))
         print(json.dumps(result))
     except Exception as e:
         print(json.dumps({'error': str(e)}))
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Vectorised keyness statistics.
+
+Scores a whole vocabulary in one pass from aligned count arrays instead of
+calling scipy/statsmodels once per word. For every word the 2x2 table is
+
+                 user            corpus
+    word         a               b
+    other        user_total - a  corpus_total - b
+
+chi_squared and cohen_h reproduce chi2_contingency (with Yates' correction)
+and proportion_effectsize cell for cell, so results match scoring each word
+with scipy and statsmodels exactly.
+"""
+import numpy as np
+
+# Chi-squared critical values (df=1) for p < 0.001, 0.01 and 0.05
+STAR_THRESHOLDS = ((10.83, '***'), (6.63, '**'), (3.84, '*'))
+
+
+def _table(user_counts, corpus_counts, user_total, corpus_total):
+    """Takes counts and totals. Returns the four observed cells as float arrays."""
+    a = np.asarray(user_counts, dtype=np.float64)
+    b = np.asarray(corpus_counts, dtype=np.float64)
+    c = user_total - a
+    d = corpus_total - b
+    return a, b, c, d
+
+
+def _expected(a, b, c, d):
+    """Takes observed cells. Returns expected cells under independence."""
+    # Same operation order as scipy's expected_freq (row * col / N)
+    n = ((a + b) + c) + d
+    row1, row2 = a + b, c + d
+    col1, col2 = a + c, b + d
+    return row1 * col1 / n, row1 * col2 / n, row2 * col1 / n, row2 * col2 / n
+
+
+def chi_squared(user_counts, corpus_counts, user_total, corpus_total):
+    """Takes count arrays and totals. Calculates Yates-corrected chi-squared.
+
+    Returns array of scores (0.0 where either count is not positive).
+    """
+    observed = _table(user_counts, corpus_counts, user_total, corpus_total)
+    expected = _expected(*observed)
+
+    score = 0.0
+    for o, e in zip(observed, expected):
+        diff = e - o
+        corrected = o + np.minimum(0.5, np.abs(diff)) * np.sign(diff)
+        score = score + (corrected - e) ** 2 / e
+
+    valid = (observed[0] > 0) & (observed[1] > 0)
+    return np.where(valid, score, 0.0)
+
+
+def log_likelihood(user_counts, corpus_counts, user_total, corpus_total):
+    """Takes count arrays and totals. Calculates the log-likelihood G2 statistic.
+
+    Returns array of G2 scores (no continuity correction).
+    """
+    observed = _table(user_counts, corpus_counts, user_total, corpus_total)
+    expected = _expected(*observed)
+
+    score = 0.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for o, e in zip(observed, expected):
+            score = score + np.where(o > 0, o * np.log(o / e), 0.0)
+    return 2 * score
+
+
+def cohen_h(user_counts, corpus_counts, user_total, corpus_total):
+    """Takes count arrays and totals. Calculates Cohen's h effect size.
+
+    Returns array of effect sizes (positive = over-represented in user text).
+    """
+    user_prop = np.asarray(user_counts, dtype=np.float64) / user_total if user_total > 0 else 0.0
+    corpus_prop = np.asarray(corpus_counts, dtype=np.float64) / corpus_total if corpus_total > 0 else 0.0
+    return 2 * (np.arcsin(np.sqrt(user_prop)) - np.arcsin(np.sqrt(corpus_prop)))
+
+
+def log_ratio(user_counts, corpus_counts, user_total, corpus_total):
+    """Takes count arrays and totals. Calculates the binary log of the relative frequency ratio.
+
+    Returns array of log ratios (counts are expected to be smoothed, i.e. positive).
+    """
+    user_rel = np.asarray(user_counts, dtype=np.float64) / user_total
+    corpus_rel = np.asarray(corpus_counts, dtype=np.float64) / corpus_total
+    return np.log2(user_rel / corpus_rel)
+
+
+def p_values(scores):
+    """Takes chi-squared (or G2) scores. Returns upper-tail p-values for one degree of freedom."""
+    from scipy.special import chdtrc
+
+    return chdtrc(1, np.asarray(scores, dtype=np.float64))
+
+
+def star_values(scores):
+    """Takes array of scores. Converts them to star markers in one pass.
+
+    Returns array of '***', '**', '*' or ''.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.select(
+        [scores >= threshold for threshold, _ in STAR_THRESHOLDS],
+        [stars for _, stars in STAR_THRESHOLDS],
+        default='',
+    )
+
+
+def score_keyness(user_counts, corpus_counts, user_total, corpus_total):
+    """Takes aligned count arrays and totals. Scores every word at once.
+
+    Counts should already include any smoothing. Returns dict of arrays:
+    chi2, p_value, cohen_h, log_likelihood, log_ratio and stars.
+    """
+    chi2 = chi_squared(user_counts, corpus_counts, user_total, corpus_total)
+    return {
+        'chi2': chi2,
+        'p_value': p_values(chi2),
+        'cohen_h': cohen_h(user_counts, corpus_counts, user_total, corpus_total),
+        'log_likelihood': log_likelihood(user_counts, corpus_counts, user_total, corpus_total),
+        'log_ratio': log_ratio(user_counts, corpus_counts, user_total, corpus_total),
+        'stars': star_values(chi2),
+    }
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Compact n-gram count tables for phrase keyness (n = 2 or 3).
+
+An n-gram is n keyness tokens (lowercase alphabetic words of 3+ letters)
+that are next to each other in one sentence. Removed tokens (short words,
+numbers, punctuation) are kept as the GAP sentinel id and break n-grams, so
+"state of the union" contributes no bigram at all and "black cat, white
+dog" only "black cat" and "white dog". Each n-gram is packed into one
+uint64 key from the vocabulary ids of its words, ID_BITS bits per word:
+
+    key = id_1 << (ID_BITS * (n - 1)) | ... | id_n
+
+Keys are exact (no hashing, so no collisions) as long as the vocabulary
+has fewer than 2 ** ID_BITS words. A corpus table stores its distinct keys
+sorted, with their counts, so a lookup is a binary search; ids refer to the
+corpus table's sorted vocabulary. N-grams seen fewer than min_count times
+are pruned, while total still counts every n-gram occurrence.
+
+User text is counted the same way, in one vectorised pass over the token
+ids of its TokenStream with a GAP at each of its gaps (see stream_ids).
+"""
+import numpy as np
+
+# Word id width; 3 ids fit in 63 bits
+ID_BITS = 21
+ID_MASK = (1 << ID_BITS) - 1
+MAX_VOCAB = 1 << ID_BITS
+
+# ID_MASK is never a vocabulary id: it stands for a removed or unknown word
+GAP = ID_MASK
+
+NGRAM_SIZES = (2, 3)
+
+# Bump when n-grams are counted differently; older saved tables are then ignored
+NGRAM_FORMAT = 2
+
+# Corpus n-grams seen fewer times than this are not stored
+MIN_COUNT = 2
+
+
+def check_size(n):
+    """Takes requested n. Returns it as an int, raising ValueError unless it is 1, 2 or 3."""
+    try:
+        n = int(n)
+    except (TypeError, ValueError):
+        raise ValueError("ngram must be 1, 2 or 3")
+    if n != 1 and n not in NGRAM_SIZES:
+        raise ValueError("ngram must be 1, 2 or 3")
+    return n
+
+
+def stream_ids(stream):
+    """Takes a keyness TokenStream. Puts a GAP before each token that followed a removed one.
+
+    Returns (ids, sentence_offsets) for ngram_keys.
+    """
+    gaps = getattr(stream, 'gaps', np.zeros(0, dtype=np.int32))
+    ids = np.insert(np.asarray(stream.ids, dtype=np.int64), gaps, GAP)
+    offsets = np.asarray(stream.sentence_offsets, dtype=np.int64)
+    # Sentences start after the gaps inserted before them (gaps never start a sentence)
+    return ids, offsets + np.searchsorted(gaps, offsets, side='left')
+
+
+def ngram_keys(ids, sentence_offsets, n):
+    """Takes token ids (GAP for removed or unknown words), the token offset
+    where each sentence starts and n.
+
+    Returns uint64 array with the packed key of every n-gram that lies
+    within one sentence and contains no GAP, in text order.
+    """
+    ids = np.asarray(ids, dtype=np.uint64)
+    count = len(ids) - n + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    keys = np.zeros(count, dtype=np.uint64)
+    for k in range(n):
+        keys = (keys << np.uint64(ID_BITS)) | ids[k:k + count]
+    # An n-gram is kept when its first and last token are in the same sentence
+    sentence = np.searchsorted(np.asarray(sentence_offsets), np.arange(len(ids)), side='right')
+    gaps = np.concatenate([[0], np.cumsum(ids == np.uint64(GAP))])
+    keep = (sentence[:count] == sentence[n - 1:]) & (gaps[n:] == gaps[:count])
+    return keys[keep]
+
+
+def unpack(keys, n):
+    """Takes packed keys and n. Returns (len(keys), n) int64 array of word ids."""
+    keys = np.asarray(keys, dtype=np.uint64)
+    shifts = np.uint64(ID_BITS) * np.arange(n - 1, -1, -1, dtype=np.uint64)
+    return ((keys[:, None] >> shifts) & np.uint64(ID_MASK)).astype(np.int64)
+
+
+def pack(word_ids):
+    """Takes (rows, n) array of word ids. Returns their packed uint64 keys."""
+    word_ids = np.asarray(word_ids, dtype=np.uint64)
+    keys = np.zeros(len(word_ids), dtype=np.uint64)
+    for k in range(word_ids.shape[1]):
+        keys = (keys << np.uint64(ID_BITS)) | word_ids[:, k]
+    return keys
+
+
+def phrases(word_ids, vocab):
+    """Takes (rows, n) word ids and the vocabulary they index. Returns the n-grams as strings."""
+    words = np.asarray(vocab)[word_ids]
+    return [' '.join(row) for row in words.tolist()]
+
+
+class NGramTable:
+    """Counts of a corpus's n-grams: sorted packed keys and their counts.
+
+    total counts every n-gram occurrence, including pruned ones. The arrays
+    may be memory-mapped.
+    """
+
+    def __init__(self, n, keys, counts, total, min_count=MIN_COUNT):
+        self.n = n
+        self.keys = keys
+        self.counts = counts
+        self.total = int(total)
+        self.min_count = min_count
+        self._order = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, keys):
+        """Takes packed keys. Returns numpy array of their corpus counts (0 if absent or pruned)."""
+        keys = np.asarray(keys, dtype=np.uint64)
+        if len(self.keys) == 0 or len(keys) == 0:
+            return np.zeros(len(keys), dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[idx] == keys, self.counts[idx], 0).astype(np.int64)
+
+    def most_common(self, k):
+        """Takes k. Returns the packed keys of the k most common n-grams (ties by key)."""
+        if self._order is None:
+            self._order = np.argsort(-np.asarray(self.counts), kind='stable')
+        return np.asarray(self.keys)[self._order[:k]]
+
+
+def count_ngrams(documents, vocab, sizes=NGRAM_SIZES, min_count=MIN_COUNT):
+    """Takes iterable of documents (each a list of sentences of raw corpus words), the
+    corpus table's sorted vocabulary and the n-gram sizes to count.
+
+    Words the unigram counts filter out (see filter_tokens) and words
+    missing from vocab become GAPs, so n-grams never span them. Returns
+    dict of n -> NGramTable, pruned to n-grams seen at least min_count times.
+    """
+    if len(vocab) >= MAX_VOCAB:
+        raise ValueError(f"Vocabulary too large for {ID_BITS}-bit n-gram ids: {len(vocab)}")
+    parts = {n: [] for n in sizes}
+    for sentences in documents:
+        words, offsets = [], []
+        for sentence in sentences:
+            offsets.append(len(words))
+            # '' is never in vocab, so removed words become GAPs below
+            words.extend(w.lower() if w.isalpha() and len(w) >= 3 else '' for w in sentence)
+        if not words:
+            continue
+        words = np.array(words, dtype=vocab.dtype)
+        ids = np.minimum(np.searchsorted(vocab, words), max(len(vocab) - 1, 0))
+        ids = np.where(vocab[ids] == words, ids, GAP) if len(vocab) else np.full(len(words), GAP)
+        for n in sizes:
+            parts[n].append(ngram_keys(ids, offsets, n))
+
+    tables = {}
+    for n in sizes:
+        keys = np.concatenate(parts[n]) if parts[n] else np.zeros(0, dtype=np.uint64)
+        unique, counts = np.unique(keys, return_counts=True)
+        keep = counts >= min_count
+        tables[n] = NGramTable(n, unique[keep], counts[keep].astype(np.int32), len(keys), min_count)
+    return tables
@@ -1,22 +1,219 @@
 const { spawn } = require('child_process');
 const path = require('path');
+const readline = require('readline');
 
-function runPythonScript(scriptName, inputData) {
+// Number of warm Python workers (set INKSIGHT_WORKERS=0 to spawn one process per request)
+const POOL_SIZE = Number.parseInt(process.env.INKSIGHT_WORKERS ?? '2', 10);
+
+// INKSIGHT_SHARE_EMBEDDINGS=1 keeps one copy of the word vectors in shared memory for all workers
+const SHARE_EMBEDDINGS = process.env.INKSIGHT_SHARE_EMBEDDINGS === '1';
+
+// Scripts the warm worker (worker.py) knows how to serve
+const WORKER_SCRIPTS = new Set(['analyze.py', 'keyness.py', 'semantic.py', 'custom_corpora.py', 'corpus_profiles.py']);
+
+// Scripts that use the word vectors; only these wait for the shared embedding segment
+const EMBEDDING_SCRIPTS = new Set(['semantic.py', 'corpus_profiles.py']);
+
+// Scripts that can report partial results stage by stage (options.onStage)
+const STREAM_SCRIPTS = new Set(['semantic.py']);
+
+function cancelledError() {
+  const err = new Error('Request cancelled');
+  err.cancelled = true;
+  return err;
+}
+
+// One long-lived worker.py process speaking JSON lines over stdin/stdout
+class PythonWorker {
+  constructor() {
+    this.pending = new Map();
+    this.proc = null;
+    // Process that has been told the shared embedding segment
+    this.attached = null;
+  }
+
+  start() {
+    const proc = spawn('python', [path.join(__dirname, 'worker.py')]);
+    this.proc = proc;
+    this.stderr = '';
+    readline.createInterface({ input: proc.stdout }).on('line', (line) => this.onLine(line));
+    proc.stderr.on('data', (d) => {
+      // Keep only the tail for error messages
+      this.stderr = (this.stderr + d).slice(-4000);
+    });
+    proc.on('error', (e) => this.onExit(proc, e.message));
+    proc.on('close', () => this.onExit(proc, this.stderr || 'Python worker exited'));
+  }
+
+  onLine(line) {
+    let msg;
+    try {
+      msg = JSON.parse(line);
+    } catch (e) {
+      return;
+    }
+    const job = this.pending.get(msg.id);
+    if (!job) return;
+    if (msg.stage !== undefined) {
+      if (job.onStage) job.onStage(msg.stage);
+      return;
+    }
+    this.pending.delete(msg.id);
+    if (msg.error !== undefined) job.reject(new Error(msg.error));
+    else job.resolve(msg.result);
+  }
+
+  // Fail everything in flight; the next request respawns the worker
+  onExit(proc, reason) {
+    if (this.proc !== proc) return;
+    this.proc = null;
+    for (const job of this.pending.values()) job.reject(new Error(reason));
+    this.pending.clear();
+  }
+
+  async request(message, { onStage, signal } = {}) {
+    // Other scripts never touch the vectors, so they do not wait for the segment
+    const segment = EMBEDDING_SCRIPTS.has(message.script) ? await sharedEmbeddings() : '';
+    if (!this.proc) this.start();
+    if (segment && this.attached !== this.proc) {
+      // Sent ahead of the request on the same pipe, so the model is loaded from the segment
+      this.proc.stdin.write(`${JSON.stringify({ op: 'attach_embeddings', name: segment })}\n`);
+      this.attached = this.proc;
+    }
+    return new Promise((resolve, reject) => {
+      if (signal && signal.aborted) {
+        reject(cancelledError());
+        return;
+      }
+      this.pending.set(message.id, { resolve, reject, onStage });
+      this.proc.stdin.write(`${JSON.stringify(message)}\n`);
+      if (signal) signal.addEventListener('abort', () => this.cancel(message.id), { once: true });
+    });
+  }
+
+  // Stop waiting for a request and tell the worker to drop it (or stop at its next stage)
+  cancel(id) {
+    const job = this.pending.get(id);
+    if (!job) return;
+    this.pending.delete(id);
+    if (this.proc) this.proc.stdin.write(`${JSON.stringify({ op: 'cancel', id })}\n`);
+    job.reject(cancelledError());
+  }
+
+  send(id, scriptName, inputData, options = {}) {
+    const { docId, onStage, signal, ...rest } = options;
+    const message = { id, script: scriptName, input: inputData, ...rest };
+    if (docId) message.doc_id = docId;
+    if (onStage && STREAM_SCRIPTS.has(scriptName)) message.stream = true;
+    return this.request(message, { onStage, signal });
+  }
+}
+
+// Owner of the shared embedding segment (shared_embeddings.py). It removes the segment when
+// its stdin closes, i.e. when this process exits. Resolves to the segment name workers
+// attach to; if sharing fails (empty name), workers load their own copy.
+let sharedSegment = null;
+function sharedEmbeddings() {
+  if (!SHARE_EMBEDDINGS) return Promise.resolve('');
+  if (!sharedSegment) {
+    sharedSegment = new Promise((resolve) => {
+      const owner = spawn('python', [path.join(__dirname, 'shared_embeddings.py')], {
+        stdio: ['pipe', 'pipe', 'inherit'],
+      });
+      readline.createInterface({ input: owner.stdout }).once('line', (line) => {
+        try {
+          resolve(JSON.parse(line).name || '');
+        } catch (e) {
+          resolve('');
+        }
+      });
+      owner.on('error', () => resolve(''));
+      owner.on('close', () => resolve(''));
+    });
+  }
+  return sharedSegment;
+}
+
+const workers = Array.from({ length: Math.max(POOL_SIZE, 0) }, () => new PythonWorker());
+
+// Copy the vectors while the pool serves its first requests rather than on the first
+// semantic request
+if (workers.length > 0) sharedEmbeddings();
+let nextId = 0;
+
+// Worker that holds each document's previous version, oldest first (bounded like the
+// workers' own INKSIGHT_DELTA_DOCUMENTS store, so entries without history are dropped)
+const DOCUMENT_WORKERS_MAX = workers.length * Number(process.env.INKSIGHT_DELTA_DOCUMENTS || 16);
+const documentWorkers = new Map();
+
+// Pick the worker with the fewest requests in flight. Later versions of a document go to
+// the worker that analysed the previous one, which keeps its counts for incremental
+// re-analysis; a document without history is routed by load like any other request.
+function pickWorker(docId) {
+  const known = docId ? documentWorkers.get(docId) : undefined;
+  const worker = known || workers.reduce((best, w) => (w.pending.size < best.pending.size ? w : best));
+  if (docId) {
+    documentWorkers.delete(docId);
+    documentWorkers.set(docId, worker);
+    if (documentWorkers.size > DOCUMENT_WORKERS_MAX) {
+      documentWorkers.delete(documentWorkers.keys().next().value);
+    }
+  }
+  return worker;
+}
+
+// Spawn a fresh interpreter for a single request (original behaviour).
+// Streamed scripts run with --stream and print one JSON line per stage.
+function runOneShot(scriptName, inputData, options = {}) {
   return new Promise((resolve, reject) => {
-    const py = spawn('python', [path.join(__dirname, scriptName)]);
+    const { onStage, signal } = options;
+    if (signal && signal.aborted) {
+      reject(cancelledError());
+      return;
+    }
+    const streamed = Boolean(onStage) && STREAM_SCRIPTS.has(scriptName);
+    const env = options.timings ? { ...process.env, INKSIGHT_TIMINGS: '1' } : process.env;
+    const args = [path.join(__dirname, scriptName), ...(streamed ? ['--stream'] : [])];
+    const py = spawn('python', args, { env });
     let out = '';
     let err = '';
-    py.stdout.on('data', (d) => {
-      out += d;
-    });
+    let final = null;
+    if (streamed) {
+      readline.createInterface({ input: py.stdout }).on('line', (line) => {
+        let msg;
+        try {
+          msg = JSON.parse(line);
+        } catch (e) {
+          return;
+        }
+        const { stage, ...rest } = msg;
+        if (stage === 'final') final = rest;
+        else onStage(msg);
+      });
+    } else {
+      py.stdout.on('data', (d) => {
+        out += d;
+      });
+    }
     py.stderr.on('data', (d) => {
       err += d;
     });
+    if (signal) {
+      signal.addEventListener('abort', () => {
+        py.kill();
+        reject(cancelledError());
+      }, { once: true });
+    }
     py.on('close', (code) => {
       if (code !== 0) {
         reject(new Error(err || 'Python script failed'));
         return;
       }
+      if (streamed) {
+        if (final) resolve(final);
+        else reject(new Error('Invalid JSON'));
+        return;
+      }
       try {
         resolve(JSON.parse(out));
       } catch (e) {
@@ -28,4 +225,32 @@ function runPythonScript(scriptName, inputData) {
   });
 }
 
-module.exports = { runPythonScript };
+// options.timings adds a per-stage "_timings" block to the result;
+// options.docId marks versions of one document (re-analysed incrementally);
+// options.onStage receives partial results of streamed scripts before the result resolves;
+// options.signal (an AbortSignal) cancels the request, rejecting with err.cancelled set
+function runPythonScript(scriptName, inputData, options = {}) {
+  if (workers.length === 0 || !WORKER_SCRIPTS.has(scriptName)) {
+    return runOneShot(scriptName, inputData, options);
+  }
+  nextId += 1;
+  return pickWorker(options.docId).send(nextId, scriptName, inputData, options);
+}
+
+// Result cache counters of every running worker (idle workers are not spawned)
+async function getCacheStats() {
+  const running = workers.filter((w) => w.proc);
+  const stats = await Promise.all(running.map((w) => {
+    nextId += 1;
+    return w.request({ id: nextId, op: 'cache_stats' });
+  }));
+  const total = { hits: 0, disk_hits: 0, misses: 0, evictions: 0, entries: 0 };
+  for (const s of stats) {
+    for (const key of Object.keys(total)) total[key] += s[key];
+  }
+  const lookups = total.hits + total.misses;
+  total.hit_rate = lookups ? Number((total.hits / lookups).toFixed(4)) : 0;
+  return { workers: stats, total };
+}
+
+module.exports = { runPythonScript, getCacheStats };
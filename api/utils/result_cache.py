@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""Content-addressed cache for analysis results.
+
+Keys are SHA-256 digests of the analysis name, the text hash and every
+parameter or data version that affects the result (corpus, tokenizer
+profile, cluster settings, model and corpus table versions), so a changed
+model or rebuilt corpus table never serves stale results.
+
+Results live in an in-memory LRU. An optional disk tier
+(INKSIGHT_RESULT_CACHE_DIR) keeps JSON files and evicts the least recently
+used ones once the directory grows past INKSIGHT_RESULT_CACHE_BYTES. Like
+the token cache it is off by default because it persists results of user
+documents.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.environ.get('INKSIGHT_RESULT_CACHE_SIZE', 128))
+CACHE_DIR = os.environ.get('INKSIGHT_RESULT_CACHE_DIR', '')
+CACHE_BYTES = int(os.environ.get('INKSIGHT_RESULT_CACHE_BYTES', 256 * 1024 * 1024))
+
+
+def make_key(**parts):
+    """Takes keyword parts of a cache key. Returns a stable hex digest."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Two-tier LRU cache of JSON-serialisable results with hit/miss counters."""
+
+    def __init__(self, max_entries=CACHE_SIZE, cache_dir=CACHE_DIR, max_bytes=CACHE_BYTES):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """Takes key. Returns cached result or None."""
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        if self.cache_dir:
+            try:
+                with open(self._path(key), encoding='utf-8') as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                pass
+            else:
+                # Touch the file so disk eviction is least-recently-used
+                os.utime(self._path(key))
+                self.hits += 1
+                self.disk_hits += 1
+                self._remember(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Takes key and result. Stores it in memory and, if enabled, on disk."""
+        self._remember(key, value)
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._path(f'.{key}-{os.getpid()}')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+        self._trim_disk()
+
+    def get_or_compute(self, key, compute):
+        """Takes key and zero-argument function. Returns cached or freshly computed result."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _trim_disk(self):
+        """Deletes least recently used files until the disk tier fits max_bytes."""
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json') and not entry.name.startswith('.'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Returns dict of hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'disk': bool(self.cache_dir),
+        }
@@ -3,16 +3,27 @@
 import os
 import sys
 import json
-import re
-import fasttext
+from functools import lru_cache
 import numpy as np
-from sklearn.cluster import KMeans
+from ann_index import label_clusters, load_index
+from clustering import (
+    AUTO_K, AUTO_K_METHOD, CLUSTER_BACKEND, choose_k, fit_clusters, summarize_clusters,
+    warm_start_centers, weighted_sample
+)
+from embedding_store import EmbeddingStore, STORE_PATH
+from fallback_model import fallback_version, load_fallback
+from instrumentation import span, traced
+from tokenization import get_token_stream, tokenize_stream
 
 #change model here
 script_dir = os.path.dirname(os.path.abspath(__file__)) + '/../../models/cc.en.300.bin'
 pj_root = os.path.abspath(os.path.join(script_dir, '..', '..'))
-model_path = os.path.join(pj_root, 'models', 'cc.en.300.bin')
-fallback_path = os.path.join(script_dir,'fallback.txt')
+model_path = os.environ.get('INKSIGHT_FASTTEXT_MODEL', os.path.join(pj_root, 'models', 'cc.en.300.bin'))
+# Shared memory segment with the vectors (see shared_embeddings.py); pythonRunner.js
+# names it to running workers with worker.py's attach_embeddings op
+shared_embeddings = os.environ.get('INKSIGHT_SHARED_EMBEDDINGS', '')
+# Vocabulary sampled for the provisional clusters of a streamed analysis
+PROVISIONAL_SAMPLE = int(os.environ.get('INKSIGHT_PROVISIONAL_SAMPLE', 1000))
 
 def tokenize(text: str) -> list[str]:
     """Convert text to lowercase words.
@@ -23,37 +34,71 @@ def tokenize(text: str) -> list[str]:
     Returns:
         List of lowercase words (3+ letters only)
     """
-    tokens = re.findall(r'\b[a-zA-Z]{3,}\b', text.lower())
-    return tokens
+    return tokenize_stream(text, 'semantic').tokens()
 
-def load_model(model_path=model_path):
-    """Load FastText model. Train fallback model if not found.
+@lru_cache(maxsize=None)
+def load_model(model_path=model_path, store_path=STORE_PATH, shared_name=None):
+    """Load word vectors. Prefer a shared memory segment, then the
+    memory-mapped store, then the FastText model, and use the fallback
+    vectors (see fallback_model.py) if none is found.
+
+    The loaded model is cached so long-lived workers keep it resident.
 
     Args:
         model_path: Path to FastText .bin file
+        store_path: Directory written by embedding_store.py (empty to skip)
+        shared_name: Segment created by shared_embeddings.py (empty to skip,
+            default shared_embeddings)
 
     Returns:
-        Loaded FastText model object
+        EmbeddingStore, FastText model or fallback vectors object
     """
-    if os.path.exists(model_path):
+    if shared_name is None:
+        shared_name = shared_embeddings
+    if shared_name:
+        from shared_embeddings import attach_shared
+        try:
+            store = attach_shared(shared_name).store
+            print(f"Attached shared embeddings {shared_name}", file=sys.stderr)
+            return store
+        except FileNotFoundError:
+            print(f"Shared embeddings {shared_name} not found, loading a private copy", file=sys.stderr)
+    if store_path and os.path.exists(os.path.join(store_path, 'meta.json')):
+        print(f"Opening embedding store {store_path}", file=sys.stderr)
+        return EmbeddingStore(store_path)
+    elif os.path.exists(model_path):
+        import fasttext
         print(f"Loading FastText model from {model_path}", file=sys.stderr)
         return fasttext.load_model(model_path)
     else:
-        with open(fallback_path, "w", encoding="utf-8") as f:
-            f.write(
-                "Natural Language Processing Text analysis and data mining "
-                "Semantic understanding and relationship extraction "
-                "Sentiment analysis and opinion mining "
-                "Word embedding for vector representation"
-            )
-
-        return fasttext.train_unsupervised(
-            fallback_path,
-            model='skipgram',
-            dim=50,
-            epoch=5,
-            minCount=1
-        )
+        print(f"No FastText model at {model_path}, using fallback vectors", file=sys.stderr)
+        return load_fallback()
+
+def model_version(model_path=model_path, store_path=STORE_PATH, shared_name=None):
+    """Describe which vectors load_model would use, without loading them.
+
+    Args:
+        model_path: Path to FastText .bin file
+        store_path: Embedding store directory
+        shared_name: Shared embedding segment name (default shared_embeddings)
+
+    Returns:
+        String that changes whenever the vectors change (used in cache keys)
+    """
+    if shared_name is None:
+        shared_name = shared_embeddings
+    if shared_name:
+        from shared_embeddings import attach_shared
+        try:
+            return attach_shared(shared_name).version
+        except FileNotFoundError:
+            pass
+    for kind, path in (('store', os.path.join(store_path, 'meta.json') if store_path else ''),
+                       ('bin', model_path)):
+        if path and os.path.exists(path):
+            stat = os.stat(path)
+            return f"{kind}:{stat.st_size}:{int(stat.st_mtime)}"
+    return f"fallback:{fallback_version()}"
 
 def get_word_vector(model, tokens):
     """Get average word vector for given tokens.
@@ -65,6 +110,10 @@ def get_word_vector(model, tokens):
     Returns:
         Tuple of (numpy array of vectors, list of valid tokens)
     """
+    # Embedding stores look up the whole batch at once
+    if hasattr(model, 'get_vectors'):
+        return model.get_vectors(tokens)
+
     vectors = []
     valid_tokens = []
     for token in tokens:
@@ -76,104 +125,221 @@ def get_word_vector(model, tokens):
             continue
     return np.array(vectors), valid_tokens
 
-def cluster_words(vectors, tokens, max_clusters=15):
+def cluster_words(vectors, tokens, max_clusters=15, weights=None,
+                  backend=CLUSTER_BACKEND, auto_k=AUTO_K, index=None, state=None, n_clusters=None):
     """Cluster embeddings into semantic groups with dynamic cluster size.
 
     Args:
-        vectors: Numpy array of word embeddings
-        tokens: List of word tokens
+        vectors: Numpy array of word embeddings (one row per unique word)
+        tokens: List of word tokens aligned with vectors
         max_clusters: Maximum number of clusters (default 15)
+        weights: Occurrence count of each word (default 1 per row)
+        backend: 'auto', 'kmeans' or 'minibatch' (auto picks by input size)
+        auto_k: Choose the cluster count from a score on a sample
+        index: AnnIndex used to name clusters and suggest related words
+        state: Dict kept between analyses of one document; KMeans starts
+            from its "centers" and they are replaced by the new centroids
+        n_clusters: Fixed cluster count (skips choosing one from the input)
 
     Returns:
-        List of cluster dicts with label, word_count, and top words
+        List of cluster dicts with label, theme, word_count, top words and related words
     """
-    # 1 cluster per 200 words
-    n_clusters = max(2, min(max_clusters, len(tokens) // 200))
+    weights = np.ones(len(tokens)) if weights is None else np.asarray(weights, dtype=np.float64)
+    total = int(weights.sum())
+
+    if n_clusters is None and auto_k:
+        with span('choose_k', method=AUTO_K_METHOD):
+            n_clusters = choose_k(vectors, weights, 2, max_clusters, method=AUTO_K_METHOD)
+    elif n_clusters is None:
+        # 1 cluster per 200 words (counting every occurrence)
+        n_clusters = max(2, min(max_clusters, total // 200))
     n_clusters = min(n_clusters, len(tokens))
 
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=5)
-    labels = kmeans.fit_predict(vectors)
+    # Start from the previous version's centroids when re-analysing a document
+    init = None
+    previous = state.get('centers') if state is not None else None
+    if previous is not None and previous.shape[1] == vectors.shape[1]:
+        init = warm_start_centers(previous, vectors, n_clusters)
 
-    clusters = []
-    for i in range(n_clusters):
-        cluster_indices = np.where(labels == i)[0]
-        cluster_tokens = [tokens[j] for j in cluster_indices]
+    # Frequent words pull centroids as if every occurrence were a row
+    with span('kmeans', rows=len(tokens), clusters=n_clusters, warm_start=init is not None):
+        labels, centers = fit_clusters(vectors, weights, n_clusters, backend, init=init)
+    if state is not None:
+        state['centers'] = centers
+    with span('summarize'):
+        clusters = summarize_clusters(vectors, tokens, labels, centers)
+    with span('label', indexed=index is not None):
+        clusters = label_clusters(clusters, centers, index)
 
-        # Remove duplicates word entries
-        unique_words = list(dict.fromkeys(cluster_tokens))
+    # Sort clusters by size biggest to smallest
+    clusters = sorted(clusters, key=lambda c: c["word_count"], reverse=True)
+    return clusters
 
-        # Take top 10 nearest to centroid
-        centroid = kmeans.cluster_centers_[i]
-        distances = np.linalg.norm(vectors[cluster_indices] - centroid, axis=1)
-        sorted_idx = np.argsort(distances)
+def _empty(total_words=0):
+    return {
+        "total_words": total_words,
+        "total_clusters": 0,
+        "clusters": [],
+        "top_clusters": []
+    }
 
-        top_unique = []
-        for idx in sorted_idx:
-            w = tokens[cluster_indices[idx]]
-            if w not in top_unique:
-                top_unique.append(w)
-            if len(top_unique) == 10:
-                break
+def _result(total_words, clusters):
+    return {
+        "total_words": total_words,
+        "total_clusters": len(clusters),
+        "clusters": clusters,
+        "top_clusters": clusters[:4]  # top 4 biggest clusters
+    }
 
-        clusters.append({
-            "label": f"Cluster {i}",
-            "word_count": len(unique_words),
-            "words": top_unique
-        })
+def analyze_semantic_stages(text: str, stream=None, state=None, sample_size=PROVISIONAL_SAMPLE):
+    """Analyze semantic clusters in stages, yielding each as soon as it is ready.
 
-    # Sort clusters by size biggest to smallest
-    clusters = sorted(clusters, key=lambda c: c["word_count"], reverse=True)
-    return clusters
+    Stages, in order:
+        {"stage": "tokens", "total_words", "unique_words"}
+        {"stage": "provisional", "sample_words", "result"} clusters of a
+            frequency-weighted sample of the vocabulary (skipped when the
+            vocabulary is no larger than sample_size)
+        {"stage": "progress", "step"} after the word vectors are looked up
+            and after the cluster count is chosen (auto_k); internal
+            checkpoints, not partial results
+        {"stage": "final", "result"} the same result as analyze_semantic
 
-def analyze_semantic(text: str) -> dict:
+    Closing the generator between stages skips the remaining work, which is
+    how abandoned requests are cancelled.
+
+    Args:
+        text: Input text to analyze
+        stream: Optional 'semantic' profile TokenStream (skips tokenization)
+        state: Optional per-document dict used to warm-start clustering
+        sample_size: Words clustered for the provisional stage (0 to skip it)
+
+    Yields:
+        Stage dicts; "result" has the shape returned by analyze_semantic
+    """
+    if stream is None:
+        stream = get_token_stream(text, 'semantic')
+    counts = stream.counter()
+    yield {"stage": "tokens", "total_words": len(stream), "unique_words": len(counts)}
+
+    if not len(stream):
+        yield {"stage": "final", "result": _empty()}
+        return
+
+    # Look up each distinct word once, remembering how often it occurs
+    words = list(counts)
+    with span('load_model'):
+        model = load_model()
+    index = load_index(model)
+
+    if sample_size and len(words) > sample_size:
+        # Same cluster count as the final pass, fitted on a cheap sample
+        total = sum(counts.values())
+        with span('provisional', vocab=len(words), sample=sample_size):
+            frequency = np.array([counts[w] for w in words], dtype=np.float64)
+            sample = [words[i] for i in weighted_sample(len(words), frequency, sample_size)]
+            vectors, valid_tokens = get_word_vector(model, sample)
+            clusters = []
+            if valid_tokens:
+                weights = np.array([counts[w] for w in valid_tokens], dtype=np.float64)
+                clusters = cluster_words(vectors, valid_tokens, weights=weights, index=index,
+                                         backend='minibatch', auto_k=False,
+                                         n_clusters=max(2, min(15, total // 200)))
+        yield {"stage": "provisional", "sample_words": len(sample), "result": _result(len(stream), clusters)}
+
+    with span('word_vectors', vocab=len(counts)) as s:
+        vectors, valid_tokens = get_word_vector(model, words)
+        s.count(found=len(valid_tokens))
+
+    if not valid_tokens:
+        yield {"stage": "final", "result": _empty(len(stream))}
+        return
+    yield {"stage": "progress", "step": "word_vectors"}
+
+    weights = np.array([counts[w] for w in valid_tokens], dtype=np.float64)
+    n_clusters = None
+    if AUTO_K:
+        # Chosen here (as cluster_words would) so a cancel can land before the final fit
+        with span('choose_k', method=AUTO_K_METHOD):
+            n_clusters = choose_k(vectors, weights, 2, 15, method=AUTO_K_METHOD)
+        yield {"stage": "progress", "step": "choose_k"}
+    with span('cluster', rows=len(valid_tokens)):
+        clusters = cluster_words(vectors, valid_tokens, weights=weights, index=index, state=state,
+                                 n_clusters=n_clusters)
+    yield {"stage": "final", "result": _result(len(stream), clusters)}
+
+def analyze_semantic(text: str, stream=None, state=None) -> dict:
     """Analyze semantic clusters in the text.
 
     Args:
         text: Input text to analyze
+        stream: Optional 'semantic' profile TokenStream (skips tokenization)
+        state: Optional per-document dict used to warm-start clustering
 
     Returns:
         Dict with total_words, total_clusters, clusters, and top_clusters
     """
-    tokens = tokenize(text)
-
-    if not tokens:
-        return {
-            "total_words": 0,
-            "total_clusters": 0,
-            "clusters": [],
-            "top_clusters": []
+    for stage in analyze_semantic_stages(text, stream, state, sample_size=0):
+        if "result" in stage:
+            result = stage["result"]
+    return result
+
+def _output(result: dict) -> dict:
+    return {
+        "overall_sentiment": "semantic_clusters",
+        "semantic_summary": {
+            "total_words": result.get("total_words", 0),
+            "total_clusters": result.get("total_clusters", 0),
+            "top_clusters": result.get("top_clusters", []),
+            "clusters": result.get("clusters", [])
         }
+    }
 
-    model = load_model()
-    vectors, valid_tokens = get_word_vector(model, tokens)
+def semantic_output(text: str, stream=None, state=None) -> dict:
+    """Wrap semantic analysis in the response shape expected by Node.
 
-    if not valid_tokens:
-        return {
-            "total_words": len(tokens),
-            "total_clusters": 0,
-            "clusters": [],
-            "top_clusters": []
-        }
+    Args:
+        text: Input text to analyze
+        stream: Optional 'semantic' profile TokenStream (skips tokenization)
+        state: Optional per-document dict used to warm-start clustering
 
-    clusters = cluster_words(vectors, valid_tokens)
+    Returns:
+        Dict with overall_sentiment and semantic_summary
+    """
+    return _output(analyze_semantic(text, stream, state))
 
-    return {
-        "total_words": len(tokens),
-        "total_clusters": len(clusters),
-        "clusters": clusters,
-        "top_clusters": clusters[:4]  # top 4 biggest clusters
-    }
+def semantic_stages(text: str, stream=None, state=None, sample_size=PROVISIONAL_SAMPLE):
+    """Stream semantic analysis as JSON-ready stages for Node.
 
-# Read from stdin when called from Node
-text = sys.stdin.read() or ""
-result = analyze_semantic(text)
-output = {
-    "overall_sentiment": "semantic_clusters",
-    "semantic_summary": {
-        "total_words": result.get("total_words", 0),
-        "total_clusters": result.get("total_clusters", 0),
-        "top_clusters": result.get("top_clusters", []),
-        "clusters": result.get("clusters", [])
-    }
-}
-print(json.dumps(output, ensure_ascii=False))
+    Like analyze_semantic_stages, but each "result" is replaced by the
+    semantic_output shape, so the final stage equals semantic_output(text).
+    "progress" stages are passed through for cancel checks; they are not
+    sent to clients.
+
+    Args:
+        text: Input text to analyze
+        stream: Optional 'semantic' profile TokenStream (skips tokenization)
+        state: Optional per-document dict used to warm-start clustering
+        sample_size: Words clustered for the provisional stage (0 to skip it)
+
+    Yields:
+        Stage dicts
+    """
+    stages = analyze_semantic_stages(text, stream, state, sample_size)
+    try:
+        for stage in stages:
+            if "result" in stage:
+                result = stage.pop("result")
+                stage.update(_output(result))
+            yield stage
+    finally:
+        stages.close()
+
+if __name__ == '__main__':
+    # Read from stdin when called from Node (--stream prints one JSON line per stage)
+    text = sys.stdin.read() or ""
+    if '--stream' in sys.argv[1:]:
+        for stage in semantic_stages(text):
+            if stage["stage"] != "progress":
+                print(json.dumps(stage, ensure_ascii=False), flush=True)
+    else:
+        print(json.dumps(traced('semantic', semantic_output, text), ensure_ascii=False))
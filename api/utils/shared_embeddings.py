@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Word vectors in one shared memory segment, attached by every worker.
+
+fasttext.load_model gives each worker process a private copy of the
+vectors, so every extra worker costs gigabytes. Here one owner process
+copies them once into a multiprocessing.shared_memory segment and the
+workers map that segment read-only, so their private memory stays flat:
+
+    create_shared(source, name)  owner: fills a new segment from an embedding
+                                 store directory or a FastText .bin
+    attach_shared(name)          worker: maps the segment, nothing is copied
+    SharedEmbeddings.release()   worker: unmaps; owner: unmaps and removes it
+
+Workers do not register the segment with multiprocessing's resource
+tracker, so a worker exiting never removes it; the owner's tracker still
+does if the owner dies. Segment layout:
+
+    8 bytes   little-endian length of the manifest
+    manifest  JSON: store meta, source version, dtype/shape/offset per array
+    arrays    the embedding_store.py arrays, 64-byte aligned
+
+pythonRunner.js runs this script as the owner when INKSIGHT_SHARE_EMBEDDINGS=1
+and names the segment to its workers (worker.py's attach_embeddings op);
+standalone processes can set INKSIGHT_SHARED_EMBEDDINGS instead.
+Usage: python api/utils/shared_embeddings.py [--source PATH] [--name NAME]
+  (prints {"name": ..., "bytes": ...} when ready, removes the segment when
+  stdin closes or on SIGTERM)
+"""
+import argparse
+import json
+import os
+import signal
+import struct
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from embedding_store import ARRAY_NAMES, DEFAULT_MODEL, STORE_PATH, EmbeddingStore, fill_store, store_layout
+
+HEADER = struct.Struct('<Q')
+ALIGNMENT = 64
+
+_attached = {}
+
+
+def default_source():
+    """Returns the vectors semantic.py would load: the store if exported, else the .bin."""
+    if os.path.exists(os.path.join(STORE_PATH, 'meta.json')):
+        return STORE_PATH
+    return os.environ.get('INKSIGHT_FASTTEXT_MODEL', DEFAULT_MODEL)
+
+
+def source_version(source):
+    """Takes store directory or .bin path. Returns a string that changes with its contents."""
+    path = os.path.join(source, 'meta.json') if os.path.isdir(source) else source
+    stat = os.stat(path)
+    kind = 'store' if os.path.isdir(source) else 'bin'
+    return f"{kind}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+class SharedEmbeddings:
+    """A mapped embedding segment and the EmbeddingStore viewing it."""
+
+    def __init__(self, shm, manifest, owner):
+        self.shm = shm
+        self.name = shm.name
+        self.size = shm.size
+        self.manifest = manifest
+        self.owner = owner
+        self.arrays = {
+            name: _view(shm, spec) for name, spec in manifest['arrays'].items()
+        }
+        self.store = EmbeddingStore.from_arrays(manifest['meta'], self.arrays, path=manifest['store_path'])
+
+    @property
+    def version(self):
+        return f"shared:{self.manifest['source_version']}"
+
+    def release(self):
+        """Unmaps the segment (and removes it if this is the owner).
+
+        The store and arrays must not be used afterwards. Returns False if
+        views are still referenced elsewhere; the mapping then goes away
+        when they do or the process exits.
+        """
+        self.store = None
+        self.arrays = None
+        _attached.pop(self.name, None)
+        try:
+            self.shm.close()
+        except BufferError:
+            return False
+        finally:
+            if self.owner:
+                self.shm.unlink()
+        return True
+
+
+def _view(shm, spec):
+    """Takes a segment and one manifest entry. Returns a read-only array over the segment."""
+    array = np.ndarray(tuple(spec['shape']), dtype=np.dtype(spec['dtype']), buffer=shm.buf, offset=spec['offset'])
+    array.flags.writeable = False
+    return array
+
+
+def _plan(layout, meta_bytes_hint):
+    """Takes dict of array name -> (shape, dtype) and bytes to reserve for the manifest.
+
+    Returns tuple of (manifest array entries, segment size).
+    """
+    start = -(-(HEADER.size + meta_bytes_hint) // ALIGNMENT) * ALIGNMENT
+    arrays, offset = {}, start
+    for name, (shape, dtype) in layout.items():
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        arrays[name] = {'dtype': np.dtype(dtype).str, 'shape': list(shape), 'offset': offset}
+        offset += -(-nbytes // ALIGNMENT) * ALIGNMENT
+    return arrays, max(offset, start + 1)
+
+
+def create_shared(source=None, name=None):
+    """Takes an embedding store directory or FastText .bin, and a segment name.
+
+    Copies the vectors into a new shared memory segment (subword vectors
+    included, so workers never need the .bin for unknown words).
+    Returns the owner's SharedEmbeddings.
+    """
+    source = source or default_source()
+    model = None
+    if os.path.isdir(source):
+        store = EmbeddingStore(source, fallback='none')
+        arrays = {n: getattr(store, n) for n in ARRAY_NAMES if getattr(store, n) is not None}
+        layout = {n: (a.shape, a.dtype) for n, a in arrays.items()}
+        meta = dict(store.meta)
+        store_path = os.path.abspath(source)
+    else:
+        import fasttext
+
+        model = fasttext.load_model(source)
+        words, layout, meta = store_layout(model, with_subwords=True)
+        meta.update(source_model=os.path.abspath(source), source_size=os.path.getsize(source))
+        store_path = None
+
+    manifest = {'meta': meta, 'store_path': store_path, 'source_version': source_version(source)}
+    # The manifest holds offsets, which depend on its own size; plan with room to spare
+    hint = len(json.dumps({**manifest, 'arrays': _plan(layout, 0)[0]})) + 4096
+    manifest['arrays'], size = _plan(layout, hint)
+    encoded = json.dumps(manifest).encode('utf-8')
+
+    shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+    try:
+        shm.buf[:HEADER.size] = HEADER.pack(len(encoded))
+        shm.buf[HEADER.size:HEADER.size + len(encoded)] = encoded
+        targets = {
+            n: np.ndarray(tuple(spec['shape']), dtype=np.dtype(spec['dtype']), buffer=shm.buf, offset=spec['offset'])
+            for n, spec in manifest['arrays'].items()
+        }
+        if model is None:
+            for n, target in targets.items():
+                target[...] = arrays[n]
+        else:
+            fill_store(model, words, targets)
+        del targets
+    except BaseException:
+        shm.close()
+        shm.unlink()
+        raise
+    # Attaching in the owner process reuses this mapping
+    shared = _attached[shm.name] = SharedEmbeddings(shm, manifest, owner=True)
+    return shared
+
+
+def _open_segment(name):
+    """Takes segment name. Opens it without registering it for removal at exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers; undo it so this process never removes the segment
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def attach_shared(name):
+    """Takes segment name. Maps it read-only (once per process, reusing the owner's mapping).
+
+    Returns SharedEmbeddings. Raises FileNotFoundError if no such segment exists.
+    """
+    shared = _attached.get(name)
+    if shared is None:
+        shm = _open_segment(name)
+        length, = HEADER.unpack(bytes(shm.buf[:HEADER.size]))
+        manifest = json.loads(bytes(shm.buf[HEADER.size:HEADER.size + length]).decode('utf-8'))
+        shared = _attached[name] = SharedEmbeddings(shm, manifest, owner=False)
+    return shared
+
+
+def serve(source=None, name=None, stdin=sys.stdin):
+    """Takes source and segment name. Creates the segment and keeps it until stdin closes."""
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    shared = create_shared(source, name)
+    try:
+        print(json.dumps({'name': shared.name, 'bytes': shared.size, 'version': shared.version}), flush=True)
+        for _ in stdin:
+            pass
+    finally:
+        shared.release()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Share word vectors with the analysis workers')
+    parser.add_argument('--source', default=None, help='Embedding store directory or FastText .bin')
+    parser.add_argument('--name', default=None, help='Shared memory segment name (default: random)')
+    args = parser.parse_args()
+    serve(args.source, args.name)
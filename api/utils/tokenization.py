@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Shared tokenization with named profiles and a reusable token stream.
+
+Each analysis tokenizes differently, so each has a named profile:
+
+    words     [A-Za-z']+ on lowercased text            (analyze.py)
+    keyness   NLTK word_tokenize, alphabetic, 3+ chars (keyness.py)
+    semantic  \\b[a-zA-Z]{3,}\\b on lowercased text      (semantic.py)
+
+The keyness profile has two interchangeable implementations, selected with
+INKSIGHT_KEYNESS_TOKENIZER: 'nltk' runs the Treebank word tokenizer on every
+sentence, 'fast' (the default) only sends words it cannot classify directly
+to it and gives the same tokens.
+
+A profile runs in a single pass and produces a compact TokenStream: the
+vocabulary (in first-seen order), one integer id per token and the token
+offset where each sentence starts. Keyness streams also record gaps: the
+offsets of kept tokens that follow a removed token (short word, number or
+punctuation) in the same sentence, so phrases never join words that are not
+next to each other in the text. Streams are cached by the SHA-256 of the
+text, so later analyses of the same document skip tokenization. The cache
+is in memory only unless INKSIGHT_TOKEN_CACHE_DIR points to a directory.
+"""
+import hashlib
+import os
+import re
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+from instrumentation import span
+
+# Bump when a profile changes so cached streams are not reused
+TOKENIZER_VERSION = 2
+
+# Regex profiles: one pattern finds words, sentence ends and other non-space text
+REGEX_PROFILES = {
+    'words': re.compile(r"(?P<w>[A-Za-z']+)|(?P<e>[.!?]+)|\S"),
+    'semantic': re.compile(r"(?P<w>\b[a-zA-Z]{3,}\b)|(?P<e>[.!?]+)|\S"),
+}
+PROFILES = tuple(REGEX_PROFILES) + ('keyness',)
+
+# Keyness tokenizer implementation: 'fast' or 'nltk' (identical output)
+KEYNESS_TOKENIZER = os.environ.get('INKSIGHT_KEYNESS_TOKENIZER', 'fast')
+
+# Alphabetic words the Treebank tokenizer splits (cannot -> can not, gonna -> gon na, ...)
+TREEBANK_SPLIT_WORDS = frozenset(['cannot', 'gimme', 'gonna', 'gotta', 'lemme', 'wanna'])
+
+# Joins the words sent to the Treebank tokenizer; it comes back as its own token
+CHUNK_MARK = '\x00'
+
+# Characters the Treebank final period rule lets follow the period ("end. '")
+CLOSING_CHARS = frozenset('])}>"\'»”’')
+
+CACHE_SIZE = 32
+CACHE_DIR = os.environ.get('INKSIGHT_TOKEN_CACHE_DIR', '')
+
+
+class TokenStream:
+    """Token ids over a vocabulary, plus sentence start offsets and (keyness
+    profile) the offsets of tokens preceded by a removed token."""
+
+    def __init__(self, profile, vocab, ids, sentence_offsets, gaps=()):
+        self.profile = profile
+        self.vocab = list(vocab)
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.sentence_offsets = np.asarray(sentence_offsets, dtype=np.int32)
+        self.gaps = np.asarray(gaps, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def sentence_count(self):
+        return len(self.sentence_offsets)
+
+    def tokens(self):
+        """Returns the token list (materialised from ids)."""
+        vocab = self.vocab
+        return [vocab[i] for i in self.ids.tolist()]
+
+    def counts(self):
+        """Returns numpy array of occurrences per vocabulary entry."""
+        return np.bincount(self.ids, minlength=len(self.vocab))
+
+    def counter(self):
+        """Returns Counter of tokens, in first-seen order like Counter(tokens)."""
+        return Counter(dict(zip(self.vocab, self.counts().tolist())))
+
+    def save(self, path):
+        """Takes .npz path. Writes the stream without pickling."""
+        np.savez(
+            path, profile=np.array(self.profile), vocab=np.array(self.vocab, dtype=str),
+            ids=self.ids, sentence_offsets=self.sentence_offsets, gaps=self.gaps
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Takes .npz path. Returns the stored stream."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(str(data['profile']), data['vocab'].tolist(), data['ids'], data['sentence_offsets'],
+                       data['gaps'])
+
+
+def _regex_stream(text, profile):
+    """Takes text and regex profile name. Tokenizes and splits sentences in one scan.
+
+    A sentence is any text between [.!?] runs that contains non-whitespace,
+    the same rule analyze.py uses for sentence_count.
+    """
+    pattern = REGEX_PROFILES[profile]
+    index = {}
+    ids = []
+    offsets = []
+    has_content = False
+    for match in pattern.finditer(text.lower()):
+        kind = match.lastgroup
+        if kind == 'e':
+            has_content = False
+            continue
+        if not has_content:
+            offsets.append(len(ids))
+            has_content = True
+        if kind == 'w':
+            ids.append(index.setdefault(match.group(), len(index)))
+    return TokenStream(profile, index, ids, offsets)
+
+
+def _fast_sentence_tokens(sentence, word_tokenizer):
+    """Takes one Punkt sentence. Returns its word_tokenize tokens that can be alphabetic.
+
+    Whitespace separated chunks are classified directly where the Treebank
+    rules are simple: plain words, words followed by , ; : ! or ? (always
+    split off) and words followed by a period (split off only at the end of
+    the sentence). The remaining chunks are tokenized together in one
+    Treebank call, separated by CHUNK_MARK so their tokens can be put back
+    in place. Split-off punctuation is returned too, as the Treebank tokenizer
+    does, so removed tokens leave the same gaps. None of the Treebank rules look past the whitespace after a
+    chunk except the end-of-sentence period rule, so a trailing mark is
+    added when the sentence's last chunk was classified directly.
+    """
+    chunks = sentence.split()
+    if not chunks or set(chunks[-1]) <= CLOSING_CHARS:
+        # Closing quotes/brackets on their own extend the final period rule
+        return word_tokenizer.tokenize(sentence)
+    last = len(chunks) - 1
+    tokens = []
+    complex_chunks = []
+    for i, chunk in enumerate(chunks):
+        if chunk.isalpha():
+            word = chunk
+        elif chunk[-1] in ',;:!?' and chunk[:-1].isalpha():
+            word = chunk[:-1]
+        elif chunk[-1] == '.' and chunk[:-1].isalpha():
+            # Mid-sentence the period stays attached ("Mr."), so no word
+            word = chunk[:-1] if i == last else ''
+        else:
+            word = None
+        if word is None or word.lower() in TREEBANK_SPLIT_WORDS:
+            tokens.append(None)
+            complex_chunks.append(chunk)
+        elif word:
+            tokens.extend([word, chunk[-1]] if word != chunk else [word])
+        else:
+            tokens.append(chunk)
+
+    if not complex_chunks:
+        return tokens
+
+    joined = f' {CHUNK_MARK} '.join(complex_chunks)
+    if chunks[last] is not complex_chunks[-1]:
+        joined += f' {CHUNK_MARK}'
+    groups = [[]]
+    for token in word_tokenizer.tokenize(joined):
+        if token == CHUNK_MARK:
+            groups.append([])
+        else:
+            groups[-1].append(token)
+
+    result = []
+    groups = iter(groups)
+    for token in tokens:
+        if token is None:
+            result.extend(next(groups))
+        else:
+            result.append(token)
+    return result
+
+
+def _keyness_stream(text, method=None):
+    """Takes text and tokenizer method ('fast' or 'nltk').
+
+    Runs NLTK sentence and word tokenization (as word_tokenize does) and keeps
+    lowercase alphabetic tokens of 3+ letters; sentences are Punkt sentences.
+    A kept token that follows a removed one in its sentence is recorded as a gap.
+    """
+    method = method or KEYNESS_TOKENIZER
+    if method not in ('fast', 'nltk'):
+        raise ValueError(f"Unknown keyness tokenizer: {method}")
+    if not text.strip():
+        # Nothing to split, so skip importing NLTK
+        return TokenStream('keyness', {}, [], [])
+
+    from nltk import sent_tokenize
+    from nltk.tokenize import NLTKWordTokenizer
+
+    word_tokenizer = NLTKWordTokenizer()
+    index = {}
+    ids = []
+    offsets = []
+    gaps = []
+    for sentence in sent_tokenize(text):
+        offsets.append(len(ids))
+        if method == 'fast' and CHUNK_MARK not in sentence:
+            words = _fast_sentence_tokens(sentence, word_tokenizer)
+        else:
+            words = word_tokenizer.tokenize(sentence)
+        # A gap only matters between two kept tokens of the sentence
+        removed = False
+        for w in words:
+            if w.isalpha() and len(w) >= 3:
+                if removed and len(ids) > offsets[-1]:
+                    gaps.append(len(ids))
+                removed = False
+                ids.append(index.setdefault(w.lower(), len(index)))
+            else:
+                removed = True
+    return TokenStream('keyness', index, ids, offsets, gaps)
+
+
+def tokenize_stream(text, profile, method=None):
+    """Takes text and profile name. Returns a fresh TokenStream (no caching).
+
+    method picks the keyness tokenizer ('fast' or 'nltk', default KEYNESS_TOKENIZER).
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown tokenizer profile: {profile}")
+    with span('tokenize', profile=profile, chars=len(text)) as s:
+        if profile == 'keyness':
+            stream = _keyness_stream(text, method)
+        else:
+            stream = _regex_stream(text, profile)
+        s.count(tokens=len(stream), vocab=len(stream.vocab), sentences=stream.sentence_count)
+    return stream
+
+
+def content_hash(text):
+    """Takes text. Returns hex SHA-256 of its UTF-8 encoding."""
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+class TokenCache:
+    """LRU of token streams keyed by content hash and profile, with optional disk copy."""
+
+    def __init__(self, max_entries=CACHE_SIZE, cache_dir=CACHE_DIR):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.npz')
+
+    def get(self, text, profile):
+        """Takes text and profile. Returns its TokenStream, tokenizing only on a miss."""
+        key = f'{content_hash(text)}-{profile}-v{TOKENIZER_VERSION}'
+        stream = self._entries.get(key)
+        if stream is not None:
+            self._entries.move_to_end(key)
+            return stream
+
+        if self.cache_dir and os.path.exists(self._path(key)):
+            stream = TokenStream.load(self._path(key))
+        else:
+            stream = tokenize_stream(text, profile)
+            if self.cache_dir:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = self._path(f'.{key}-{os.getpid()}')
+                stream.save(tmp_path)
+                os.replace(tmp_path, self._path(key))
+
+        self._entries[key] = stream
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return stream
+
+
+_cache = TokenCache()
+
+
+def get_token_stream(text, profile):
+    """Takes text and profile name. Returns the cached TokenStream for it."""
+    return _cache.get(text, profile)
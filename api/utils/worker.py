@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""Long-lived analysis worker for the Node API.
+
+Imports the analysis modules once and keeps the FastText model and the
+reference corpora resident between requests. Requests are read from stdin
+as JSON lines and answered on stdout as JSON lines:
+
+    -> {"id": 1, "script": "keyness.py", "input": "{\"text\": ..., \"corpus\": \"brown\"}"}
+    <- {"id": 1, "result": {...}}
+    <- {"id": 2, "error": "Unknown corpus: foo"}
+
+The "input" field carries exactly what the one-shot script would read from
+stdin, so pythonRunner.js can switch between both modes transparently.
+Results are cached by content hash (see result_cache.py); the request
+{"id": 3, "op": "cache_stats"} returns the cache counters. Adding
+"timings": true to a request returns per-stage timings in "_timings"
+(see instrumentation.py). A "doc_id" marks versions of the same document:
+on a cache miss only its changed paragraphs are re-analysed (see delta.py).
+
+Requests with "stream": true (semantic.py only) get their partial results
+first, one line per stage, before the usual result line:
+
+    -> {"id": 4, "script": "semantic.py", "input": "...", "stream": true}
+    <- {"id": 4, "stage": {"stage": "tokens", "total_words": 5120, ...}}
+    <- {"id": 4, "stage": {"stage": "provisional", "semantic_summary": ...}}
+    <- {"id": 4, "result": {...}}
+
+{"id": 5, "op": "attach_embeddings", "name": "..."} makes later requests use
+the shared embedding segment of that name (see shared_embeddings.py); the
+model is loaded on first use, so this only has to precede the first
+semantic or corpus similarity request.
+
+{"op": "cancel", "id": 4} drops request 4 if it is still queued and stops
+it at its next stage if it is running (it is then answered with
+"cancelled": true). Stdin is read on a background thread so cancels arrive
+while a request runs; requests themselves are still served one at a time.
+Usage: python api/utils/worker.py [--preload-model] [--preload-corpora brown,reuters]
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+from contextlib import closing, redirect_stdout
+
+import clustering
+import semantic
+from analyze import analyze_tokens
+from ann_index import index_version
+from corpus_index import default_corpora, get_table, table_version
+from corpus_profiles import PROFILE_CLUSTERS, PROFILE_WORDS, SIF_A, run_request as run_profiles_request
+from custom_corpora import run_request as run_corpora_request
+from delta import DELTA_HANDLERS, DELTA_STREAM_HANDLERS
+from instrumentation import TIMINGS, span, traced
+from keyness import DISPERSION_FILTERS, WINDOW_FIELDS, run_request as run_keyness_request
+from result_cache import ResultCache, make_key
+from semantic import load_model, model_version, semantic_output, semantic_stages
+from tokenization import TOKENIZER_VERSION, content_hash, get_token_stream
+
+# Bump when analysis output changes so cached results are not reused
+RESULT_VERSION = 2
+
+cache = ResultCache()
+
+
+def run_analyze(raw):
+    """Takes raw text. Runs word statistics on its cached token stream.
+
+    Returns analysis result dict.
+    """
+    return analyze_tokens(get_token_stream(raw, 'words'))
+
+
+def run_keyness(raw):
+    """Takes raw keyness request. Parses it and runs keyness analysis
+    (against every corpus listed in "corpora" if given).
+
+    Returns keyness result dict.
+    """
+    return run_keyness_request(json.loads(raw))
+
+
+def run_profiles(raw):
+    """Takes raw corpus similarity request. Ranks the corpora by similarity to the text.
+
+    Returns corpus_profiles.py result dict.
+    """
+    return run_profiles_request(json.loads(raw))
+
+
+def run_corpora(raw):
+    """Takes raw custom corpus request. Lists, registers or fills corpora.
+
+    Returns the custom_corpora.py result.
+    """
+    return run_corpora_request(json.loads(raw or '{}'))
+
+
+# Script name (as used by pythonRunner.js) -> handler taking the raw input
+HANDLERS = {
+    'analyze.py': run_analyze,
+    'keyness.py': run_keyness,
+    'semantic.py': semantic_output,
+    'custom_corpora.py': run_corpora,
+    'corpus_profiles.py': run_profiles,
+}
+
+# Script name -> handler taking the raw input and returning a stage generator
+STREAM_HANDLERS = {
+    'semantic.py': semantic_stages,
+}
+
+# Handlers that change or list stored state, never served from the result cache
+UNCACHED = {'custom_corpora.py'}
+
+# Handlers whose incremental (doc_id) results depend on the document's history
+# (semantic clusters are warm-started from the previous version's centroids).
+# Those results are not cached, so a cached result is always a cold one.
+HISTORY_DEPENDENT = {'semantic.py'}
+
+
+class RequestCancelled(Exception):
+    """Raised when a running request has been cancelled by the client."""
+
+
+def cache_key(script, raw):
+    """Takes script name and raw input. Builds the result cache key.
+
+    Includes every setting and data version the result depends on.
+    """
+    parts = {'script': script, 'version': RESULT_VERSION, 'tokenizer': TOKENIZER_VERSION}
+    if script == 'keyness.py':
+        data = json.loads(raw)
+        corpora = data['corpora'] if 'corpora' in data else data.get('corpus', 'brown')
+        names = corpora if isinstance(corpora, list) else [corpora]
+        if 'corpora' in data and not corpora:
+            # Resolved as analyze_keyness_multi does, so a new or grown corpus changes the key
+            names = default_corpora()
+        parts.update(text=content_hash(data.get('text', '')), corpora=corpora, names=names,
+                     corpus_versions=[table_version(name) for name in names],
+                     dispersion_filters=[data.get(key) for key in DISPERSION_FILTERS],
+                     ngram=data.get('ngram') or 1,
+                     windows=[data.get(key) for key in WINDOW_FIELDS])
+    elif script == 'corpus_profiles.py':
+        data = json.loads(raw)
+        names = data.get('corpora') or default_corpora()
+        parts.update(text=content_hash(data.get('text', '')), corpora=names, model=model_version(),
+                     corpus_versions=[table_version(name) for name in names],
+                     profile=[PROFILE_WORDS, PROFILE_CLUSTERS, SIF_A])
+    else:
+        parts['text'] = content_hash(raw)
+    if script == 'semantic.py':
+        parts.update(model=model_version(), labels=index_version(), backend=clustering.CLUSTER_BACKEND,
+                     auto_k=clustering.AUTO_K, auto_k_method=clustering.AUTO_K_METHOD,
+                     kmeans_max_rows=clustering.KMEANS_MAX_ROWS)
+    return make_key(**parts)
+
+
+def run_cached(script, raw, doc_id=None):
+    """Takes script name, raw input and optional document id. Returns the cached or computed result.
+
+    With a doc id, a miss is computed incrementally from the document's
+    previous version; results are still cached by content unless they
+    depend on that history (HISTORY_DEPENDENT).
+    """
+    if script in UNCACHED:
+        return HANDLERS[script](raw)
+    key = cache_key(script, raw)
+    with span('result_cache') as s:
+        result = cache.get(key)
+        s.count(hit=result is not None)
+    if result is None:
+        if doc_id is not None and script in DELTA_HANDLERS:
+            result = DELTA_HANDLERS[script](str(doc_id), raw)
+            if script in HISTORY_DEPENDENT:
+                return result
+        else:
+            result = HANDLERS[script](raw)
+        cache.put(key, result)
+    return result
+
+
+def run_streamed(script, raw, doc_id, emit, cancelled):
+    """Takes script name, raw input, optional document id, a stage callback and a cancel check.
+
+    Passes every stage before the final one to emit, except internal
+    progress stages. Raises RequestCancelled between stages (progress stages
+    included) once cancelled() is true. Returns the final result,
+    cached under the same key as the unstreamed request (unless it was
+    computed from the document's history, see HISTORY_DEPENDENT).
+    """
+    key = cache_key(script, raw)
+    with span('result_cache') as s:
+        result = cache.get(key)
+        s.count(hit=result is not None)
+    if result is not None:
+        return result
+    incremental = doc_id is not None and script in DELTA_STREAM_HANDLERS
+    if incremental:
+        stages = DELTA_STREAM_HANDLERS[script](str(doc_id), raw)
+    else:
+        stages = STREAM_HANDLERS[script](raw)
+    with closing(stages):
+        for stage in stages:
+            if stage['stage'] == 'final':
+                result = {k: v for k, v in stage.items() if k != 'stage'}
+                break
+            # Progress stages are only checkpoints for the cancel check
+            if stage['stage'] != 'progress':
+                emit(stage)
+            if cancelled():
+                raise RequestCancelled()
+    if not (incremental and script in HISTORY_DEPENDENT):
+        cache.put(key, result)
+    return result
+
+
+def attach_embeddings(name):
+    """Takes shared embedding segment name. Loads the model from it from now on."""
+    semantic.shared_embeddings = name
+    load_model.cache_clear()
+
+
+def handle_request(request, emit=None, cancelled=lambda: False):
+    """Takes decoded request dict, and for streamed requests a stage callback
+    and a cancel check. Dispatches it to the matching handler.
+
+    Returns response dict with either result or error.
+    """
+    request_id = request.get('id')
+    if request.get('op') == 'cache_stats':
+        return {'id': request_id, 'result': cache.stats()}
+    if request.get('op') == 'attach_embeddings':
+        attach_embeddings(request.get('name') or '')
+        return {'id': request_id, 'result': {'name': semantic.shared_embeddings}}
+
+    script = request.get('script')
+    handler = HANDLERS.get(script)
+    if handler is None:
+        return {'id': request_id, 'error': f"Unknown script: {script}"}
+    raw = request.get('input') or ''
+    timings = bool(request.get('timings', TIMINGS))
+    try:
+        if cancelled():
+            raise RequestCancelled()
+        if request.get('stream') and emit is not None and script in STREAM_HANDLERS:
+            result = traced(script[:-3], run_streamed, script, raw, request.get('doc_id'), emit, cancelled,
+                            timings=timings)
+        else:
+            result = traced(script[:-3], run_cached, script, raw, request.get('doc_id'), timings=timings)
+        return {'id': request_id, 'result': result}
+    except RequestCancelled:
+        return {'id': request_id, 'error': 'Request cancelled', 'cancelled': True}
+    except Exception as e:
+        return {'id': request_id, 'error': str(e)}
+
+
+class Inbox:
+    """Requests read from stdin on a background thread, in arrival order.
+
+    Cancel lines are applied as soon as they are read: they mark a queued
+    or running request as cancelled. Cancels for ids that are not queued or
+    running are ignored, so nothing accumulates.
+    """
+
+    def __init__(self, stdin):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.active = set()
+        self.cancelled = set()
+        threading.Thread(target=self._read, args=(stdin,), daemon=True).start()
+
+    @staticmethod
+    def _key(request_id):
+        # Ids are whatever JSON the client sent
+        return json.dumps(request_id, sort_keys=True)
+
+    def _read(self, stdin):
+        try:
+            for line in stdin:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    self.queue.put((None, f'Invalid request: {e}'))
+                    continue
+                key = self._key(request.get('id'))
+                with self.lock:
+                    if request.get('op') == 'cancel':
+                        if key in self.active:
+                            self.cancelled.add(key)
+                        continue
+                    self.active.add(key)
+                self.queue.put((request, None))
+        finally:
+            self.queue.put(None)
+
+    def __iter__(self):
+        """Yields (request, error) pairs until stdin closes."""
+        while (item := self.queue.get()) is not None:
+            yield item
+
+    def is_cancelled(self, request_id):
+        with self.lock:
+            return self._key(request_id) in self.cancelled
+
+    def done(self, request_id):
+        """Takes the id of an answered request. Forgets it."""
+        key = self._key(request_id)
+        with self.lock:
+            self.active.discard(key)
+            self.cancelled.discard(key)
+
+
+def serve(stdin=sys.stdin, stdout=sys.stdout):
+    """Takes input and output streams. Serves requests until stdin closes.
+
+    Anything the analyses print (e.g. model loading messages) is sent to
+    stderr so stdout only carries protocol lines.
+    """
+    def write(message):
+        stdout.write(json.dumps(message, ensure_ascii=False) + '\n')
+        stdout.flush()
+
+    inbox = Inbox(stdin)
+    for request, error in inbox:
+        if error is not None:
+            write({'id': None, 'error': error})
+            continue
+        request_id = request.get('id')
+        with redirect_stdout(sys.stderr):
+            response = handle_request(
+                request,
+                emit=lambda stage: write({'id': request_id, 'stage': stage}),
+                cancelled=lambda: inbox.is_cancelled(request_id)
+            )
+        inbox.done(request_id)
+        write(response)
+
+
+def preload(model=False, corpora=()):
+    """Takes preload options. Warms the model and corpora before serving."""
+    with redirect_stdout(sys.stderr):
+        if model:
+            load_model()
+        for name in corpora:
+            get_table(name)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='InkSight analysis worker')
+    parser.add_argument('--preload-model', action='store_true',
+                        help='Load the FastText model before serving')
+    parser.add_argument('--preload-corpora', default='',
+                        help='Comma separated corpus names to load before serving')
+    args = parser.parse_args()
+
+    preload(args.preload_model, [c for c in args.preload_corpora.split(',') if c])
+    serve()
@@ -150,6 +150,20 @@ async function init() {
     uploadCollapseBtn.textContent = isCollapsed ? 'Collapse' : 'Expand';
   });
 
+  // Random document ids for this page session: re-uploads of the same file (or edits of the
+  // pasted text) keep their id so only changed paragraphs are re-analysed, while other users'
+  // files with the same name never share server-side state
+  const documentIds = new Map();
+  function documentId(key) {
+    if (!documentIds.has(key)) {
+      const random = window.crypto && window.crypto.randomUUID
+        ? window.crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+      documentIds.set(key, random);
+    }
+    return documentIds.get(key);
+  }
+
   // Helper to create FormData
   function createFormData() {
     const formData = new FormData();
@@ -160,6 +174,8 @@ async function init() {
       const blob = new Blob([textArea.value.trim()], { type: 'text/plain' });
       formData.append('file', blob, 'pasted-text.txt');
     }
+    // Re-uploads of an edited file only re-analyse the changed paragraphs
+    formData.append('doc_id', documentId(file ? `file:${file.name}` : 'pasted'));
     return formData;
   }
 
@@ -198,19 +214,22 @@ async function init() {
       }
 
       if (options.sentiment) {
-        const sentRes = await fetch('/api/sentiment', {
-          method: 'POST',
-          body: createFormData(),
+        // Show progress while the clusters are computed
+        const status = resultsDiv.querySelector('.loading-state p');
+        sentData = await analyzeSemanticStream(createFormData(), (stage) => {
+          if (!status) return;
+          if (stage.stage === 'tokens') {
+            status.textContent = `Grouping ${stage.unique_words} distinct words into themes...`;
+          } else if (stage.stage === 'provisional') {
+            const themes = stage.semantic_summary.top_clusters.map((c) => c.theme || c.label);
+            status.textContent = `Emerging themes: ${themes.join(', ')} (refining...)`;
+          }
         });
-
-        if (!sentRes.ok) throw new Error('Semantic analysis failed');
-
-        sentData = await sentRes.json();
         setSentimentData(sentData);
       }
 
       if (options.keynessStats) {
-        keynessData = await analyzeKeyness(createFormData(), $('corpusSelect').value);
+        keynessData = await analyzeKeyness(createFormData(), $('corpusSelect').value, $('ngramSelect').value);
         setKeynessData(keynessData);
       }
 
@@ -34,12 +34,13 @@ function initKeynessStats() {
   loadCorpora();
 }
 
-// Call keyness API with file and corpus
-async function analyzeKeyness(formData, corpus) {
+// Call keyness API with file and corpus (ngram 2 or 3 compares phrases instead of words)
+async function analyzeKeyness(formData, corpus, ngram = '1') {
   if (!corpus || corpus.trim() === '') {
     throw new Error('Please select a reference corpus for keyness analysis');
   }
   formData.append('corpus', corpus);
+  if (ngram && ngram !== '1') formData.append('ngram', ngram);
   const res = await fetch('/api/keyness-stats', {
     method: 'POST',
     body: formData,
@@ -12,6 +12,33 @@ async function analyzeSemantic(formData) {
   return res.json();
 }
 
+// Call the streaming semantic API; onStage gets each partial stage (tokens, provisional)
+async function analyzeSemanticStream(formData, onStage) {
+  const res = await fetch('/api/sentiment-stream', {
+    method: 'POST',
+    body: formData,
+  });
+
+  if (!res.ok || !res.body) throw new Error('Semantic analysis failed');
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    for (const line of lines.filter(Boolean)) {
+      const { stage, ...data } = JSON.parse(line);
+      if (stage === 'final') return data;
+      if (stage === 'error') throw new Error(data.error || 'Semantic analysis failed');
+      if (onStage) onStage({ stage, ...data });
+    }
+    if (done) throw new Error('Semantic analysis failed');
+  }
+}
+
 // Render semantic cluster results
 function renderSemantic(data) {
   if (!data.semantic_summary) {
@@ -58,4 +85,5 @@ function renderSemantic(data) {
 
 // Export for main index.js
 window.analyzeSemantic = analyzeSemantic;
+window.analyzeSemanticStream = analyzeSemanticStream;
 window.renderSemantic = renderSemantic;